@@ -17,9 +17,118 @@ class Settings(BaseModel):
     # Temporary file storage
     TEMP_FILE_DIR: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "temp_files")
 
+    # Private state (databases, upload store and caches), kept out of TEMP_FILE_DIR
+    # so it can never be served by the download endpoints
+    DATA_DIR: str = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data"))
+
     # Maximum file size (100MB in bytes)
     MAX_FILE_SIZE: int = 100 * 1024 * 1024
 
+    # Chunk size used when streaming uploads to disk (1MB)
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+
+    # Content-addressed upload store: keep unreferenced uploads for reuse (1 hour)
+    STORE_RETENTION_SECONDS: int = int(os.getenv("STORE_RETENTION_SECONDS", 3600))
+
+    # Processed outputs are deleted this long after their last download (1 hour)
+    OUTPUT_TTL_SECONDS: int = int(os.getenv("OUTPUT_TTL_SECONDS", 3600))
+    # Maximum number of expired files deleted per cleanup pass
+    JANITOR_BATCH_SIZE: int = int(os.getenv("JANITOR_BATCH_SIZE", 100))
+
+    # Text extraction of large PDFs is split into shards of at least this many pages
+    TEXT_EXTRACTION_SHARD_PAGES: int = int(os.getenv("TEXT_EXTRACTION_SHARD_PAGES", 50))
+
+    # Disk cache of extracted page text, evicted least recently used first (256MB)
+    TEXT_CACHE_MAX_BYTES: int = int(os.getenv("TEXT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+    # Chat retrieval: chunk size, chunks sent per question, and indexes kept in memory
+    RETRIEVAL_CHUNK_CHARS: int = int(os.getenv("RETRIEVAL_CHUNK_CHARS", 1500))
+    RETRIEVAL_TOP_K: int = int(os.getenv("RETRIEVAL_TOP_K", 8))
+    RETRIEVAL_INDEX_CACHE_SIZE: int = int(os.getenv("RETRIEVAL_INDEX_CACHE_SIZE", 32))
+
+    # Gemini API client: endpoint (override to test against a local server), request
+    # timeout, concurrent calls per API key, connection pool size and cached key clients
+    GEMINI_API_BASE_URL: str = os.getenv("GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+    GEMINI_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_TIMEOUT_SECONDS", 120))
+    GEMINI_MAX_CONCURRENCY_PER_KEY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY_PER_KEY", 8))
+    GEMINI_MAX_CONNECTIONS: int = int(os.getenv("GEMINI_MAX_CONNECTIONS", 100))
+    GEMINI_CLIENT_CACHE_SIZE: int = int(os.getenv("GEMINI_CLIENT_CACHE_SIZE", 1024))
+
+    # Gemini rate limiting per API key and model: sustained requests per minute and burst
+    # size, then retries of 429, 5xx and connection failures with jittered exponential
+    # backoff (or the delay the API asks for)
+    GEMINI_REQUESTS_PER_MINUTE: float = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", 120))
+    GEMINI_BURST_REQUESTS: int = int(os.getenv("GEMINI_BURST_REQUESTS", 20))
+    GEMINI_MAX_RETRIES: int = int(os.getenv("GEMINI_MAX_RETRIES", 4))
+    GEMINI_BACKOFF_BASE_SECONDS: float = float(os.getenv("GEMINI_BACKOFF_BASE_SECONDS", 1.0))
+    GEMINI_BACKOFF_MAX_SECONDS: float = float(os.getenv("GEMINI_BACKOFF_MAX_SECONDS", 60.0))
+
+    # Deadlines of Gemini generation calls per feature, including queueing and retries. A
+    # call that misses its deadline is made again on GEMINI_FALLBACK_MODEL if set
+    GEMINI_CHAT_DEADLINE_SECONDS: float = float(os.getenv("GEMINI_CHAT_DEADLINE_SECONDS", 60))
+    GEMINI_QUESTIONS_DEADLINE_SECONDS: float = float(os.getenv("GEMINI_QUESTIONS_DEADLINE_SECONDS", 60))
+    GEMINI_SUMMARY_DEADLINE_SECONDS: float = float(os.getenv("GEMINI_SUMMARY_DEADLINE_SECONDS", 180))
+    GEMINI_TRANSLATION_DEADLINE_SECONDS: float = float(os.getenv("GEMINI_TRANSLATION_DEADLINE_SECONDS", 180))
+    GEMINI_FALLBACK_MODEL: str = os.getenv("GEMINI_FALLBACK_MODEL", "")
+
+    # Hedged Gemini calls: a call with no response after the GEMINI_HEDGE_PERCENTILE latency
+    # of its feature and model is sent again and the first response wins. The percentile is
+    # taken over the last GEMINI_LATENCY_WINDOW calls, once GEMINI_HEDGE_MIN_SAMPLES are known
+    GEMINI_HEDGING: bool = os.getenv("GEMINI_HEDGING", "false").lower() == "true"
+    GEMINI_HEDGE_PERCENTILE: float = float(os.getenv("GEMINI_HEDGE_PERCENTILE", 95))
+    GEMINI_HEDGE_MIN_SAMPLES: int = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", 20))
+    GEMINI_LATENCY_WINDOW: int = int(os.getenv("GEMINI_LATENCY_WINDOW", 200))
+
+    # Cache of the Gemini models available to each API key: lifetime (1 hour), age after
+    # which a use refreshes it in the background (45 minutes) and keys kept
+    MODEL_CACHE_TTL_SECONDS: int = int(os.getenv("MODEL_CACHE_TTL_SECONDS", 3600))
+    MODEL_CACHE_REFRESH_SECONDS: int = int(os.getenv("MODEL_CACHE_REFRESH_SECONDS", 2700))
+    MODEL_CACHE_MAX_KEYS: int = int(os.getenv("MODEL_CACHE_MAX_KEYS", 1024))
+
+    # Cache of Gemini responses: lifetime (1 day) and entries kept in memory
+    RESPONSE_CACHE_TTL_SECONDS: int = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 86400))
+    RESPONSE_CACHE_MEMORY_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MEMORY_ENTRIES", 512))
+
+    # Summarization: concurrent Gemini calls, input limit assumed when the model
+    # does not report one, and a cap on section size so long documents run in parallel
+    SUMMARY_CONCURRENCY: int = int(os.getenv("SUMMARY_CONCURRENCY", 4))
+    SUMMARY_DEFAULT_INPUT_TOKENS: int = int(os.getenv("SUMMARY_DEFAULT_INPUT_TOKENS", 30720))
+    SUMMARY_MAX_SECTION_TOKENS: int = int(os.getenv("SUMMARY_MAX_SECTION_TOKENS", 100000))
+
+    # Translation: concurrent Gemini calls, maximum tokens per chunk (further capped by
+    # the model's output limit) and retries of a failed chunk
+    TRANSLATION_CONCURRENCY: int = int(os.getenv("TRANSLATION_CONCURRENCY", 4))
+    TRANSLATION_MAX_CHUNK_TOKENS: int = int(os.getenv("TRANSLATION_MAX_CHUNK_TOKENS", 2048))
+    TRANSLATION_RETRIES: int = int(os.getenv("TRANSLATION_RETRIES", 2))
+
+    # Translation memory: repeated segments are translated once per document, and with
+    # TRANSLATION_MEMORY_SHARED once across documents, keeping entries for 30 days
+    TRANSLATION_MEMORY_DB_PATH: str = os.getenv(
+        "TRANSLATION_MEMORY_DB_PATH", os.path.join(DATA_DIR, "translation_memory.sqlite3")
+    )
+    TRANSLATION_MEMORY_SHARED: bool = os.getenv("TRANSLATION_MEMORY_SHARED", "true").lower() == "true"
+    TRANSLATION_MEMORY_TTL_SECONDS: int = int(os.getenv("TRANSLATION_MEMORY_TTL_SECONDS", 30 * 86400))
+
+    # PDF worker pool (0 runs operations in the threadpool instead of subprocesses)
+    PDF_WORKERS: int = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+    # Recycle a worker process after this many operations (0 disables recycling)
+    PDF_WORKER_MAX_TASKS: int = int(os.getenv("PDF_WORKER_MAX_TASKS", 0))
+
+    # Asynchronous job queue
+    JOBS_DB_PATH: str = os.getenv("JOBS_DB_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", max(1, os.cpu_count() or 1)))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", 1.0))
+    # Finished jobs are purged on startup after this long (1 day)
+    JOB_RETENTION_SECONDS: int = int(os.getenv("JOB_RETENTION_SECONDS", 86400))
+
+    # Document registry: PDFs uploaded once and used by id, removed after 7 days unused
+    DOCUMENTS_DB_PATH: str = os.getenv("DOCUMENTS_DB_PATH", os.path.join(DATA_DIR, "documents.sqlite3"))
+    DOCUMENT_TTL_SECONDS: int = int(os.getenv("DOCUMENT_TTL_SECONDS", 7 * 86400))
+
+    # Batch operations: files processed at once, and the maximum files per batch
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", max(1, PDF_WORKERS) * 2))
+    MAX_BATCH_FILES: int = int(os.getenv("MAX_BATCH_FILES", 500))
+
     # CORS settings
     CORS_ORIGINS: list = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
 
@@ -29,5 +138,6 @@ class Settings(BaseModel):
 
 settings = Settings()
 
-# Ensure temp directory exists
+# Ensure temp and data directories exist
 os.makedirs(settings.TEMP_FILE_DIR, exist_ok=True)
+os.makedirs(settings.DATA_DIR, exist_ok=True)
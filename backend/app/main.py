@@ -4,6 +4,12 @@ import uvicorn
 import os
 from dotenv import load_dotenv
 from app.core.config import settings
+from app.services import (
+    executor_service, janitor_service, storage_service, job_service,
+    text_cache_service, response_cache_service, translation_memory_service, coalescing_service, gemini_client,
+    latency_service, model_cache_service, document_service
+)
+from starlette.concurrency import run_in_threadpool
 
 # Load environment variables
 load_dotenv()
@@ -24,6 +30,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Start and stop background services with the application
+@app.on_event("startup")
+async def startup():
+    executor_service.start_executor()
+    janitor_service.start_janitor()
+    storage_service.rebuild()
+    text_cache_service.rebuild()
+    response_cache_service.rebuild()
+    await run_in_threadpool(translation_memory_service.init_db)
+    await job_service.start_job_workers()
+    await document_service.start_documents()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await document_service.stop_documents()
+    await job_service.stop_job_workers()
+    await janitor_service.stop_janitor()
+    executor_service.shutdown_executor()
+    await gemini_client.close_clients()
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -32,12 +58,26 @@ async def root():
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "cleanup": janitor_service.stats(),
+        "text_cache": text_cache_service.stats(),
+        "response_cache": response_cache_service.stats(),
+        "translation_memory": await run_in_threadpool(translation_memory_service.stats),
+        "coalescing": coalescing_service.stats(),
+        "gemini": gemini_client.stats(),
+        "latency": latency_service.stats(),
+        "model_cache": model_cache_service.stats(),
+        "documents": await run_in_threadpool(document_service.stats),
+    }
 
 # Import and include routers
-from app.routers import pdf_router, ai_router
+from app.routers import pdf_router, ai_router, job_router, batch_router, document_router
 app.include_router(pdf_router.router, prefix="/api/v1/pdf", tags=["PDF Operations"])
 app.include_router(ai_router.router, prefix="/api/v1/ai", tags=["AI Operations"])
+app.include_router(job_router.router, prefix="/api/v1/jobs", tags=["Jobs"])
+app.include_router(batch_router.router, prefix="/api/v1/batch", tags=["Batch Operations"])
+app.include_router(document_router.router, prefix="/api/v1/documents", tags=["Documents"])
 
 # Print startup message
 print(f"Starting {app.title} v{app.version}")
@@ -45,6 +85,8 @@ print(f"Environment: {settings.PYTHON_ENV}")
 print(f"API Prefix: {settings.API_PREFIX}")
 print(f"CORS Origins: {settings.CORS_ORIGINS}")
 print(f"Temporary File Directory: {settings.TEMP_FILE_DIR}")
+print(f"PDF Workers: {settings.PDF_WORKERS}")
+print(f"Job Workers: {settings.JOB_WORKERS}")
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
@@ -20,41 +20,56 @@ class AIFeatureType(str, Enum):
     TRANSLATE = "translate"
     GENERATE_QUESTIONS = "generate_questions"
 
+class TokenUsage(BaseModel):
+    """Token usage of an AI response: the local estimate next to the counts reported by Gemini."""
+    strategy: str = Field(..., description="How the document was fitted in the prompt (fit, trim, chunk, retrieve)")
+    input_token_limit: int
+    estimated_document_tokens: int
+    calls: int = 0
+    estimated_prompt_tokens: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+
 class ChatRequest(BaseModel):
     """Request model for chat with PDF."""
     question: str = Field(..., description="User's question about the PDF content")
-    pdf_id: Optional[str] = Field(None, description="ID of previously processed PDF")
+    pdf_id: Optional[str] = Field(None, description="ID of a registered document or previously processed PDF")
     context: Optional[str] = Field(None, description="Additional context for the question")
 
 class ChatResponse(BaseModel):
     """Response model for chat with PDF."""
     answer: str
     source_pages: Optional[List[int]] = None
+    usage: Optional[TokenUsage] = None
 
 class SummarizeRequest(BaseModel):
     """Request model for PDF summarization."""
-    pdf_id: Optional[str] = Field(None, description="ID of previously processed PDF")
+    pdf_id: Optional[str] = Field(None, description="ID of a registered document or previously processed PDF")
     length: Optional[str] = Field("medium", description="Desired summary length (short, medium, long)")
 
 class SummarizeResponse(BaseModel):
     """Response model for PDF summarization."""
     summary: str
+    usage: Optional[TokenUsage] = None  # Omitted for cached and coalesced responses
 
 class TranslateRequest(BaseModel):
     """Request model for PDF translation."""
-    pdf_id: Optional[str] = Field(None, description="ID of previously processed PDF")
+    pdf_id: Optional[str] = Field(None, description="ID of a registered document or previously processed PDF")
     target_language: str = Field(..., description="Target language for translation")
 
 class TranslateResponse(BaseModel):
     """Response model for PDF translation."""
     translated_text: str
     source_language: Optional[str] = None
+    usage: Optional[TokenUsage] = None  # Omitted for cached and coalesced responses
 
 class GenerateQuestionsRequest(BaseModel):
     """Request model for generating questions from PDF."""
-    pdf_id: Optional[str] = Field(None, description="ID of previously processed PDF")
+    pdf_id: Optional[str] = Field(None, description="ID of a registered document or previously processed PDF")
     count: Optional[int] = Field(5, description="Number of questions to generate")
 
 class GenerateQuestionsResponse(BaseModel):
     """Response model for generating questions from PDF."""
     questions: List[str]
+    usage: Optional[TokenUsage] = None  # Omitted for cached and coalesced responses
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from enum import Enum
+
+class DocumentStatus(str, Enum):
+    """Enum for document preparation states."""
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+
+class PageGeometry(BaseModel):
+    """Size and rotation of a page."""
+    width: float = Field(..., description="Media box width in points")
+    height: float = Field(..., description="Media box height in points")
+    rotation: int = Field(0, description="Page rotation in degrees")
+
+class DocumentResponse(BaseModel):
+    """Response model for a registered document."""
+    document_id: str = Field(..., description="ID to pass as pdf_id to the PDF and AI endpoints")
+    filename: str
+    size: int
+    sha256: str
+    status: DocumentStatus
+    page_count: Optional[int] = None
+    pages: Optional[List[PageGeometry]] = None
+    error: Optional[str] = None
+    created_at: float
+    used_at: float
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from enum import Enum
+from app.models.pdf_models import PDFOperationType, PDFResponse
+
+class JobStatus(str, Enum):
+    """Enum for job states."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class JobResponse(BaseModel):
+    """Response model for an asynchronous PDF job."""
+    job_id: str
+    operation: PDFOperationType
+    status: JobStatus
+    progress: float = Field(0.0, description="Completion between 0.0 and 1.0")
+    message: Optional[str] = None
+    result: Optional[PDFResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    status_url: Optional[str] = None
+    result_url: Optional[str] = None
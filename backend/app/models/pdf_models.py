@@ -38,3 +38,14 @@ class PDFResponse(BaseModel):
     file_path: Optional[str] = None
     download_url: Optional[str] = None
     error: Optional[str] = None
+
+class PipelineStepTiming(BaseModel):
+    """Time spent in one stage of a pipeline."""
+    step: str
+    seconds: float
+
+class PipelineResponse(PDFResponse):
+    """Response model for the pipeline endpoint."""
+    page_count: Optional[int] = None
+    timings: List[PipelineStepTiming] = []
+    total_seconds: Optional[float] = None
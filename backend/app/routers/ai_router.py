@@ -1,14 +1,21 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Header, Query
-from fastapi.responses import JSONResponse
-from typing import List, Optional, Dict, Any
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, List, Optional, Dict, Any
 import os
+import json
 import uuid
-import shutil
-from app.services import gemini_service, pdf_service
+from app.services import (
+    budget_service, document_service, extraction_service, gemini_service, response_cache_service, retrieval_service,
+    summarization_service, text_cache_service, token_service, translation_service
+)
+from app.services.gemini_client import GeminiAPIError, GenerationResult
+from app.services.translation_service import TranslatedPage
+from app.services.upload_service import save_upload_file, cleanup_temp_files, PDF_FILE_TYPES
 from app.models.ai_models import (
     GeminiModel, GeminiModelsResponse, AIFeatureType,
     ChatRequest, ChatResponse, SummarizeRequest, SummarizeResponse,
-    TranslateRequest, TranslateResponse, GenerateQuestionsRequest, GenerateQuestionsResponse
+    TranslateRequest, TranslateResponse, GenerateQuestionsRequest, GenerateQuestionsResponse, TokenUsage
 )
 from app.core.config import settings
 import logging
@@ -16,50 +23,181 @@ import logging
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Helper function to save uploaded file
-async def save_upload_file(upload_file: UploadFile) -> str:
-    """Save an uploaded file to a temporary location.
+# Helper function to extract text from a PDF
+async def extract_pdf_text(pdf_path: str) -> str:
+    """Extract text from a PDF, reusing the cached text of the same content.
 
     Args:
-        upload_file: The uploaded file
+        pdf_path: Path to the PDF file
 
     Returns:
-        Path to the saved file
+        Extracted text from the PDF
     """
-    # Create a unique filename
-    file_id = str(uuid.uuid4())
-    file_extension = os.path.splitext(upload_file.filename)[1]
-    temp_file_path = os.path.join(settings.TEMP_FILE_DIR, f"{file_id}{file_extension}")
+    return await text_cache_service.get_text(pdf_path)
+
+# Helper function to find the PDF of an AI request
+async def resolve_pdf_path(file: Optional[UploadFile], pdf_id: Optional[str], temp_files: List[str]) -> str:
+    """Save the uploaded PDF, or find the registered document or previously processed PDF with the given ID.
+
+    Args:
+        file: The uploaded PDF, if any
+        pdf_id: ID of a registered document or previously processed PDF, used when no file is uploaded
+        temp_files: List the saved upload or document is added to, for cleanup
+
+    Returns:
+        Path to the PDF file
+    """
+    if file is None and pdf_id is None:
+        raise HTTPException(status_code=400, detail="Either file or pdf_id must be provided")
+
+    if file:
+        # Validate file is a PDF
+        if not file.filename.lower().endswith('.pdf'):
+            raise HTTPException(status_code=400, detail="File must be a PDF")
+
+        pdf_path = await save_upload_file(file, PDF_FILE_TYPES)
+        temp_files.append(pdf_path)
+        return pdf_path
 
-    # Save the file
-    with open(temp_file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
+    return await document_service.find_pdf(pdf_id, temp_files)
 
-    return temp_file_path
+def token_usage(budget: Optional[budget_service.Budget], totals: Dict[str, int]) -> Optional[TokenUsage]:
+    """Build the usage report of a response from its prompt budget and tracked token counts.
 
-# Helper function to clean up temporary files
-def cleanup_temp_files(file_paths: List[str]):
-    """Clean up temporary files.
+    Args:
+        budget: How the document was fitted in the prompt, or None if no call was made
+        totals: The totals collected by token_service.track_usage
+
+    Returns:
+        The usage report, or None for responses served from the cache
+    """
+    if budget is None:
+        return None
+    return TokenUsage(
+        strategy=budget.strategy,
+        input_token_limit=budget.input_token_limit,
+        estimated_document_tokens=budget.estimated_document_tokens,
+        **totals
+    )
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_events(chunks: AsyncIterator[GenerationResult], temp_files: List[str],
+                        done: Optional[Dict[str, Any]] = None, cache_key: Optional[str] = None) -> AsyncIterator[str]:
+    """Forward generated text to the client as server-sent events.
+
+    Sends a "token" event per piece of text, then a "done" event carrying the
+    token usage, or an "error" event if generation fails midway. When the client
+    disconnects, the generation is cancelled and its API call closed.
 
     Args:
-        file_paths: List of file paths to clean up
+        chunks: The generated text, as it is produced
+        temp_files: Temporary files to remove once the stream ends
+        done: Extra fields of the "done" event
+        cache_key: Response cache key the complete text is saved under, if any
     """
-    for path in file_paths:
-        try:
-            if os.path.exists(path):
-                os.remove(path)
-        except Exception as e:
-            logger.error(f"Error cleaning up temporary file {path}: {e}")
+    parts = []
+    usage: Dict[str, int] = {}
+    try:
+        async for chunk in chunks:
+            if chunk.text:
+                parts.append(chunk.text)
+                yield sse_event("token", {"text": chunk.text})
+            if chunk.usage:
+                usage = chunk.usage
+
+        if cache_key is not None and parts:
+            await run_in_threadpool(response_cache_service.save, cache_key, "".join(parts))
+        yield sse_event("done", {**(done or {}), "usage": usage})
+    except (GeminiAPIError, HTTPException) as e:
+        logger.error(f"Error streaming from Gemini API: {e}")
+        yield error_event(e)
+    except Exception as e:
+        logger.error(f"Error streaming response: {e}")
+        yield sse_event("error", {"detail": str(e), "status_code": 500})
+    finally:
+        cleanup_temp_files(temp_files)
+
+def error_event(e: Exception) -> str:
+    """Build the "error" event of a failed stream, with the status code the non-streaming endpoint would return."""
+    if isinstance(e, GeminiAPIError) and e.retryable:
+        e = gemini_service.unavailable_error(e)
+    if isinstance(e, HTTPException):
+        return sse_event("error", {"detail": e.detail, "status_code": e.status_code})
+    return sse_event("error", {"detail": str(e), "status_code": e.status_code})
+
+async def cached_chunks(text: str) -> AsyncIterator[GenerationResult]:
+    """Replay a cached response as a single piece of text."""
+    yield GenerationResult(text=text)
+
+async def stream_page_events(pages: AsyncIterator[TranslatedPage], temp_files: List[str],
+                             done: Optional[Dict[str, Any]] = None, cache_key: Optional[str] = None) -> AsyncIterator[str]:
+    """Forward translated pages to the client as server-sent events.
+
+    Sends a "page" event per page, in page order, then a "done" event carrying
+    the total token usage, or an "error" event if a page fails. When the client
+    disconnects, the remaining translations are cancelled.
+
+    Args:
+        pages: The translated pages, as they are finished
+        temp_files: Temporary files to remove once the stream ends
+        done: Extra fields of the "done" event
+        cache_key: Response cache key the complete translation is saved under, if any
+    """
+    texts = []
+    usage: Dict[str, int] = {}
+    try:
+        async for page in pages:
+            texts.append(page.text)
+            translation_service.add_usage(usage, page.usage)
+            yield sse_event("page", {"page_number": page.page_number, "text": page.text})
+
+        if cache_key is not None:
+            await run_in_threadpool(response_cache_service.save, cache_key, texts)
+        yield sse_event("done", {**(done or {}), "page_count": len(texts), "usage": usage})
+    except (GeminiAPIError, HTTPException) as e:
+        logger.error(f"Error streaming from Gemini API: {e}")
+        yield error_event(e)
+    except Exception as e:
+        logger.error(f"Error streaming response: {e}")
+        yield sse_event("error", {"detail": str(e), "status_code": 500})
+    finally:
+        cleanup_temp_files(temp_files)
+
+async def cached_pages(texts: List[str]) -> AsyncIterator[TranslatedPage]:
+    """Replay a cached translation page by page."""
+    for page_number, text in enumerate(texts, start=1):
+        yield TranslatedPage(page_number, text)
+
+def event_stream_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """Build a server-sent-event response that proxies do not buffer."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def parse_request_json(model: Any, request: str) -> Any:
+    """Parse the JSON request form field into a request model."""
+    try:
+        return model.parse_obj(json.loads(request))
+    except Exception as e:
+        logger.error(f"Error parsing request JSON: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid request format: {str(e)}")
 
 @router.get("/models", response_model=GeminiModelsResponse)
 async def get_models(x_gemini_api_key: str = Header(...)):
     """List available Gemini models."""
     try:
-        models = gemini_service.list_gemini_models(x_gemini_api_key)
+        models = await gemini_service.list_gemini_models(x_gemini_api_key)
         if models is None:
             raise HTTPException(status_code=500, detail="Could not fetch models from Gemini API")
 
         return GeminiModelsResponse(models=[GeminiModel(**model) for model in models])
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing Gemini models: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -78,53 +216,25 @@ async def chat_with_pdf(
     temp_files = []
 
     try:
-        # Parse the request JSON if provided
-        chat_request = None
         if request:
-            try:
-                import json
-                chat_request = ChatRequest.parse_obj(json.loads(request))
-            except Exception as e:
-                logger.error(f"Error parsing request JSON: {e}")
-                raise HTTPException(status_code=400, detail=f"Invalid request format: {str(e)}")
+            chat_request = parse_request_json(ChatRequest, request)
         else:
-            # Create request from form parameters
-            chat_request = ChatRequest(
-                question=question or "",
-                pdf_id=pdf_id
-            )
-
-        # Validate that either file or pdf_id is provided
-        if file is None and (chat_request is None or chat_request.pdf_id is None):
-            raise HTTPException(status_code=400, detail="Either file or pdf_id must be provided")
+            chat_request = ChatRequest(question=question or "", pdf_id=pdf_id)
 
         # Validate that question is provided
-        if chat_request is None or not chat_request.question:
+        if not chat_request.question:
             raise HTTPException(status_code=400, detail="Question is required")
 
-        # Process file if provided
-        if file:
-            # Validate file is a PDF
-            if not file.filename.lower().endswith('.pdf'):
-                raise HTTPException(status_code=400, detail="File must be a PDF")
+        pdf_path = await resolve_pdf_path(file, chat_request.pdf_id, temp_files)
 
-            # Save uploaded file
-            temp_file_path = await save_upload_file(file)
-            temp_files.append(temp_file_path)
-
-            # Extract text from PDF
-            pdf_text = pdf_service.extract_text_from_pdf(temp_file_path)
-        else:
-            # Use pdf_id to get the file
-            pdf_path = os.path.join(settings.TEMP_FILE_DIR, f"{chat_request.pdf_id}.pdf")
-            if not os.path.exists(pdf_path):
-                raise HTTPException(status_code=404, detail="PDF file not found")
-
-            # Extract text from PDF
-            pdf_text = pdf_service.extract_text_from_pdf(pdf_path)
+        # Only send the passages most relevant to the question, as many as fit in the prompt
+        chunks = await retrieval_service.retrieve(pdf_path, chat_request.question)
+        chunks, budget = await budget_service.fit_passages(x_gemini_api_key, model_name, chunks, chat_request.question)
+        pdf_text = retrieval_service.format_chunks(chunks)
 
         # Chat with PDF using Gemini API
-        answer = gemini_service.chat_with_pdf(x_gemini_api_key, model_name, pdf_text, chat_request.question)
+        with token_service.track_usage() as usage:
+            answer = await gemini_service.chat_with_pdf(x_gemini_api_key, model_name, pdf_text, chat_request.question)
         if answer is None:
             raise HTTPException(status_code=500, detail="Failed to generate response from Gemini API")
 
@@ -134,14 +244,16 @@ async def chat_with_pdf(
         # Return response
         return ChatResponse(
             answer=answer,
-            source_pages=[]  # Return empty array instead of None
+            source_pages=retrieval_service.source_pages(chunks),
+            usage=token_usage(budget, usage)
         )
     except HTTPException:
-        # Re-raise HTTP exceptions
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
         raise
     except Exception as e:
         # Clean up all temporary files in case of error
-        background_tasks.add_task(cleanup_temp_files, temp_files)
+        cleanup_temp_files(temp_files)
 
         logger.error(f"Error in chat with PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -155,58 +267,39 @@ async def summarize_pdf(
     length: str = Form("medium"),
     x_gemini_api_key: str = Header(...),
     model_name: str = Query("models/gemini-1.5-pro"),
+    no_cache: bool = Query(False),  # Generate a fresh response instead of using the cache
 ):
     """Summarize a PDF using Gemini API."""
     temp_files = []
 
     try:
-        # Parse the request JSON if provided
-        summarize_request = None
         if request:
-            try:
-                import json
-                summarize_request = SummarizeRequest.parse_obj(json.loads(request))
-            except Exception as e:
-                logger.error(f"Error parsing request JSON: {e}")
-                raise HTTPException(status_code=400, detail=f"Invalid request format: {str(e)}")
+            summarize_request = parse_request_json(SummarizeRequest, request)
         else:
-            # Create request from form parameters
-            summarize_request = SummarizeRequest(
-                pdf_id=pdf_id,
-                length=length
-            )
+            summarize_request = SummarizeRequest(pdf_id=pdf_id, length=length)
 
-        # Validate that either file or pdf_id is provided
-        if file is None and (summarize_request is None or summarize_request.pdf_id is None):
-            raise HTTPException(status_code=400, detail="Either file or pdf_id must be provided")
-
-        # Process file if provided
-        if file:
-            # Validate file is a PDF
-            if not file.filename.lower().endswith('.pdf'):
-                raise HTTPException(status_code=400, detail="File must be a PDF")
-
-            # Save uploaded file
-            temp_file_path = await save_upload_file(file)
-            temp_files.append(temp_file_path)
-
-            # Extract text from PDF
-            pdf_text = pdf_service.extract_text_from_pdf(temp_file_path)
-        else:
-            # Use pdf_id to get the file
-            pdf_id = summarize_request.pdf_id
-            pdf_path = os.path.join(settings.TEMP_FILE_DIR, f"{pdf_id}.pdf")
-            if not os.path.exists(pdf_path):
-                raise HTTPException(status_code=404, detail="PDF file not found")
-
-            # Extract text from PDF
-            pdf_text = pdf_service.extract_text_from_pdf(pdf_path)
+        pdf_path = await resolve_pdf_path(file, summarize_request.pdf_id, temp_files)
 
         # Use length from request
         summary_length = summarize_request.length
 
-        # Summarize PDF using Gemini API
-        summary = gemini_service.summarize_pdf(x_gemini_api_key, model_name, pdf_text, summary_length)
+        # Summarize PDF using Gemini API, section by section if it does not fit in one prompt,
+        # unless the same summary is cached
+        budget = None
+
+        async def summarize():
+            nonlocal budget
+            pages = await text_cache_service.get_pages(pdf_path)
+            sections, max_chars, budget = await summarization_service.plan_sections(x_gemini_api_key, model_name, pages)
+            return await summarization_service.summarize_sections(
+                x_gemini_api_key, model_name, sections, max_chars, summary_length
+            )
+
+        with token_service.track_usage() as usage:
+            summary = await response_cache_service.get_or_compute(
+                x_gemini_api_key, "summarize", model_name, {"length": summary_length}, pdf_path, summarize,
+                bypass=no_cache
+            )
         if summary is None:
             raise HTTPException(status_code=500, detail="Failed to generate summary from Gemini API")
 
@@ -214,13 +307,14 @@ async def summarize_pdf(
         background_tasks.add_task(cleanup_temp_files, temp_files)
 
         # Return response
-        return SummarizeResponse(summary=summary)
+        return SummarizeResponse(summary=summary, usage=token_usage(budget, usage))
     except HTTPException:
-        # Re-raise HTTP exceptions
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
         raise
     except Exception as e:
         # Clean up all temporary files in case of error
-        background_tasks.add_task(cleanup_temp_files, temp_files)
+        cleanup_temp_files(temp_files)
 
         logger.error(f"Error summarizing PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -234,60 +328,39 @@ async def translate_pdf(
     target_language: str = Form(...),
     x_gemini_api_key: str = Header(...),
     model_name: str = Query("models/gemini-1.5-pro"),
+    no_cache: bool = Query(False),  # Generate a fresh response instead of using the cache
 ):
     """Translate a PDF using Gemini API."""
     temp_files = []
 
     try:
-        # Parse the request JSON if provided
-        translate_request = None
         if request:
-            try:
-                import json
-                translate_request = TranslateRequest.parse_obj(json.loads(request))
-            except Exception as e:
-                logger.error(f"Error parsing request JSON: {e}")
-                raise HTTPException(status_code=400, detail=f"Invalid request format: {str(e)}")
+            translate_request = parse_request_json(TranslateRequest, request)
         else:
-            # Create request from form parameters
-            translate_request = TranslateRequest(
-                pdf_id=pdf_id,
-                target_language=target_language
-            )
-
-        # Validate that either file or pdf_id is provided
-        if file is None and (translate_request is None or translate_request.pdf_id is None):
-            raise HTTPException(status_code=400, detail="Either file or pdf_id must be provided")
-
-        # Process file if provided
-        if file:
-            # Validate file is a PDF
-            if not file.filename.lower().endswith('.pdf'):
-                raise HTTPException(status_code=400, detail="File must be a PDF")
+            translate_request = TranslateRequest(pdf_id=pdf_id, target_language=target_language)
 
-            # Save uploaded file
-            temp_file_path = await save_upload_file(file)
-            temp_files.append(temp_file_path)
-
-            # Extract text from PDF
-            pdf_text = pdf_service.extract_text_from_pdf(temp_file_path)
-        else:
-            # Use pdf_id to get the file
-            pdf_id = translate_request.pdf_id
-            pdf_path = os.path.join(settings.TEMP_FILE_DIR, f"{pdf_id}.pdf")
-            if not os.path.exists(pdf_path):
-                raise HTTPException(status_code=404, detail="PDF file not found")
-
-            # Extract text from PDF
-            pdf_text = pdf_service.extract_text_from_pdf(pdf_path)
+        pdf_path = await resolve_pdf_path(file, translate_request.pdf_id, temp_files)
 
         # Use target_language from request
         target_lang = translate_request.target_language
 
-        # Translate PDF using Gemini API
-        translated_text = gemini_service.translate_pdf(x_gemini_api_key, model_name, pdf_text, target_lang)
-        if translated_text is None:
+        # Translate PDF using Gemini API, chunk by chunk, unless the same translation is cached
+        budget = None
+
+        async def translate():
+            nonlocal budget
+            pages = await text_cache_service.get_pages(pdf_path)
+            budget = await translation_service.plan_pages(x_gemini_api_key, model_name, pages)
+            return await translation_service.translate_pages(x_gemini_api_key, model_name, pages, target_lang)
+
+        with token_service.track_usage() as usage:
+            translated_pages = await response_cache_service.get_or_compute(
+                x_gemini_api_key, "translate_pages", model_name, {"target_language": target_lang}, pdf_path, translate,
+                bypass=no_cache
+            )
+        if translated_pages is None:
             raise HTTPException(status_code=500, detail="Failed to generate translation from Gemini API")
+        translated_text = extraction_service.join_pages(translated_pages)
 
         # Schedule cleanup of temporary files
         background_tasks.add_task(cleanup_temp_files, temp_files)
@@ -295,14 +368,16 @@ async def translate_pdf(
         # Return response
         return TranslateResponse(
             translated_text=translated_text,
-            source_language="auto-detected"  # We don't explicitly detect the source language
+            source_language="auto-detected",  # We don't explicitly detect the source language
+            usage=token_usage(budget, usage)
         )
     except HTTPException:
-        # Re-raise HTTP exceptions
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
         raise
     except Exception as e:
         # Clean up all temporary files in case of error
-        background_tasks.add_task(cleanup_temp_files, temp_files)
+        cleanup_temp_files(temp_files)
 
         logger.error(f"Error translating PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -316,58 +391,38 @@ async def generate_questions(
     count: int = Form(5),
     x_gemini_api_key: str = Header(...),
     model_name: str = Query("models/gemini-1.5-pro"),
+    no_cache: bool = Query(False),  # Generate a fresh response instead of using the cache
 ):
     """Generate questions from a PDF using Gemini API."""
     temp_files = []
 
     try:
-        # Parse the request JSON if provided
-        questions_request = None
         if request:
-            try:
-                import json
-                questions_request = GenerateQuestionsRequest.parse_obj(json.loads(request))
-            except Exception as e:
-                logger.error(f"Error parsing request JSON: {e}")
-                raise HTTPException(status_code=400, detail=f"Invalid request format: {str(e)}")
-        else:
-            # Create request from form parameters
-            questions_request = GenerateQuestionsRequest(
-                pdf_id=pdf_id,
-                count=count
-            )
-
-        # Validate that either file or pdf_id is provided
-        if file is None and (questions_request is None or questions_request.pdf_id is None):
-            raise HTTPException(status_code=400, detail="Either file or pdf_id must be provided")
-
-        # Process file if provided
-        if file:
-            # Validate file is a PDF
-            if not file.filename.lower().endswith('.pdf'):
-                raise HTTPException(status_code=400, detail="File must be a PDF")
-
-            # Save uploaded file
-            temp_file_path = await save_upload_file(file)
-            temp_files.append(temp_file_path)
-
-            # Extract text from PDF
-            pdf_text = pdf_service.extract_text_from_pdf(temp_file_path)
+            questions_request = parse_request_json(GenerateQuestionsRequest, request)
         else:
-            # Use pdf_id to get the file
-            pdf_id = questions_request.pdf_id
-            pdf_path = os.path.join(settings.TEMP_FILE_DIR, f"{pdf_id}.pdf")
-            if not os.path.exists(pdf_path):
-                raise HTTPException(status_code=404, detail="PDF file not found")
+            questions_request = GenerateQuestionsRequest(pdf_id=pdf_id, count=count)
 
-            # Extract text from PDF
-            pdf_text = pdf_service.extract_text_from_pdf(pdf_path)
+        pdf_path = await resolve_pdf_path(file, questions_request.pdf_id, temp_files)
 
         # Use count from request
         question_count = questions_request.count
 
-        # Generate questions using Gemini API
-        questions = gemini_service.generate_questions(x_gemini_api_key, model_name, pdf_text, question_count)
+        # Generate questions using Gemini API, unless the same questions are cached
+        budget = None
+
+        async def generate():
+            nonlocal budget
+            # Documents too long for one prompt are cut off at the model's input limit
+            pdf_text, budget = await budget_service.trim_text(
+                x_gemini_api_key, model_name, await extract_pdf_text(pdf_path)
+            )
+            return await gemini_service.generate_questions(x_gemini_api_key, model_name, pdf_text, question_count)
+
+        with token_service.track_usage() as usage:
+            questions = await response_cache_service.get_or_compute(
+                x_gemini_api_key, "generate_questions", model_name, {"count": question_count}, pdf_path, generate,
+                bypass=no_cache
+            )
         if questions is None:
             raise HTTPException(status_code=500, detail="Failed to generate questions from Gemini API")
 
@@ -375,13 +430,153 @@ async def generate_questions(
         background_tasks.add_task(cleanup_temp_files, temp_files)
 
         # Return response
-        return GenerateQuestionsResponse(questions=questions)
+        return GenerateQuestionsResponse(questions=questions, usage=token_usage(budget, usage))
     except HTTPException:
-        # Re-raise HTTP exceptions
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
         raise
     except Exception as e:
         # Clean up all temporary files in case of error
-        background_tasks.add_task(cleanup_temp_files, temp_files)
+        cleanup_temp_files(temp_files)
 
         logger.error(f"Error generating questions from PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/stream")
+async def stream_chat_with_pdf(
+    file: Optional[UploadFile] = File(None),
+    request: Optional[str] = Form(None),
+    question: Optional[str] = Form(None),
+    pdf_id: Optional[str] = Form(None),
+    x_gemini_api_key: str = Header(...),
+    model_name: str = Query("models/gemini-1.5-pro"),
+):
+    """Chat with a PDF, streaming the answer as server-sent events."""
+    temp_files = []
+
+    try:
+        if request:
+            chat_request = parse_request_json(ChatRequest, request)
+        else:
+            chat_request = ChatRequest(question=question or "", pdf_id=pdf_id)
+
+        # Validate that question is provided
+        if not chat_request.question:
+            raise HTTPException(status_code=400, detail="Question is required")
+
+        pdf_path = await resolve_pdf_path(file, chat_request.pdf_id, temp_files)
+
+        # Only send the passages most relevant to the question, as many as fit in the prompt
+        chunks = await retrieval_service.retrieve(pdf_path, chat_request.question)
+        chunks, budget = await budget_service.fit_passages(x_gemini_api_key, model_name, chunks, chat_request.question)
+        pdf_text = retrieval_service.format_chunks(chunks)
+
+        answer = gemini_service.stream_chat_with_pdf(x_gemini_api_key, model_name, pdf_text, chat_request.question)
+        return event_stream_response(stream_events(
+            answer, temp_files,
+            done={"source_pages": retrieval_service.source_pages(chunks), "strategy": budget.strategy}
+        ))
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
+    except Exception as e:
+        # Clean up all temporary files in case of error
+        cleanup_temp_files(temp_files)
+
+        logger.error(f"Error in chat with PDF: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/summarize/stream")
+async def stream_summarize_pdf(
+    file: Optional[UploadFile] = File(None),
+    request: Optional[str] = Form(None),
+    pdf_id: Optional[str] = Form(None),
+    length: str = Form("medium"),
+    x_gemini_api_key: str = Header(...),
+    model_name: str = Query("models/gemini-1.5-pro"),
+    no_cache: bool = Query(False),  # Generate a fresh response instead of using the cache
+):
+    """Summarize a PDF, streaming the summary as server-sent events."""
+    temp_files = []
+
+    try:
+        if request:
+            summarize_request = parse_request_json(SummarizeRequest, request)
+        else:
+            summarize_request = SummarizeRequest(pdf_id=pdf_id, length=length)
+
+        pdf_path = await resolve_pdf_path(file, summarize_request.pdf_id, temp_files)
+        summary_length = summarize_request.length
+
+        # A cached summary is sent at once
+        cache_key, cached = await response_cache_service.lookup(
+            "summarize", model_name, {"length": summary_length}, pdf_path, bypass=no_cache
+        )
+        if cached is not None:
+            return event_stream_response(stream_events(cached_chunks(cached), temp_files, done={"cached": True}))
+
+        pages = await text_cache_service.get_pages(pdf_path)
+        sections, max_chars, budget = await summarization_service.plan_sections(x_gemini_api_key, model_name, pages)
+        summary = summarization_service.stream_summarize_sections(
+            x_gemini_api_key, model_name, sections, max_chars, summary_length
+        )
+        return event_stream_response(stream_events(
+            summary, temp_files, done={"cached": False, "strategy": budget.strategy}, cache_key=cache_key
+        ))
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
+    except Exception as e:
+        # Clean up all temporary files in case of error
+        cleanup_temp_files(temp_files)
+
+        logger.error(f"Error summarizing PDF: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/translate/stream")
+async def stream_translate_pdf(
+    file: Optional[UploadFile] = File(None),
+    request: Optional[str] = Form(None),
+    pdf_id: Optional[str] = Form(None),
+    target_language: str = Form(...),
+    x_gemini_api_key: str = Header(...),
+    model_name: str = Query("models/gemini-1.5-pro"),
+    no_cache: bool = Query(False),  # Generate a fresh response instead of using the cache
+):
+    """Translate a PDF, streaming each page as server-sent events once it is translated."""
+    temp_files = []
+
+    try:
+        if request:
+            translate_request = parse_request_json(TranslateRequest, request)
+        else:
+            translate_request = TranslateRequest(pdf_id=pdf_id, target_language=target_language)
+
+        pdf_path = await resolve_pdf_path(file, translate_request.pdf_id, temp_files)
+        target_lang = translate_request.target_language
+
+        # A cached translation is sent at once
+        cache_key, cached = await response_cache_service.lookup(
+            "translate_pages", model_name, {"target_language": target_lang}, pdf_path, bypass=no_cache
+        )
+        if cached is not None:
+            return event_stream_response(stream_page_events(cached_pages(cached), temp_files, done={"cached": True}))
+
+        pages = await text_cache_service.get_pages(pdf_path)
+        budget = await translation_service.plan_pages(x_gemini_api_key, model_name, pages)
+        translation = translation_service.iter_translated_pages(x_gemini_api_key, model_name, pages, target_lang)
+        return event_stream_response(stream_page_events(
+            translation, temp_files, done={"cached": False, "strategy": budget.strategy}, cache_key=cache_key
+        ))
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
+    except Exception as e:
+        # Clean up all temporary files in case of error
+        cleanup_temp_files(temp_files)
+
+        logger.error(f"Error translating PDF: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,136 @@
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+import os
+import json
+import uuid
+from app.services import batch_service, document_service, storage_service
+from app.services.upload_service import (
+    save_upload_file, cleanup_temp_files, expected_file_types, PDF_FILE_TYPES, IMAGE_FILE_TYPES,
+    EXTENSION_FILE_TYPES
+)
+from app.models.pdf_models import PDFOperationType
+from app.core.config import settings
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.post("")
+async def run_batch(
+    operation: PDFOperationType = Form(...),
+    params: str = Form("{}"),  # JSON object with the operation's form fields
+    files: Optional[List[UploadFile]] = File(None),
+    document_ids: Optional[str] = Form(None),  # Comma-separated registered document IDs or content digests of stored uploads
+    watermark_image: Optional[UploadFile] = File(None),
+):
+    """Apply the same operation to many files in parallel.
+
+    Streams newline-delimited JSON: one "result" line per file as it finishes,
+    then a "summary" line with the URL of a ZIP archive of all outputs. A file
+    that fails is reported in its result line without stopping the batch.
+    """
+    temp_files = []
+
+    try:
+        # Parse and validate the shared parameters
+        try:
+            batch_params = json.loads(params)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid params format: {str(e)}")
+        if not isinstance(batch_params, dict):
+            raise HTTPException(status_code=400, detail="params must be a JSON object")
+        try:
+            batch_service.validate_batch(operation, batch_params, watermark_image is not None)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        digests = [digest.strip() for digest in (document_ids or "").split(",") if digest.strip()]
+        input_count = len(files or []) + len(digests)
+        if input_count == 0:
+            raise HTTPException(status_code=400, detail="Provide files or document_ids")
+        if input_count > settings.MAX_BATCH_FILES:
+            raise HTTPException(status_code=400, detail=f"A batch can contain at most {settings.MAX_BATCH_FILES} files")
+
+        # Save watermark image if provided
+        watermark_image_path = None
+        if watermark_image:
+            watermark_image_path = await save_upload_file(watermark_image, IMAGE_FILE_TYPES)
+            temp_files.append(watermark_image_path)
+
+        # Load every input; one that cannot be loaded fails on its own
+        inputs = []
+        errors = {}
+        for file in files or []:
+            if operation == PDFOperationType.CONVERT_TO_PDF:
+                allowed_types = expected_file_types(file.filename)
+            else:
+                allowed_types = PDF_FILE_TYPES if file.filename.lower().endswith('.pdf') else None
+
+            path = None
+            if allowed_types is None:
+                errors[len(inputs)] = f"Unsupported file type: {file.filename}"
+            else:
+                try:
+                    path = await save_upload_file(file, allowed_types)
+                    temp_files.append(path)
+                except HTTPException as e:
+                    errors[len(inputs)] = e.detail
+            inputs.append((file.filename, path))
+
+        # Only convert-to-pdf takes stored files other than PDFs
+        extensions = EXTENSION_FILE_TYPES if operation == PDFOperationType.CONVERT_TO_PDF else (".pdf",)
+        for digest in digests:
+            path = storage_service.find_blob(digest, extensions)
+            if path is not None:
+                try:
+                    temp_files.append(storage_service.acquire(path))
+                except FileNotFoundError:
+                    path = None
+            elif operation != PDFOperationType.CONVERT_TO_PDF:
+                path = await document_service.open_document(digest)
+                if path is not None:
+                    temp_files.append(path)
+            if path is None:
+                errors[len(inputs)] = f"Document not found: {digest}"
+            inputs.append((f"{digest}{os.path.splitext(path)[1] if path else ''}", path))
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
+    except Exception as e:
+        # Clean up all temporary files in case of error
+        cleanup_temp_files(temp_files)
+
+        logger.error(f"Error preparing {operation.value} batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    batch_id = str(uuid.uuid4())
+
+    async def stream_results():
+        results = []
+        try:
+            async for result in batch_service.iter_batch(operation, batch_params, inputs, watermark_image_path, errors):
+                results.append(result)
+                yield json.dumps({"type": "result", **result}) + "\n"
+
+            archive_dir = await run_in_threadpool(batch_service.build_archive, batch_id, results)
+            succeeded = sum(1 for result in results if result["success"])
+            yield json.dumps({
+                "type": "summary",
+                "batch_id": batch_id,
+                "total": len(results),
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "archive_url": f"/api/v1/pdf/download-zip/{batch_id}" if archive_dir else None,
+            }) + "\n"
+        finally:
+            # The inputs are released once every file is done or the client disconnects
+            cleanup_temp_files(temp_files)
+
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Id": batch_id}
+    )
@@ -0,0 +1,81 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from typing import Any, Dict
+from app.services import document_service
+from app.services.upload_service import stream_upload_file, cleanup_temp_files, PDF_FILE_TYPES
+from app.models.document_models import DocumentResponse, PageGeometry
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Helper function to build a document response
+def to_document_response(document: Dict[str, Any]) -> DocumentResponse:
+    """Convert a registered document to its API response.
+
+    Args:
+        document: The document returned by document_service
+
+    Returns:
+        The document response
+    """
+    return DocumentResponse(
+        document_id=document["id"],
+        filename=document["filename"],
+        size=document["size"],
+        sha256=document["digest"],
+        status=document["status"],
+        page_count=document["page_count"],
+        pages=[PageGeometry(**page) for page in document["pages"]] if document["pages"] is not None else None,
+        error=document["error"],
+        created_at=document["created_at"],
+        used_at=document["used_at"]
+    )
+
+@router.post("", response_model=DocumentResponse, status_code=202)
+async def register_document(file: UploadFile = File(...)):
+    """Upload a PDF once and get an ID to use it with the PDF and AI endpoints.
+
+    The document is prepared in the background (page count, page geometry,
+    text and search index); poll it until its status is "ready", although it
+    can be used right away.
+    """
+    temp_files = []
+
+    try:
+        # Validate file is a PDF
+        if not file.filename.lower().endswith('.pdf'):
+            raise HTTPException(status_code=400, detail="File must be a PDF")
+
+        uploaded = await stream_upload_file(file, PDF_FILE_TYPES)
+        temp_files.append(uploaded.path)
+
+        # The registry now owns the uploaded file
+        document = await document_service.register_document(uploaded, file.filename)
+        temp_files.clear()
+
+        return to_document_response(document)
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
+    except Exception as e:
+        # Clean up all temporary files in case of error
+        cleanup_temp_files(temp_files)
+
+        logger.error(f"Error registering document: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{document_id}", response_model=DocumentResponse)
+async def get_document(document_id: str):
+    """Get a registered document and the state of its preparation."""
+    document = await document_service.get_document(document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    return to_document_response(document)
+
+@router.delete("/{document_id}", status_code=204)
+async def delete_document(document_id: str):
+    """Remove a registered document."""
+    if not await document_service.delete_document(document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
@@ -0,0 +1,119 @@
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from typing import List, Optional, Dict, Any
+import json
+from app.services import job_service
+from app.services.upload_service import (
+    save_upload_file, cleanup_temp_files, expected_file_types, PDF_FILE_TYPES, IMAGE_FILE_TYPES
+)
+from app.models.pdf_models import PDFOperationType, PDFResponse
+from app.models.job_models import JobResponse, JobStatus
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Helper function to build a job response
+def to_job_response(job: Dict[str, Any]) -> JobResponse:
+    """Convert a stored job to its API response.
+
+    Args:
+        job: The job returned by job_service
+
+    Returns:
+        The job response
+    """
+    return JobResponse(
+        job_id=job["id"],
+        operation=job["operation"],
+        status=job["status"],
+        progress=job["progress"],
+        message=job["message"],
+        result=PDFResponse(**job["result"]) if job["result"] else None,
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+        status_url=f"/api/v1/jobs/{job['id']}",
+        result_url=f"/api/v1/jobs/{job['id']}/result"
+    )
+
+@router.post("", response_model=JobResponse, status_code=202)
+async def submit_job(
+    operation: PDFOperationType = Form(...),
+    params: str = Form("{}"),  # JSON object with the operation's form fields
+    files: List[UploadFile] = File(...),
+    watermark_image: Optional[UploadFile] = File(None),
+):
+    """Queue a PDF operation and return immediately with a job ID."""
+    temp_files = []
+
+    try:
+        # Parse the operation parameters
+        try:
+            job_params = json.loads(params)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid params format: {str(e)}")
+        if not isinstance(job_params, dict):
+            raise HTTPException(status_code=400, detail="params must be a JSON object")
+
+        # Save uploaded files
+        for file in files:
+            if operation == PDFOperationType.CONVERT_TO_PDF:
+                allowed_types = expected_file_types(file.filename)
+                if allowed_types is None:
+                    raise HTTPException(status_code=400, detail=f"Unsupported file type: {file.filename}")
+            else:
+                if not file.filename.lower().endswith('.pdf'):
+                    raise HTTPException(status_code=400, detail="All files must be PDFs")
+                allowed_types = PDF_FILE_TYPES
+
+            temp_files.append(await save_upload_file(file, allowed_types))
+
+        # Save watermark image if provided
+        watermark_image_path = None
+        if watermark_image:
+            watermark_image_path = await save_upload_file(watermark_image, IMAGE_FILE_TYPES)
+
+        # Queue the job; it now owns the uploaded files
+        input_paths = list(temp_files)
+        if watermark_image_path:
+            temp_files.append(watermark_image_path)
+        try:
+            job = await job_service.submit_job(operation, job_params, input_paths, watermark_image_path)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return to_job_response(job)
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
+    except Exception as e:
+        # Clean up all temporary files in case of error
+        cleanup_temp_files(temp_files)
+
+        logger.error(f"Error submitting {operation.value} job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Get the status and progress of a job."""
+    job = await job_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return to_job_response(job)
+
+@router.get("/{job_id}/result", response_model=PDFResponse)
+async def get_job_result(job_id: str):
+    """Get the result of a finished job."""
+    job = await job_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job["status"] == JobStatus.FAILED.value:
+        return PDFResponse(success=False, message=job["message"], error=job["error"])
+
+    if job["status"] != JobStatus.SUCCEEDED.value:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+
+    return PDFResponse(**job["result"])
@@ -1,51 +1,51 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Query
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Dict, Any
 import os
+import re
+import json
+import time
 import uuid
-import shutil
-from app.services import pdf_service
-from app.models.pdf_models import PDFOperationType, PageRange, PDFResponse
+from app.services import (
+    executor_service, operation_service, janitor_service, archive_service, download_service, document_service
+)
+from app.services.upload_service import save_upload_file, cleanup_temp_files, expected_file_types, PDF_FILE_TYPES, IMAGE_FILE_TYPES
+from app.models.pdf_models import PDFOperationType, PageRange, PDFResponse, PipelineResponse
 from app.core.config import settings
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Helper function to save uploaded file
-async def save_upload_file(upload_file: UploadFile) -> str:
-    """Save an uploaded file to a temporary location.
+# Outputs are named after a random UUID (with an extension for files); the
+# download endpoints serve nothing else from TEMP_FILE_DIR
+OUTPUT_DIR_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+OUTPUT_FILE_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.[A-Za-z0-9]+$")
 
-    Args:
-        upload_file: The uploaded file
-
-    Returns:
-        Path to the saved file
-    """
-    # Create a unique filename
-    file_id = str(uuid.uuid4())
-    file_extension = os.path.splitext(upload_file.filename)[1]
-    temp_file_path = os.path.join(settings.TEMP_FILE_DIR, f"{file_id}{file_extension}")
+# Helper functions for the endpoints taking one PDF, uploaded or registered
+def validate_pdf_input(file: Optional[UploadFile], pdf_id: Optional[str]):
+    """Check that a PDF file or the ID of a registered document is provided."""
+    if file is None and pdf_id is None:
+        raise HTTPException(status_code=400, detail="Either file or pdf_id must be provided")
+    if file is not None and not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
 
-    # Save the file
-    with open(temp_file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
-
-    return temp_file_path
-
-# Helper function to clean up temporary files
-def cleanup_temp_files(file_paths: List[str]):
-    """Clean up temporary files.
+async def resolve_pdf_input(file: Optional[UploadFile], pdf_id: Optional[str], temp_files: List[str]) -> str:
+    """Save the uploaded PDF, or find the registered document with the given ID.
 
     Args:
-        file_paths: List of file paths to clean up
+        file: The uploaded PDF, if any
+        pdf_id: ID of a registered document, used when no file is uploaded
+        temp_files: List the saved upload or document is added to, for cleanup
+
+    Returns:
+        Path to the PDF file
     """
-    for path in file_paths:
-        try:
-            if os.path.exists(path):
-                os.remove(path)
-        except Exception as e:
-            logger.error(f"Error cleaning up temporary file {path}: {e}")
+    if file is not None:
+        temp_file_path = await save_upload_file(file, PDF_FILE_TYPES)
+        temp_files.append(temp_file_path)
+        return temp_file_path
+    return await document_service.find_pdf(pdf_id, temp_files)
 
 @router.post("/merge", response_model=PDFResponse)
 async def merge_pdfs(
@@ -61,7 +61,7 @@ async def merge_pdfs(
             if not file.filename.lower().endswith('.pdf'):
                 raise HTTPException(status_code=400, detail="All files must be PDFs")
 
-            temp_file_path = await save_upload_file(file)
+            temp_file_path = await save_upload_file(file, PDF_FILE_TYPES)
             temp_files.append(temp_file_path)
 
         # Create output file path
@@ -69,7 +69,10 @@ async def merge_pdfs(
         output_path = os.path.join(settings.TEMP_FILE_DIR, f"{output_file_id}.pdf")
 
         # Merge PDFs
-        pdf_service.merge_pdfs(temp_files, output_path)
+        await executor_service.run_pdf_operation("merge_pdfs", temp_files, output_path)
+
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
 
         # Schedule cleanup of temporary files (excluding the output file)
         background_tasks.add_task(cleanup_temp_files, temp_files)
@@ -81,10 +84,14 @@ async def merge_pdfs(
             file_path=output_path,
             download_url=f"/api/v1/pdf/download/{output_file_id}.pdf"
         )
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files + [os.path.join(settings.TEMP_FILE_DIR, f"{str(uuid.uuid4())}.pdf")]
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error merging PDFs: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -92,20 +99,19 @@ async def merge_pdfs(
 @router.post("/split", response_model=PDFResponse)
 async def split_pdf(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    pdf_id: Optional[str] = Form(None),  # ID of a registered document, instead of a file
     ranges: List[str] = Form(...),  # Format: "1-5,6-10,11-15"
 ):
     """Split a PDF into multiple PDFs based on page ranges."""
     temp_files = []
 
     try:
-        # Validate file is a PDF
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        # Validate that a PDF file or a registered document is provided
+        validate_pdf_input(file, pdf_id)
 
-        # Save uploaded file
-        temp_file_path = await save_upload_file(file)
-        temp_files.append(temp_file_path)
+        # Save uploaded file, or use the registered document
+        temp_file_path = await resolve_pdf_input(file, pdf_id, temp_files)
 
         # Parse page ranges
         page_ranges = []
@@ -130,7 +136,10 @@ async def split_pdf(
         os.makedirs(output_dir, exist_ok=True)
 
         # Split PDF
-        output_paths = pdf_service.split_pdf(temp_file_path, output_dir, page_ranges)
+        output_paths = await executor_service.run_pdf_operation("split_pdf", temp_file_path, output_dir, page_ranges)
+
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_dir)
 
         # Schedule cleanup of temporary files (excluding the output files)
         background_tasks.add_task(cleanup_temp_files, temp_files)
@@ -142,10 +151,14 @@ async def split_pdf(
             file_path=output_dir,
             download_url=f"/api/v1/pdf/download-zip/{output_dir_id}"
         )
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error splitting PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -153,27 +166,29 @@ async def split_pdf(
 @router.post("/extract-pages", response_model=PDFResponse)
 async def extract_pages(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    pdf_id: Optional[str] = Form(None),  # ID of a registered document, instead of a file
     pages: List[int] = Form(...),
 ):
     """Extract specific pages from a PDF."""
     temp_files = []
 
     try:
-        # Validate file is a PDF
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        # Validate that a PDF file or a registered document is provided
+        validate_pdf_input(file, pdf_id)
 
-        # Save uploaded file
-        temp_file_path = await save_upload_file(file)
-        temp_files.append(temp_file_path)
+        # Save uploaded file, or use the registered document
+        temp_file_path = await resolve_pdf_input(file, pdf_id, temp_files)
 
         # Create output file path
         output_file_id = str(uuid.uuid4())
         output_path = os.path.join(settings.TEMP_FILE_DIR, f"{output_file_id}.pdf")
 
         # Extract pages
-        pdf_service.extract_pages(temp_file_path, output_path, pages)
+        await executor_service.run_pdf_operation("extract_pages", temp_file_path, output_path, pages)
+
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
 
         # Schedule cleanup of temporary files (excluding the output file)
         background_tasks.add_task(cleanup_temp_files, temp_files)
@@ -185,10 +200,14 @@ async def extract_pages(
             file_path=output_path,
             download_url=f"/api/v1/pdf/download/{output_file_id}.pdf"
         )
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files + [os.path.join(settings.TEMP_FILE_DIR, f"{str(uuid.uuid4())}.pdf")]
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error extracting pages from PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -196,7 +215,8 @@ async def extract_pages(
 @router.post("/rotate", response_model=PDFResponse)
 async def rotate_pdf(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    pdf_id: Optional[str] = Form(None),  # ID of a registered document, instead of a file
     rotation: int = Form(...),  # 90, 180, or 270 degrees
     pages: Optional[List[int]] = Form(None),  # Optional list of pages to rotate
 ):
@@ -204,24 +224,25 @@ async def rotate_pdf(
     temp_files = []
 
     try:
-        # Validate file is a PDF
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        # Validate that a PDF file or a registered document is provided
+        validate_pdf_input(file, pdf_id)
 
         # Validate rotation angle
         if rotation not in [90, 180, 270]:
             raise HTTPException(status_code=400, detail="Rotation must be 90, 180, or 270 degrees")
 
-        # Save uploaded file
-        temp_file_path = await save_upload_file(file)
-        temp_files.append(temp_file_path)
+        # Save uploaded file, or use the registered document
+        temp_file_path = await resolve_pdf_input(file, pdf_id, temp_files)
 
         # Create output file path
         output_file_id = str(uuid.uuid4())
         output_path = os.path.join(settings.TEMP_FILE_DIR, f"{output_file_id}.pdf")
 
         # Rotate PDF
-        pdf_service.rotate_pdf(temp_file_path, output_path, rotation, pages)
+        await executor_service.run_pdf_operation("rotate_pdf", temp_file_path, output_path, rotation, pages)
+
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
 
         # Schedule cleanup of temporary files (excluding the output file)
         background_tasks.add_task(cleanup_temp_files, temp_files)
@@ -233,10 +254,14 @@ async def rotate_pdf(
             file_path=output_path,
             download_url=f"/api/v1/pdf/download/{output_file_id}.pdf"
         )
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files + [os.path.join(settings.TEMP_FILE_DIR, f"{str(uuid.uuid4())}.pdf")]
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error rotating PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -244,7 +269,8 @@ async def rotate_pdf(
 @router.post("/add-page-numbers", response_model=PDFResponse)
 async def add_page_numbers(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    pdf_id: Optional[str] = Form(None),  # ID of a registered document, instead of a file
     position: str = Form("bottom-center"),
     start_number: int = Form(1),
     format_str: str = Form("Page {page_num}"),
@@ -253,25 +279,26 @@ async def add_page_numbers(
     temp_files = []
 
     try:
-        # Validate file is a PDF
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        # Validate that a PDF file or a registered document is provided
+        validate_pdf_input(file, pdf_id)
 
         # Validate position
         valid_positions = ["top-left", "top-center", "top-right", "bottom-left", "bottom-center", "bottom-right"]
         if position not in valid_positions:
             raise HTTPException(status_code=400, detail=f"Position must be one of: {', '.join(valid_positions)}")
 
-        # Save uploaded file
-        temp_file_path = await save_upload_file(file)
-        temp_files.append(temp_file_path)
+        # Save uploaded file, or use the registered document
+        temp_file_path = await resolve_pdf_input(file, pdf_id, temp_files)
 
         # Create output file path
         output_file_id = str(uuid.uuid4())
         output_path = os.path.join(settings.TEMP_FILE_DIR, f"{output_file_id}.pdf")
 
         # Add page numbers
-        pdf_service.add_page_numbers(temp_file_path, output_path, position, start_number, format_str)
+        await executor_service.run_pdf_operation("add_page_numbers", temp_file_path, output_path, position, start_number, format_str)
+
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
 
         # Schedule cleanup of temporary files (excluding the output file)
         background_tasks.add_task(cleanup_temp_files, temp_files)
@@ -283,10 +310,14 @@ async def add_page_numbers(
             file_path=output_path,
             download_url=f"/api/v1/pdf/download/{output_file_id}.pdf"
         )
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files + [os.path.join(settings.TEMP_FILE_DIR, f"{str(uuid.uuid4())}.pdf")]
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error adding page numbers to PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -294,7 +325,8 @@ async def add_page_numbers(
 @router.post("/add-watermark", response_model=PDFResponse)
 async def add_watermark(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    pdf_id: Optional[str] = Form(None),  # ID of a registered document, instead of a file
     watermark_text: Optional[str] = Form(None),
     watermark_image: Optional[UploadFile] = File(None),
     opacity: float = Form(0.3),
@@ -306,9 +338,8 @@ async def add_watermark(
     watermark_image_path = None
 
     try:
-        # Validate file is a PDF
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        # Validate that a PDF file or a registered document is provided
+        validate_pdf_input(file, pdf_id)
 
         # Validate that either watermark_text or watermark_image is provided
         if watermark_text is None and watermark_image is None:
@@ -319,13 +350,12 @@ async def add_watermark(
         if position not in valid_positions:
             raise HTTPException(status_code=400, detail=f"Position must be one of: {', '.join(valid_positions)}")
 
-        # Save uploaded PDF file
-        temp_file_path = await save_upload_file(file)
-        temp_files.append(temp_file_path)
+        # Save uploaded file, or use the registered document
+        temp_file_path = await resolve_pdf_input(file, pdf_id, temp_files)
 
         # Save watermark image if provided
         if watermark_image:
-            watermark_image_path = await save_upload_file(watermark_image)
+            watermark_image_path = await save_upload_file(watermark_image, IMAGE_FILE_TYPES)
             temp_files.append(watermark_image_path)
 
         # Create output file path
@@ -333,7 +363,8 @@ async def add_watermark(
         output_path = os.path.join(settings.TEMP_FILE_DIR, f"{output_file_id}.pdf")
 
         # Add watermark
-        pdf_service.add_watermark(
+        await executor_service.run_pdf_operation(
+            "add_watermark",
             temp_file_path,
             output_path,
             watermark_text,
@@ -343,6 +374,9 @@ async def add_watermark(
             rotation
         )
 
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
+
         # Schedule cleanup of temporary files (excluding the output file)
         background_tasks.add_task(cleanup_temp_files, temp_files)
 
@@ -353,10 +387,14 @@ async def add_watermark(
             file_path=output_path,
             download_url=f"/api/v1/pdf/download/{output_file_id}.pdf"
         )
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files + [os.path.join(settings.TEMP_FILE_DIR, f"{str(uuid.uuid4())}.pdf")]
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error adding watermark to PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -364,7 +402,8 @@ async def add_watermark(
 @router.post("/crop", response_model=PDFResponse)
 async def crop_pdf(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    pdf_id: Optional[str] = Form(None),  # ID of a registered document, instead of a file
     left: float = Form(0),
     bottom: float = Form(0),
     right: float = Form(0),
@@ -375,20 +414,21 @@ async def crop_pdf(
     temp_files = []
 
     try:
-        # Validate file is a PDF
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        # Validate that a PDF file or a registered document is provided
+        validate_pdf_input(file, pdf_id)
 
-        # Save uploaded file
-        temp_file_path = await save_upload_file(file)
-        temp_files.append(temp_file_path)
+        # Save uploaded file, or use the registered document
+        temp_file_path = await resolve_pdf_input(file, pdf_id, temp_files)
 
         # Create output file path
         output_file_id = str(uuid.uuid4())
         output_path = os.path.join(settings.TEMP_FILE_DIR, f"{output_file_id}.pdf")
 
         # Crop PDF
-        pdf_service.crop_pdf(temp_file_path, output_path, left, bottom, right, top, pages)
+        await executor_service.run_pdf_operation("crop_pdf", temp_file_path, output_path, left, bottom, right, top, pages)
+
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
 
         # Schedule cleanup of temporary files (excluding the output file)
         background_tasks.add_task(cleanup_temp_files, temp_files)
@@ -400,10 +440,14 @@ async def crop_pdf(
             file_path=output_path,
             download_url=f"/api/v1/pdf/download/{output_file_id}.pdf"
         )
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files + [os.path.join(settings.TEMP_FILE_DIR, f"{str(uuid.uuid4())}.pdf")]
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error cropping PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -411,7 +455,8 @@ async def crop_pdf(
 @router.post("/protect", response_model=PDFResponse)
 async def protect_pdf(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    pdf_id: Optional[str] = Form(None),  # ID of a registered document, instead of a file
     user_password: Optional[str] = Form(None),
     owner_password: Optional[str] = Form(None),
     allow_print: bool = Form(True),
@@ -422,17 +467,15 @@ async def protect_pdf(
     temp_files = []
 
     try:
-        # Validate file is a PDF
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        # Validate that a PDF file or a registered document is provided
+        validate_pdf_input(file, pdf_id)
 
         # Validate that at least one password is provided
         if user_password is None and owner_password is None:
             raise HTTPException(status_code=400, detail="At least one of user_password or owner_password must be provided")
 
-        # Save uploaded file
-        temp_file_path = await save_upload_file(file)
-        temp_files.append(temp_file_path)
+        # Save uploaded file, or use the registered document
+        temp_file_path = await resolve_pdf_input(file, pdf_id, temp_files)
 
         # Create output file path
         output_file_id = str(uuid.uuid4())
@@ -446,7 +489,10 @@ async def protect_pdf(
         }
 
         # Protect PDF
-        pdf_service.protect_pdf(temp_file_path, output_path, user_password, owner_password, permissions)
+        await executor_service.run_pdf_operation("protect_pdf", temp_file_path, output_path, user_password, owner_password, permissions)
+
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
 
         # Schedule cleanup of temporary files (excluding the output file)
         background_tasks.add_task(cleanup_temp_files, temp_files)
@@ -458,10 +504,14 @@ async def protect_pdf(
             file_path=output_path,
             download_url=f"/api/v1/pdf/download/{output_file_id}.pdf"
         )
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files + [os.path.join(settings.TEMP_FILE_DIR, f"{str(uuid.uuid4())}.pdf")]
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error protecting PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -469,20 +519,19 @@ async def protect_pdf(
 @router.post("/unlock", response_model=PDFResponse)
 async def unlock_pdf(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    pdf_id: Optional[str] = Form(None),  # ID of a registered document, instead of a file
     password: str = Form(...),
 ):
     """Remove password protection from a PDF."""
     temp_files = []
 
     try:
-        # Validate file is a PDF
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        # Validate that a PDF file or a registered document is provided
+        validate_pdf_input(file, pdf_id)
 
-        # Save uploaded file
-        temp_file_path = await save_upload_file(file)
-        temp_files.append(temp_file_path)
+        # Save uploaded file, or use the registered document
+        temp_file_path = await resolve_pdf_input(file, pdf_id, temp_files)
 
         # Create output file path
         output_file_id = str(uuid.uuid4())
@@ -490,11 +539,14 @@ async def unlock_pdf(
 
         # Unlock PDF
         try:
-            pdf_service.unlock_pdf(temp_file_path, output_path, password)
+            await executor_service.run_pdf_operation("unlock_pdf", temp_file_path, output_path, password)
         except ValueError as ve:
             # Handle incorrect password
             raise HTTPException(status_code=400, detail=str(ve))
 
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
+
         # Schedule cleanup of temporary files (excluding the output file)
         background_tasks.add_task(cleanup_temp_files, temp_files)
 
@@ -506,12 +558,13 @@ async def unlock_pdf(
             download_url=f"/api/v1/pdf/download/{output_file_id}.pdf"
         )
     except HTTPException:
-        # Re-raise HTTP exceptions
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
         raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files + [os.path.join(settings.TEMP_FILE_DIR, f"{str(uuid.uuid4())}.pdf")]
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error unlocking PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -519,32 +572,34 @@ async def unlock_pdf(
 @router.post("/compress", response_model=PDFResponse)
 async def compress_pdf(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    pdf_id: Optional[str] = Form(None),  # ID of a registered document, instead of a file
     quality: str = Form("medium"),  # low, medium, high
 ):
     """Compress a PDF to reduce file size."""
     temp_files = []
 
     try:
-        # Validate file is a PDF
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        # Validate that a PDF file or a registered document is provided
+        validate_pdf_input(file, pdf_id)
 
         # Validate quality
         valid_qualities = ["low", "medium", "high"]
         if quality not in valid_qualities:
             raise HTTPException(status_code=400, detail=f"Quality must be one of: {', '.join(valid_qualities)}")
 
-        # Save uploaded file
-        temp_file_path = await save_upload_file(file)
-        temp_files.append(temp_file_path)
+        # Save uploaded file, or use the registered document
+        temp_file_path = await resolve_pdf_input(file, pdf_id, temp_files)
 
         # Create output file path
         output_file_id = str(uuid.uuid4())
         output_path = os.path.join(settings.TEMP_FILE_DIR, f"{output_file_id}.pdf")
 
         # Compress PDF
-        pdf_service.compress_pdf(temp_file_path, output_path, quality)
+        await executor_service.run_pdf_operation("compress_pdf", temp_file_path, output_path, quality)
+
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
 
         # Schedule cleanup of temporary files (excluding the output file)
         background_tasks.add_task(cleanup_temp_files, temp_files)
@@ -556,10 +611,14 @@ async def compress_pdf(
             file_path=output_path,
             download_url=f"/api/v1/pdf/download/{output_file_id}.pdf"
         )
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files + [os.path.join(settings.TEMP_FILE_DIR, f"{str(uuid.uuid4())}.pdf")]
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error compressing PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -567,19 +626,18 @@ async def compress_pdf(
 @router.post("/repair", response_model=PDFResponse)
 async def repair_pdf(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    pdf_id: Optional[str] = Form(None),  # ID of a registered document, instead of a file
 ):
     """Attempt to repair a corrupted PDF."""
     temp_files = []
 
     try:
-        # Validate file is a PDF
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        # Validate that a PDF file or a registered document is provided
+        validate_pdf_input(file, pdf_id)
 
-        # Save uploaded file
-        temp_file_path = await save_upload_file(file)
-        temp_files.append(temp_file_path)
+        # Save uploaded file, or use the registered document
+        temp_file_path = await resolve_pdf_input(file, pdf_id, temp_files)
 
         # Create output file path
         output_file_id = str(uuid.uuid4())
@@ -587,10 +645,13 @@ async def repair_pdf(
 
         # Repair PDF
         try:
-            pdf_service.repair_pdf(temp_file_path, output_path)
+            await executor_service.run_pdf_operation("repair_pdf", temp_file_path, output_path)
         except Exception as repair_error:
             raise HTTPException(status_code=400, detail=f"Could not repair PDF: {str(repair_error)}")
 
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
+
         # Schedule cleanup of temporary files (excluding the output file)
         background_tasks.add_task(cleanup_temp_files, temp_files)
 
@@ -602,82 +663,129 @@ async def repair_pdf(
             download_url=f"/api/v1/pdf/download/{output_file_id}.pdf"
         )
     except HTTPException:
-        # Re-raise HTTP exceptions
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
         raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files + [os.path.join(settings.TEMP_FILE_DIR, f"{str(uuid.uuid4())}.pdf")]
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error repairing PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/pipeline", response_model=PipelineResponse)
+async def run_pipeline(
+    background_tasks: BackgroundTasks,
+    file: Optional[UploadFile] = File(None),
+    pdf_id: Optional[str] = Form(None),  # ID of a registered document, instead of a file
+    steps: str = Form(...),  # JSON list of {"operation": ..., "params": {...}}
+    watermark_image: Optional[UploadFile] = File(None),
+):
+    """Apply several operations to a PDF in one request.
+
+    The document is parsed once, every step is applied in memory and the
+    result is written once, e.g. rotate, crop, add page numbers, add a
+    watermark and compress without intermediate files.
+    """
+    temp_files = []
+
+    try:
+        # Validate that a PDF file or a registered document is provided
+        validate_pdf_input(file, pdf_id)
+
+        # Parse and validate the steps
+        try:
+            pipeline_steps = operation_service.validate_pipeline(json.loads(steps), watermark_image is not None)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid steps format: {str(e)}")
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Save uploaded file, or use the registered document
+        temp_file_path = await resolve_pdf_input(file, pdf_id, temp_files)
+
+        # Save watermark image if provided
+        watermark_image_path = None
+        if watermark_image:
+            watermark_image_path = await save_upload_file(watermark_image, IMAGE_FILE_TYPES)
+            temp_files.append(watermark_image_path)
+
+        # Create output file path
+        output_file_id = str(uuid.uuid4())
+        output_path = os.path.join(settings.TEMP_FILE_DIR, f"{output_file_id}.pdf")
+
+        # Run all steps in one worker call
+        started = time.perf_counter()
+        try:
+            result = await executor_service.run_pdf_operation(
+                "run_pipeline", temp_file_path, output_path, pipeline_steps, watermark_image_path
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        total_seconds = time.perf_counter() - started
+
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
+
+        # Schedule cleanup of temporary files (excluding the output file)
+        background_tasks.add_task(cleanup_temp_files, temp_files)
+
+        # Return response with download URL and step timings
+        return PipelineResponse(
+            success=True,
+            message=f"Pipeline of {len(pipeline_steps)} steps completed successfully",
+            file_path=output_path,
+            download_url=f"/api/v1/pdf/download/{output_file_id}.pdf",
+            page_count=result["page_count"],
+            timings=result["timings"],
+            total_seconds=total_seconds
+        )
+    except HTTPException:
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
+        raise
+    except Exception as e:
+        # Clean up all temporary files in case of error
+        cleanup_temp_files(temp_files)
+
+        logger.error(f"Error running PDF pipeline: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/download/{file_name}")
 async def download_file(
     file_name: str,
-    background_tasks: BackgroundTasks,
+    request: Request,
 ):
-    """Download a processed PDF file."""
+    """Download a processed file, with support for resuming and conditional requests."""
     file_path = os.path.join(settings.TEMP_FILE_DIR, file_name)
 
-    if not os.path.exists(file_path):
+    if (not OUTPUT_FILE_PATTERN.match(file_name) or janitor_service.is_reserved(file_path)
+            or not os.path.isfile(file_path)):
         raise HTTPException(status_code=404, detail="File not found")
 
-    # Schedule file cleanup after a delay (e.g., 1 hour)
+    # Restart the expiry delay (settings.OUTPUT_TTL_SECONDS) on every download
     # This allows the user to download the file multiple times if needed
-    def delayed_cleanup():
-        import time
-        time.sleep(3600)  # 1 hour
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-    background_tasks.add_task(delayed_cleanup)
-
-    return FileResponse(
-        path=file_path,
-        filename=file_name,
-        media_type="application/pdf",
-        background=background_tasks
-    )
+    expires_at = janitor_service.register(file_path)
+
+    return await download_service.build_file_response(request, file_path, file_name, expires_at)
 
 @router.get("/download-zip/{dir_id}")
 async def download_zip(
     dir_id: str,
-    background_tasks: BackgroundTasks,
 ):
     """Download a zip file containing multiple processed PDFs."""
-    import zipfile
-    from io import BytesIO
-
     dir_path = os.path.join(settings.TEMP_FILE_DIR, dir_id)
 
-    if not os.path.exists(dir_path) or not os.path.isdir(dir_path):
+    if not OUTPUT_DIR_PATTERN.match(dir_id) or janitor_service.is_reserved(dir_path) or not os.path.isdir(dir_path):
         raise HTTPException(status_code=404, detail="Directory not found")
 
-    # Create a zip file in memory
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for file_name in os.listdir(dir_path):
-            file_path = os.path.join(dir_path, file_name)
-            if os.path.isfile(file_path):
-                zip_file.write(file_path, arcname=file_name)
-
-    # Schedule directory cleanup after a delay (e.g., 1 hour)
-    def delayed_cleanup():
-        import time
-        import shutil
-        time.sleep(3600)  # 1 hour
-        if os.path.exists(dir_path):
-            shutil.rmtree(dir_path)
+    # Restart the expiry delay (settings.OUTPUT_TTL_SECONDS) on every download
+    janitor_service.register(dir_path)
 
-    background_tasks.add_task(delayed_cleanup)
-
-    # Reset buffer position
-    zip_buffer.seek(0)
-
-    # Return the zip file
+    # Stream the zip file as it is built from the files on disk
     return StreamingResponse(
-        zip_buffer,
+        archive_service.iter_zip_directory(dir_path),
         media_type="application/zip",
         headers={"Content-Disposition": f"attachment; filename=pdf_files_{dir_id}.zip"}
     )
@@ -685,16 +793,16 @@ async def download_zip(
 @router.post("/convert-from-pdf", response_model=PDFResponse)
 async def convert_from_pdf(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    pdf_id: Optional[str] = Form(None),  # ID of a registered document, instead of a file
     format: str = Form(...),  # Target format (e.g., 'docx', 'txt', 'jpg', etc.)
 ):
     """Convert a PDF to another format."""
     temp_files = []
 
     try:
-        # Validate file is a PDF
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        # Validate that a PDF file or a registered document is provided
+        validate_pdf_input(file, pdf_id)
 
         # Validate format
         supported_formats = ["txt", "jpg", "jpeg", "png", "docx", "doc", "html", "rtf", "odt", "xlsx", "csv"]
@@ -704,9 +812,8 @@ async def convert_from_pdf(
                 detail=f"Unsupported format: {format}. Supported formats: {', '.join(supported_formats)}"
             )
 
-        # Save uploaded file
-        temp_file_path = await save_upload_file(file)
-        temp_files.append(temp_file_path)
+        # Save uploaded file, or use the registered document
+        temp_file_path = await resolve_pdf_input(file, pdf_id, temp_files)
 
         # Create output file path (without extension, will be added by the service)
         output_file_id = str(uuid.uuid4())
@@ -714,7 +821,7 @@ async def convert_from_pdf(
 
         # Convert PDF to the requested format
         try:
-            output_path = pdf_service.convert_from_pdf(temp_file_path, output_base_path, format)
+            output_path = await executor_service.run_pdf_operation("convert_from_pdf", temp_file_path, output_base_path, format)
         except ValueError as ve:
             # Handle specific conversion errors
             raise HTTPException(status_code=400, detail=str(ve))
@@ -722,6 +829,9 @@ async def convert_from_pdf(
             # Handle general conversion errors
             raise HTTPException(status_code=500, detail=f"Failed to convert PDF: {str(e)}")
 
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
+
         # Schedule cleanup of temporary files (excluding the output file)
         background_tasks.add_task(cleanup_temp_files, temp_files)
 
@@ -750,12 +860,13 @@ async def convert_from_pdf(
                 download_url=f"/api/v1/pdf/download/{file_id}{file_ext}"
             )
     except HTTPException:
-        # Re-raise HTTP exceptions
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
         raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files + [os.path.join(settings.TEMP_FILE_DIR, f"{str(uuid.uuid4())}.{format}")]
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error converting PDF to {format}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -789,8 +900,8 @@ async def convert_to_pdf(
                 detail=f"Unsupported file type: {file_extension}. Supported types: {', '.join(supported_extensions)}"
             )
 
-        # Save uploaded file
-        temp_file_path = await save_upload_file(file)
+        # Save uploaded file, checking its content matches the extension
+        temp_file_path = await save_upload_file(file, expected_file_types(file.filename))
         temp_files.append(temp_file_path)
 
         # Create output file path
@@ -798,7 +909,10 @@ async def convert_to_pdf(
         output_path = os.path.join(settings.TEMP_FILE_DIR, f"{output_file_id}.pdf")
 
         # Convert file to PDF
-        pdf_service.convert_to_pdf(temp_file_path, output_path)
+        await executor_service.run_pdf_operation("convert_to_pdf", temp_file_path, output_path)
+
+        # Outputs nobody downloads still expire
+        janitor_service.register(output_path)
 
         # Schedule cleanup of temporary files (excluding the output file)
         background_tasks.add_task(cleanup_temp_files, temp_files)
@@ -811,12 +925,13 @@ async def convert_to_pdf(
             download_url=f"/api/v1/pdf/download/{output_file_id}.pdf"
         )
     except HTTPException:
-        # Re-raise HTTP exceptions
+        # Clean up temporary files and re-raise HTTP exceptions
+        cleanup_temp_files(temp_files)
         raise
     except Exception as e:
         # Clean up all temporary files in case of error
         all_temp_files = temp_files + [os.path.join(settings.TEMP_FILE_DIR, f"{str(uuid.uuid4())}.pdf")]
-        background_tasks.add_task(cleanup_temp_files, all_temp_files)
+        cleanup_temp_files(all_temp_files)
 
         logger.error(f"Error converting file to PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,97 @@
+import io
+import os
+import zipfile
+import logging
+from typing import Iterable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Formats that are already compressed; deflating them again costs CPU for no gain
+STORED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png", ".gif", ".zip", ".docx", ".xlsx", ".pptx", ".odt"}
+
+# Size of the blocks read from disk and passed to the client
+ZIP_STREAM_CHUNK_SIZE = 256 * 1024
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable buffer that hands written bytes back to the streamer.
+
+    zipfile detects that the output cannot seek and writes each entry with a
+    data descriptor, so nothing needs to be patched after it is written.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain."""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_zip(files: Iterable[Tuple[str, str]], chunk_size: int = ZIP_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Stream a ZIP archive of files on disk without building it in memory.
+
+    Local headers and file data are yielded as each file is read, so memory
+    stays flat and the first bytes are available immediately. Entries switch
+    to ZIP64 automatically when they are large enough to need it.
+
+    Args:
+        files: (archive name, path) pairs to include
+        chunk_size: Number of bytes read from disk at a time
+
+    Yields:
+        Consecutive chunks of the archive
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", allowZip64=True) as zip_file:
+        for arcname, path in files:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            extension = os.path.splitext(arcname)[1].lower()
+            info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+            with open(path, "rb") as source, zip_file.open(info, "w") as entry:
+                while True:
+                    block = source.read(chunk_size)
+                    if not block:
+                        break
+                    entry.write(block)
+
+                    data = sink.drain()
+                    if data:
+                        yield data
+
+            # Data descriptor for the entry
+            data = sink.drain()
+            if data:
+                yield data
+
+    # Central directory
+    data = sink.drain()
+    if data:
+        yield data
+
+def iter_zip_directory(dir_path: str, chunk_size: int = ZIP_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Stream a ZIP archive of the files directly inside a directory.
+
+    Args:
+        dir_path: Directory whose files are archived
+        chunk_size: Number of bytes read from disk at a time
+
+    Yields:
+        Consecutive chunks of the archive
+    """
+    files = []
+    for file_name in sorted(os.listdir(dir_path)):
+        file_path = os.path.join(dir_path, file_name)
+        if os.path.isfile(file_path):
+            files.append((file_name, file_path))
+
+    return iter_zip(files, chunk_size)
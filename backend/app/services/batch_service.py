@@ -0,0 +1,127 @@
+import os
+import shutil
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.models.pdf_models import PDFOperationType
+from app.services import operation_service, janitor_service
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Applies one operation to many files. Files are processed concurrently in the
+# PDF worker pool and results are reported as they finish; a failing file only
+# produces a failed result. The outputs are gathered in a directory that the
+# existing /download-zip endpoint streams as one archive.
+
+def validate_batch(operation: PDFOperationType, params: Dict[str, Any],
+                   has_watermark_image: bool = False) -> Dict[str, Any]:
+    """Validate the operation and parameters shared by every file of a batch.
+
+    Raises:
+        ValueError: If the operation cannot be batched or the parameters are invalid
+    """
+    if operation == PDFOperationType.MERGE:
+        raise ValueError("merge combines its inputs and cannot be run as a batch")
+    return operation_service.validate_operation(operation, params, 1, has_watermark_image)
+
+async def iter_batch(operation: PDFOperationType, params: Dict[str, Any], inputs: List[Tuple[str, Optional[str]]],
+                     watermark_image_path: Optional[str] = None,
+                     errors: Optional[Dict[int, str]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Run an operation over many files and yield each result as it finishes.
+
+    Args:
+        operation: The operation to run on every file
+        params: Raw parameters (same names as the endpoint form fields)
+        inputs: (name, path) for every input; path is None for inputs that could not be loaded
+        watermark_image_path: Path to the watermark image, for add_watermark
+        errors: Error messages for the inputs that could not be loaded, by index
+
+    Yields:
+        Result dictionaries with index, filename, success, message, file_path,
+        download_url and error
+    """
+    errors = errors or {}
+    semaphore = asyncio.Semaphore(max(1, settings.BATCH_CONCURRENCY))
+
+    async def process(index: int, name: str, path: Optional[str]) -> Dict[str, Any]:
+        result = {"index": index, "filename": name, "success": False, "message": "Failed",
+                  "file_path": None, "download_url": None, "error": None}
+        if path is None:
+            result["error"] = errors.get(index, "File could not be loaded")
+            return result
+
+        async with semaphore:
+            try:
+                response = await operation_service.run_operation(operation, [path], params, watermark_image_path)
+            except Exception as e:
+                logger.error(f"Batch {operation.value} failed for {name}: {e}")
+                result["error"] = str(e)
+                return result
+
+        # Outputs nobody downloads still expire
+        janitor_service.register(response.file_path)
+        result.update(success=True, message=response.message, file_path=response.file_path,
+                      download_url=response.download_url)
+        return result
+
+    tasks = [asyncio.create_task(process(index, name, path)) for index, (name, path) in enumerate(inputs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Stop pending work if the client went away
+        for task in tasks:
+            task.cancel()
+
+def build_archive(batch_id: str, results: List[Dict[str, Any]]) -> Optional[str]:
+    """Gather the successful outputs of a batch into one directory.
+
+    Outputs are hard-linked (copied where links are not supported) so they
+    expire independently of the individual downloads.
+
+    Args:
+        batch_id: Name of the directory to create in the temporary directory
+        results: Results yielded by iter_batch
+
+    Returns:
+        Path to the directory, or None if no file succeeded
+    """
+    outputs = []
+    for result in sorted(results, key=lambda r: r["index"]):
+        if not result["success"]:
+            continue
+
+        stem = os.path.splitext(os.path.basename(result["filename"]))[0] or f"file_{result['index'] + 1}"
+        output_path = result["file_path"]
+        if os.path.isdir(output_path):
+            # Split produces a directory of parts
+            for part in sorted(os.listdir(output_path)):
+                outputs.append((f"{stem}_{part}", os.path.join(output_path, part)))
+        else:
+            outputs.append((f"{stem}{os.path.splitext(output_path)[1]}", output_path))
+
+    if not outputs:
+        return None
+
+    archive_dir = os.path.join(settings.TEMP_FILE_DIR, batch_id)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    used_names = set()
+    for name, path in outputs:
+        # Files with the same name get a numeric suffix
+        base, extension = os.path.splitext(name)
+        counter = 1
+        while name in used_names:
+            counter += 1
+            name = f"{base}_{counter}{extension}"
+        used_names.add(name)
+
+        target = os.path.join(archive_dir, name)
+        try:
+            os.link(path, target)
+        except OSError:
+            shutil.copyfile(path, target)
+
+    janitor_service.register(archive_dir)
+    return archive_dir
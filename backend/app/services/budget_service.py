@@ -0,0 +1,106 @@
+import logging
+from dataclasses import dataclass
+from fastapi import HTTPException
+from typing import List, Tuple
+from app.core.config import settings
+from app.services import gemini_service, token_service
+from app.services.retrieval_service import Chunk, format_chunks
+
+logger = logging.getLogger(__name__)
+
+# Prompt budgeting. Before calling Gemini, the AI endpoints estimate the size of
+# their prompt locally and compare it with the model's input token limit. A
+# prompt that fits is sent as is. Otherwise the endpoint uses one of these
+# strategies: trim the document, chunk it over several calls (summaries and
+# translations), or retrieve only the relevant passages (chat). A prompt that
+# cannot be made to fit is rejected before any call is made.
+
+# Strategies
+FIT = "fit"
+TRIM = "trim"
+CHUNK = "chunk"
+RETRIEVE = "retrieve"
+
+# Tokens reserved for the instructions around the document text
+PROMPT_OVERHEAD_TOKENS = 500
+
+class PromptTooLargeError(HTTPException):
+    """A prompt that does not fit in the model's input token limit, reported as 413."""
+
+    def __init__(self, estimated_tokens: int, input_token_limit: int):
+        super().__init__(
+            status_code=413,
+            detail=f"The prompt is estimated at {estimated_tokens} tokens, "
+                   f"above the model's input limit of {input_token_limit} tokens"
+        )
+        self.estimated_tokens = estimated_tokens
+        self.input_token_limit = input_token_limit
+
+@dataclass
+class Budget:
+    """How a prompt was fitted into the model's input token limit."""
+    strategy: str
+    input_token_limit: int
+    estimated_document_tokens: int
+
+async def input_token_limit(api_key: str, model_name: str) -> int:
+    """Get the input token limit of a model, or SUMMARY_DEFAULT_INPUT_TOKENS if it does not report one."""
+    limit = await gemini_service.get_input_token_limit(api_key, model_name)
+    return limit or settings.SUMMARY_DEFAULT_INPUT_TOKENS
+
+def document_budget(limit: int, *texts: str) -> int:
+    """Get the tokens left for the document once the instructions and the given texts are counted.
+
+    Raises:
+        PromptTooLargeError: If the instructions and texts alone exceed the limit
+    """
+    fixed = PROMPT_OVERHEAD_TOKENS + sum(token_service.estimate_tokens(text) for text in texts)
+    if fixed >= limit:
+        raise PromptTooLargeError(fixed, limit)
+    return limit - fixed
+
+async def trim_text(api_key: str, model_name: str, text: str, *other_texts: str) -> Tuple[str, Budget]:
+    """Fit a document in one prompt, cutting off its end if needed.
+
+    Args:
+        api_key: The Gemini API key provided by the user
+        model_name: The name of the Gemini model to use
+        text: The document text
+        other_texts: Other texts of the prompt, such as a question
+
+    Returns:
+        The text to send and how it was fitted
+    """
+    limit = await input_token_limit(api_key, model_name)
+    budget = document_budget(limit, *other_texts)
+    estimated = token_service.estimate_tokens(text)
+    if estimated <= budget:
+        return text, Budget(FIT, limit, estimated)
+
+    logger.info(f"Trimming a document of about {estimated} tokens to {budget} tokens")
+    text = token_service.trim_to_tokens(text, budget)
+    return text, Budget(TRIM, limit, token_service.estimate_tokens(text))
+
+async def fit_passages(api_key: str, model_name: str, chunks: List[Chunk], question: str) -> Tuple[List[Chunk], Budget]:
+    """Fit retrieved passages in one prompt, dropping the least relevant ones if needed.
+
+    Args:
+        api_key: The Gemini API key provided by the user
+        model_name: The name of the Gemini model to use
+        chunks: The retrieved passages with their scores, in document order
+        question: The user's question
+
+    Returns:
+        The passages to send, in document order, and how they were fitted
+    """
+    limit = await input_token_limit(api_key, model_name)
+    budget = document_budget(limit, question)
+    kept = list(range(len(chunks)))
+    estimated = token_service.estimate_tokens(format_chunks(chunks))
+    # Lowest score first; between equal scores, the later passage goes first
+    for dropped in sorted(range(len(chunks)), key=lambda i: (chunks[i].score, -i)):
+        if estimated <= budget:
+            break
+        kept.remove(dropped)
+        estimated = token_service.estimate_tokens(format_chunks([chunks[i] for i in kept]))
+    return [chunks[i] for i in kept], Budget(RETRIEVE, limit, estimated)
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Single-flight coalescing of identical concurrent work. The first caller for
+# a key starts the work as a task; callers arriving with the same key while it
+# runs wait on that task instead of repeating it, and all of them get its
+# result or its exception. The task is only cancelled when every caller
+# waiting on it has been cancelled, so one client disconnecting does not fail
+# the others.
+
+class _Flight:
+    """Work in progress for one key and the number of callers waiting on it."""
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+_flights: Dict[Tuple[str, str], _Flight] = {}
+# Per group: calls that started the work, and calls that joined work in progress
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"started": 0, "coalesced": 0})
+
+async def run(group: str, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """Run work once for all concurrent callers with the same key.
+
+    Args:
+        group: The kind of work (extract_text, summarize, ...), for the counters
+        key: Identifies the work within the group; callers with equal keys share it
+        compute: Coroutine function doing the work
+
+    Returns:
+        The result of the shared work
+    """
+    flight_key = (group, key)
+    flight = _flights.get(flight_key)
+    if flight is None:
+        flight = _flights[flight_key] = _Flight(asyncio.create_task(compute()))
+        flight.task.add_done_callback(lambda _: _flights.pop(flight_key, None))
+        _stats[group]["started"] += 1
+    else:
+        _stats[group]["coalesced"] += 1
+        logger.debug(f"Joined in-flight {group} work")
+
+    flight.waiters += 1
+    try:
+        return await asyncio.shield(flight.task)
+    except asyncio.CancelledError:
+        if flight.waiters == 1 and not flight.task.done():
+            # Nobody else is waiting for the result
+            flight.task.cancel()
+        raise
+    finally:
+        flight.waiters -= 1
+
+def stats() -> Dict[str, Any]:
+    """Get the coalescing counters per group and the work in progress."""
+    return {
+        "in_flight": len(_flights),
+        **{group: dict(counters) for group, counters in _stats.items()},
+    }
@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.models.document_models import DocumentStatus
+from app.services import executor_service, janitor_service, retrieval_service, storage_service, text_cache_service
+from app.services.upload_service import UploadedFile
+
+logger = logging.getLogger(__name__)
+
+# Registry of documents uploaded once and then used by id. A registered PDF
+# stays in the content-addressed store, referenced for as long as it is
+# registered, and is prepared in the background: page count and geometry are
+# stored with the registration, the page text goes to the text cache and the
+# retrieval index is built, so later operations on it start warm. Registrations
+# are rows in a local SQLite database; documents unused for
+# DOCUMENT_TTL_SECONDS are removed by the janitor, which every use reschedules,
+# or on startup or when next looked up. The ID of a document is all it takes
+# to use it, so IDs are never listed.
+janitor_service.reserve(settings.DOCUMENTS_DB_PATH)
+for suffix in ("-wal", "-shm", "-journal"):
+    janitor_service.reserve(settings.DOCUMENTS_DB_PATH + suffix)
+
+# Preparations in progress, by document ID
+_tasks: Dict[str, "asyncio.Task[None]"] = {}
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """Open an autocommit connection to the document database."""
+    connection = sqlite3.connect(settings.DOCUMENTS_DB_PATH, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+def init_db():
+    """Create the document table if needed."""
+    with _connect() as connection:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                page_count INTEGER,
+                pages TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        connection.execute("CREATE INDEX IF NOT EXISTS documents_used ON documents (used_at)")
+
+def _row_to_document(row: sqlite3.Row) -> Dict[str, Any]:
+    """Convert a database row to a document dictionary."""
+    document = dict(row)
+    document["pages"] = json.loads(document["pages"]) if document["pages"] else None
+    document["path"] = storage_service.blob_path(document["digest"])
+    return document
+
+def _is_expired(document: Dict[str, Any]) -> bool:
+    """Check whether a document has gone unused for longer than DOCUMENT_TTL_SECONDS."""
+    return document["used_at"] < time.time() - settings.DOCUMENT_TTL_SECONDS
+
+def _expiry_key(document_id: str) -> str:
+    """Get the name a document's expiry is scheduled under with the janitor."""
+    return f"document:{document_id}"
+
+def _schedule_expiry(document_id: str, used_at: float):
+    """Schedule the removal of a document once it has gone unused for DOCUMENT_TTL_SECONDS."""
+    janitor_service.register_deadline(_expiry_key(document_id), used_at + settings.DOCUMENT_TTL_SECONDS,
+                                      callback=_expire_document)
+
+def _remove(document_id: str, used_before: Optional[float] = None) -> Optional[str]:
+    """Delete a document's row, if it was last used before used_before when given.
+
+    Returns:
+        The digest of the document's file, or None if no row was deleted
+    """
+    with _connect() as connection:
+        row = connection.execute("SELECT digest, used_at FROM documents WHERE id = ?", (document_id,)).fetchone()
+        if row is None or (used_before is not None and row["used_at"] >= used_before):
+            return None
+        connection.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+        return row["digest"]
+
+def _expire_document(key: str):
+    """Remove a document that has gone unused and release its file. Called by the janitor."""
+    document_id = key[len(_expiry_key("")):]
+    digest = _remove(document_id, time.time() - settings.DOCUMENT_TTL_SECONDS)
+    if digest is not None:
+        storage_service.release(storage_service.blob_path(digest))
+        logger.info(f"Removed document {document_id}, unused for {settings.DOCUMENT_TTL_SECONDS}s")
+
+async def register_document(uploaded: UploadedFile, filename: str) -> Dict[str, Any]:
+    """Register an uploaded PDF and start preparing it.
+
+    The document takes over the store reference held on the upload and
+    releases it when the document is deleted or expires.
+
+    Args:
+        uploaded: The PDF saved by upload_service.stream_upload_file
+        filename: The client-supplied filename
+
+    Returns:
+        The registered document, still processing
+    """
+    now = time.time()
+    document_id = str(uuid.uuid4())
+
+    def insert():
+        with _connect() as connection:
+            connection.execute(
+                "INSERT INTO documents (id, digest, filename, size, status, created_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (document_id, uploaded.sha256, filename, uploaded.size, DocumentStatus.PROCESSING.value, now, now)
+            )
+
+    await run_in_threadpool(insert)
+    _schedule_expiry(document_id, now)
+    _start_preparation(document_id, uploaded.path)
+    return await get_document(document_id)
+
+async def get_document(document_id: str) -> Optional[Dict[str, Any]]:
+    """Get a document by ID, removing it if it has expired.
+
+    Args:
+        document_id: The document ID
+
+    Returns:
+        The document, or None if it does not exist
+    """
+    def select():
+        with _connect() as connection:
+            return connection.execute("SELECT * FROM documents WHERE id = ?", (document_id,)).fetchone()
+
+    row = await run_in_threadpool(select)
+    if row is None:
+        return None
+    document = _row_to_document(row)
+    if _is_expired(document):
+        await delete_document(document_id)
+        return None
+    return document
+
+async def delete_document(document_id: str) -> bool:
+    """Remove a document from the registry and release its file.
+
+    Requests already using the file keep their own reference to it.
+
+    Args:
+        document_id: The document ID
+
+    Returns:
+        Whether the document existed
+    """
+    digest = await run_in_threadpool(_remove, document_id)
+    if digest is None:
+        return False
+
+    janitor_service.cancel(_expiry_key(document_id))
+    task = _tasks.pop(document_id, None)
+    if task is not None:
+        task.cancel()
+    storage_service.release(storage_service.blob_path(digest))
+    return True
+
+async def open_document(document_id: str) -> Optional[str]:
+    """Take a reference to the file of a registered document and mark it used.
+
+    Args:
+        document_id: The document ID
+
+    Returns:
+        The path to the PDF, which the caller must hand to cleanup_temp_files
+        when done with it, or None if the document does not exist
+    """
+    document = await get_document(document_id)
+    if document is None:
+        return None
+    try:
+        path = storage_service.acquire(document["path"])
+    except FileNotFoundError:
+        logger.error(f"The file of document {document_id} is missing")
+        return None
+
+    now = time.time()
+
+    def touch():
+        with _connect() as connection:
+            connection.execute("UPDATE documents SET used_at = ? WHERE id = ?", (now, document_id))
+
+    await run_in_threadpool(touch)
+    _schedule_expiry(document_id, now)
+    return path
+
+async def find_pdf(pdf_id: str, temp_files: List[str]) -> str:
+    """Find the PDF an operation refers to by ID.
+
+    The ID is that of a registered document, or for older clients the name of
+    a PDF left in TEMP_FILE_DIR by a previous operation.
+
+    Args:
+        pdf_id: The document ID
+        temp_files: List the document's file is added to, for cleanup
+
+    Returns:
+        Path to the PDF file
+
+    Raises:
+        HTTPException: 404 if there is no such PDF
+    """
+    path = await open_document(pdf_id)
+    if path is not None:
+        temp_files.append(path)
+        return path
+
+    pdf_path = os.path.join(settings.TEMP_FILE_DIR, f"{pdf_id}.pdf")
+    # The ID must name a file in TEMP_FILE_DIR, not a path elsewhere
+    if os.path.basename(pdf_id) != pdf_id or not os.path.exists(pdf_path):
+        raise HTTPException(status_code=404, detail="PDF file not found")
+    return pdf_path
+
+def _finish_preparation(document_id: str, status: DocumentStatus, pages: Optional[List[Dict[str, Any]]] = None,
+                        error: Optional[str] = None):
+    """Record the outcome of a document's preparation."""
+    with _connect() as connection:
+        connection.execute(
+            "UPDATE documents SET status = ?, page_count = ?, pages = ?, error = ? WHERE id = ?",
+            (status.value, len(pages) if pages is not None else None,
+             json.dumps(pages) if pages is not None else None, error, document_id)
+        )
+
+async def _prepare(document_id: str, path: str):
+    """Compute the page geometry, page text and retrieval index of a document."""
+    try:
+        pages = await executor_service.run_pdf_operation("get_page_geometry", path)
+        await text_cache_service.get_pages(path)
+        await retrieval_service.get_index(path)
+        await run_in_threadpool(_finish_preparation, document_id, DocumentStatus.READY, pages)
+        logger.info(f"Prepared document {document_id} ({len(pages)} pages)")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Error preparing document {document_id}: {e}")
+        await run_in_threadpool(_finish_preparation, document_id, DocumentStatus.FAILED, error=str(e))
+    finally:
+        _tasks.pop(document_id, None)
+
+def _start_preparation(document_id: str, path: str):
+    """Prepare a document in the background."""
+    _tasks[document_id] = asyncio.create_task(_prepare(document_id, path))
+
+def _recover_documents() -> List[Dict[str, Any]]:
+    """Purge expired documents, re-reference the files of the others and schedule their expiry.
+
+    Returns:
+        The documents whose preparation was interrupted
+    """
+    with _connect() as connection:
+        rows = connection.execute("SELECT * FROM documents").fetchall()
+
+    pending = []
+    gone = []
+    for row in rows:
+        document = _row_to_document(row)
+        if _is_expired(document):
+            gone.append(document["id"])
+            continue
+        # Store references are held in memory, so take them again
+        try:
+            storage_service.acquire(document["path"])
+        except FileNotFoundError:
+            gone.append(document["id"])
+            continue
+        _schedule_expiry(document["id"], document["used_at"])
+        if document["status"] == DocumentStatus.PROCESSING.value:
+            pending.append(document)
+
+    if gone:
+        with _connect() as connection:
+            connection.executemany("DELETE FROM documents WHERE id = ?", [(document_id,) for document_id in gone])
+        logger.info(f"Removed {len(gone)} expired or missing documents")
+    return pending
+
+async def start_documents():
+    """Open the registry and resume interrupted preparations. Called on application startup."""
+    await run_in_threadpool(init_db)
+    for document in await run_in_threadpool(_recover_documents):
+        _start_preparation(document["id"], document["path"])
+
+async def stop_documents():
+    """Cancel the preparations in progress. Called on application shutdown.
+
+    Interrupted documents stay marked as processing and are prepared again on the next startup.
+    """
+    tasks = list(_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _tasks.clear()
+
+def stats() -> Dict[str, int]:
+    """Get the number of registered documents and of preparations in progress."""
+    with _connect() as connection:
+        documents = connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    return {"documents": documents, "preparing": len(_tasks)}
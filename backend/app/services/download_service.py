@@ -0,0 +1,204 @@
+import os
+import time
+import uuid
+import logging
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Iterator, List, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.services import storage_service
+
+logger = logging.getLogger(__name__)
+
+# Size of the blocks read from disk and passed to the client
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# Requests with more ranges than this get the full file instead
+MAX_RANGES = 16
+
+async def build_file_response(request: Request, file_path: str, filename: str,
+                              expires_at: Optional[float] = None, media_type: Optional[str] = None) -> Response:
+    """Serve a file with validators, conditional GET and byte-range support.
+
+    Args:
+        request: The incoming request (for Range and conditional headers)
+        file_path: Path to the file to serve
+        filename: Filename for the Content-Disposition header
+        expires_at: Unix timestamp after which the file is deleted, used for caching headers
+        media_type: Content type (guessed from the filename if not provided)
+
+    Returns:
+        A 200, 206, 304 or 416 response
+    """
+    stat = os.stat(file_path)
+    size = stat.st_size
+    media_type = media_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    # Strong ETag from the content hash, so identical outputs share a validator
+    digest = await run_in_threadpool(storage_service.file_digest, file_path)
+    etag = f'"{digest}"'
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    if expires_at is not None:
+        # Caches may keep the file until it is deleted, but not longer
+        max_age = max(0, int(expires_at - time.time()))
+        headers["Cache-Control"] = f"public, max-age={max_age}"
+        headers["Expires"] = formatdate(expires_at, usegmt=True)
+
+    if _is_not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if range_header and _if_range_matches(request, etag, last_modified):
+        ranges = _parse_range_header(range_header, size)
+        if ranges == []:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+        if ranges is not None and len(ranges) == 1:
+            start, end = ranges[0]
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                _iter_file_range(file_path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers=headers
+            )
+
+        if ranges is not None:
+            boundary = uuid.uuid4().hex
+            parts = [
+                (f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+                 f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n".encode("latin-1"), start, end)
+                for start, end in ranges
+            ]
+            closing = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            length = sum(len(header) + end - start + 1 for header, start, end in parts)
+            length += 2 * (len(parts) - 1) + len(closing)
+            headers["Content-Length"] = str(length)
+            return StreamingResponse(
+                _iter_multipart_ranges(file_path, parts, closing),
+                status_code=206,
+                media_type=f"multipart/byteranges; boundary={boundary}",
+                headers=headers
+            )
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(
+        _iter_file_range(file_path, 0, size - 1),
+        media_type=media_type,
+        headers=headers
+    )
+
+def _is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Evaluate If-None-Match, falling back to If-Modified-Since (RFC 9110 13.2.2)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: W/"x" matches "x"
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+def _if_range_matches(request: Request, etag: str, last_modified: str) -> bool:
+    """Check If-Range; a Range request is only honoured while the validator still matches."""
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    # Strong comparison for ETags, exact match for dates
+    return if_range == etag or if_range == last_modified
+
+def _parse_range_header(value: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """Parse a Range header into inclusive (start, end) byte ranges.
+
+    Args:
+        value: The Range header value
+        size: Size of the file in bytes
+
+    Returns:
+        The satisfiable ranges, an empty list if none are satisfiable,
+        or None if the header should be ignored and the full file served
+    """
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition("-")
+        if not dash:
+            return None
+        try:
+            if first == "":
+                # Suffix range: the last N bytes
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, end = max(0, size - length), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and end < start:
+                    return None
+                if start >= size:
+                    continue
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+
+        ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    # Merge overlapping or adjacent ranges
+    ranges.sort()
+    merged: List[Tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def _iter_file_range(file_path: str, start: int, end: int) -> Iterator[bytes]:
+    """Read an inclusive byte range of a file in chunks."""
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = file.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+def _iter_multipart_ranges(file_path: str, parts: List[Tuple[bytes, int, int]], closing: bytes) -> Iterator[bytes]:
+    """Yield a multipart/byteranges body."""
+    for index, (header, start, end) in enumerate(parts):
+        if index > 0:
+            yield b"\r\n"
+        yield header
+        yield from _iter_file_range(file_path, start, end)
+    yield closing
@@ -0,0 +1,114 @@
+import sys
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Optional
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# pdf_service functions that may be dispatched to the worker pool
+PDF_OPERATIONS = {
+    "extract_text_from_pdf",
+    "extract_text_pages",
+    "get_pdf_info",
+    "count_pages",
+    "get_page_geometry",
+    "merge_pdfs",
+    "split_pdf",
+    "extract_pages",
+    "rotate_pdf",
+    "add_page_numbers",
+    "add_watermark",
+    "crop_pdf",
+    "protect_pdf",
+    "unlock_pdf",
+    "compress_pdf",
+    "repair_pdf",
+    "run_pipeline",
+    "convert_from_pdf",
+    "convert_to_pdf",
+}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _run_in_worker(operation: str, args: tuple, kwargs: dict) -> Any:
+    """Run a pdf_service operation inside a worker process.
+
+    Args:
+        operation: Name of the pdf_service function to call
+        args: Positional arguments for the function
+        kwargs: Keyword arguments for the function
+
+    Returns:
+        The return value of the pdf_service function
+    """
+    # Imported here so the worker resolves the function in its own process
+    from app.services import pdf_service
+    return getattr(pdf_service, operation)(*args, **kwargs)
+
+def _create_executor() -> ProcessPoolExecutor:
+    """Create a process pool sized according to the settings."""
+    options = {"max_workers": settings.PDF_WORKERS}
+    if settings.PDF_WORKER_MAX_TASKS > 0:
+        # ProcessPoolExecutor only takes max_tasks_per_child from Python 3.11
+        if sys.version_info >= (3, 11):
+            options["max_tasks_per_child"] = settings.PDF_WORKER_MAX_TASKS
+        else:
+            logger.warning("PDF_WORKER_MAX_TASKS requires Python 3.11 or later; workers will not be recycled")
+    return ProcessPoolExecutor(**options)
+
+def start_executor():
+    """Start the PDF worker pool. Called on application startup."""
+    global _executor
+    if _executor is not None or settings.PDF_WORKERS <= 0:
+        return
+
+    _executor = _create_executor()
+    logger.info(f"Started PDF worker pool with {settings.PDF_WORKERS} processes")
+
+def shutdown_executor():
+    """Shut down the PDF worker pool. Called on application shutdown."""
+    global _executor
+    if _executor is None:
+        return
+
+    _executor.shutdown(wait=True, cancel_futures=True)
+    _executor = None
+    logger.info("PDF worker pool shut down")
+
+async def run_pdf_operation(operation: str, *args, **kwargs) -> Any:
+    """Run a CPU-bound pdf_service operation without blocking the event loop.
+
+    The operation runs in the process pool when it has been started, and falls
+    back to the threadpool otherwise (e.g. PDF_WORKERS=0 for local debugging).
+
+    Args:
+        operation: Name of the pdf_service function to call
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+
+    Returns:
+        The return value of the pdf_service function
+    """
+    global _executor
+    if operation not in PDF_OPERATIONS:
+        raise ValueError(f"Unknown PDF operation: {operation}")
+
+    if _executor is None:
+        return await run_in_threadpool(_run_in_worker, operation, args, kwargs)
+
+    executor = _executor
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor, _run_in_worker, operation, args, kwargs)
+    except BrokenProcessPool:
+        # A worker died (e.g. a crash in a native PDF library); replace the pool
+        # so later requests are not affected, and report this one as failed
+        if _executor is executor:
+            logger.error(f"PDF worker pool broken while running {operation}, restarting it")
+            _executor = _create_executor()
+            executor.shutdown(wait=False, cancel_futures=True)
+        raise RuntimeError(f"PDF worker crashed while running {operation}")
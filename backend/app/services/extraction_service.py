@@ -0,0 +1,40 @@
+import math
+import asyncio
+import logging
+from typing import List
+from app.services import executor_service
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Separator placed after every page when pages are joined into one text
+PAGE_SEPARATOR = "\n\n"
+
+async def extract_pages(pdf_path: str) -> List[str]:
+    """Extract the text of every page, spreading large documents over the worker pool.
+
+    The pages are split into contiguous shards, one or more per worker, that
+    are extracted concurrently and reassembled in page order.
+
+    Args:
+        pdf_path: Path to the PDF file
+
+    Returns:
+        The text of each page, in page order
+    """
+    total_pages = await executor_service.run_pdf_operation("count_pages", pdf_path)
+
+    workers = max(1, settings.PDF_WORKERS)
+    shard_size = max(settings.TEXT_EXTRACTION_SHARD_PAGES, math.ceil(total_pages / workers))
+    if total_pages <= shard_size:
+        return await executor_service.run_pdf_operation("extract_text_pages", pdf_path)
+
+    shards = await asyncio.gather(*[
+        executor_service.run_pdf_operation("extract_text_pages", pdf_path, start, start + shard_size)
+        for start in range(0, total_pages, shard_size)
+    ])
+    return [text for shard in shards for text in shard]
+
+def join_pages(pages: List[str]) -> str:
+    """Join page texts into the document text, in the format of pdf_service.extract_text_from_pdf."""
+    return "".join(text + PAGE_SEPARATOR for text in pages)
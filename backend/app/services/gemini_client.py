@@ -0,0 +1,447 @@
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+import httpx
+from app.core.config import settings
+from app.services import token_service
+
+logger = logging.getLogger(__name__)
+
+# Async client for the Gemini REST API. Every API key gets its own client,
+# holding the key and a semaphore that caps the calls in flight with it (held
+# per attempt, not while waiting to retry); all clients share one HTTP
+# connection pool. Keys are never stored in the
+# clear: clients are looked up by the SHA-256 of the key. Streaming calls use
+# the server-sent-event form of streamGenerateContent. Point
+# GEMINI_API_BASE_URL at a local server to test without the real API.
+#
+# Calls are rate limited per key and model by a token bucket, so a burst of
+# requests waits in line instead of being rejected by the API. Rate limited
+# (429), failed (5xx) and unreachable calls are retried with jittered
+# exponential backoff, or after the delay the API asks for; a 429 also pauses
+# the bucket so the calls queued behind it wait too.
+
+class GeminiAPIError(Exception):
+    """An error response (or no response) from the Gemini API."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None,
+                 retryable: Optional[bool] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        # Rate limits and server errors are transient, other errors would fail again
+        if retryable is None:
+            retryable = status_code is not None and (status_code == 429 or status_code >= 500)
+        self.retryable = retryable
+
+@dataclass
+class GenerationResult:
+    """Text generated by a model and the token usage reported for it."""
+    text: str
+    usage: Dict[str, int] = field(default_factory=dict)
+
+class TokenBucket:
+    """Rate limiter letting calls through at a sustained rate, with bursts up to its capacity.
+
+    Callers wait in arrival order for a token instead of failing.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.waiting = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    async def acquire(self):
+        """Wait for a token and take it."""
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    self._refill()
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    # Also covers a pause, during which updated is in the future
+                    wait = max(self.updated - time.monotonic(), 0) + (1 - self.tokens) / self.rate
+                    await asyncio.sleep(wait)
+        finally:
+            self.waiting -= 1
+
+    def pause(self, delay: float):
+        """Hand out no tokens for delay seconds, then refill from empty."""
+        self._refill()
+        self.tokens = 0
+        self.updated = max(self.updated, time.monotonic() + delay)
+
+_lock = threading.Lock()
+_clients: "OrderedDict[str, GeminiClient]" = OrderedDict()
+_http: Optional[httpx.AsyncClient] = None
+# Retried calls, and how many of them were rate limited
+_stats = {"retries": 0, "rate_limited": 0}
+
+# "retryDelay": "7s" in the RetryInfo detail of a 429 response
+_RETRY_DELAY_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)s$")
+
+def key_hash(api_key: str) -> str:
+    """Get the identifier of an API key used for caching and logging."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+def model_path(model_name: str) -> str:
+    """Normalize a model name to the "models/<id>" form used in API paths."""
+    return model_name if model_name.startswith(("models/", "tunedModels/")) else f"models/{model_name}"
+
+def _http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, creating it on first use."""
+    global _http
+    if _http is None or _http.is_closed:
+        _http = httpx.AsyncClient(
+            base_url=settings.GEMINI_API_BASE_URL,
+            timeout=httpx.Timeout(settings.GEMINI_TIMEOUT_SECONDS, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.GEMINI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GEMINI_MAX_CONNECTIONS
+            ),
+        )
+    return _http
+
+class GeminiClient:
+    """Gemini API calls made with one API key."""
+
+    def __init__(self, api_key: str):
+        self._api_key = api_key
+        self.key_hash = key_hash(api_key)
+        self._semaphore = asyncio.Semaphore(max(1, settings.GEMINI_MAX_CONCURRENCY_PER_KEY))
+        # Calls waiting for the semaphore, calls holding it, and calls being sent
+        # (including those waiting for a rate limiter or to retry)
+        self._waiting = 0
+        self._in_flight = 0
+        self._active = 0
+        # Rate limiters per model; "" for the calls that do not use a model
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, model_name: Optional[str]) -> TokenBucket:
+        """Get the rate limiter of a model, creating it on first use."""
+        name = model_path(model_name) if model_name else ""
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = TokenBucket(
+                settings.GEMINI_REQUESTS_PER_MINUTE / 60, settings.GEMINI_BURST_REQUESTS
+            )
+        return bucket
+
+    def queued(self) -> int:
+        """Count the calls waiting for the rate limiters or the concurrency limit of this key."""
+        return self._waiting + sum(bucket.waiting for bucket in list(self._buckets.values()))
+
+    def busy(self) -> bool:
+        """Check whether calls are in flight or waiting with this key."""
+        return self._active > 0 or self._in_flight > 0
+
+    async def _acquire_slot(self):
+        """Wait until fewer than GEMINI_MAX_CONCURRENCY_PER_KEY calls are in flight with this key."""
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+
+    async def _send(self, model_name: Optional[str], method: str, path: str, stream: bool = False,
+                    **kwargs) -> httpx.Response:
+        """Send a request once the rate and concurrency limits allow it, retrying transient failures.
+
+        The concurrency slot is only held while a request is in flight, so
+        waiting to retry does not hold up the other calls of the key.
+
+        Args:
+            model_name: The model the call uses, selecting its rate limiter
+            method: The HTTP method
+            path: The API path
+            stream: Whether to return before reading the response body
+            kwargs: Other arguments of the request
+
+        Returns:
+            The successful response; with stream, the caller must close it and
+            then call _release_slot()
+
+        Raises:
+            GeminiAPIError: If the call fails for good or runs out of retries
+        """
+        self._active += 1
+        try:
+            bucket = self._bucket(model_name)
+            client = _http_client()
+            attempt = 0
+            while True:
+                await bucket.acquire()
+                await self._acquire_slot()
+                release = True
+                try:
+                    request = client.build_request(method, path, headers={"x-goog-api-key": self._api_key}, **kwargs)
+                    response = await client.send(request, stream=stream)
+                    if response.status_code < 400:
+                        # A stream keeps its slot until it has been read
+                        release = not stream
+                        return response
+                    if stream:
+                        await response.aread()
+                        await response.aclose()
+                    error = _error_from_response(response)
+                except httpx.HTTPError as e:
+                    error = GeminiAPIError(f"Could not reach the Gemini API: {e}", retryable=True)
+                finally:
+                    if release:
+                        self._release_slot()
+
+                if not error.retryable or attempt >= settings.GEMINI_MAX_RETRIES:
+                    raise error
+                delay = _backoff(attempt, error.retry_after)
+                if error.status_code == 429:
+                    bucket.pause(delay)
+                    _stats["rate_limited"] += 1
+                _stats["retries"] += 1
+                attempt += 1
+                logger.warning(f"Gemini call failed for key {self.key_hash[:8]} ({error}), "
+                               f"retry {attempt} of {settings.GEMINI_MAX_RETRIES} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        finally:
+            self._active -= 1
+
+    def _release_slot(self):
+        """Free the concurrency slot taken for a call."""
+        self._in_flight -= 1
+        self._semaphore.release()
+
+    async def _request(self, method: str, path: str, model_name: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """Send a request with this client's key and decode the JSON response."""
+        response = await self._send(model_name, method, path, **kwargs)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise GeminiAPIError("Invalid response from the Gemini API", response.status_code) from e
+
+    async def list_models(self) -> List[Dict[str, Any]]:
+        """List every model available to this key."""
+        models = []
+        params = {"pageSize": 1000}
+        while True:
+            data = await self._request("GET", "/models", params=params)
+            models.extend(data.get("models", []))
+            if not data.get("nextPageToken"):
+                return models
+            params["pageToken"] = data["nextPageToken"]
+
+    async def get_model(self, model_name: str) -> Dict[str, Any]:
+        """Get the description of one model."""
+        return await self._request("GET", f"/{model_path(model_name)}")
+
+    async def generate_content(self, model_name: str, prompt: str,
+                               generation_config: Optional[Dict[str, Any]] = None) -> GenerationResult:
+        """Generate text from a prompt.
+
+        Args:
+            model_name: The name of the Gemini model to use
+            prompt: The prompt text
+            generation_config: Optional generation settings (temperature, maxOutputTokens, ...)
+
+        Returns:
+            The generated text and its token usage, with the local estimate of the prompt tokens
+
+        Raises:
+            GeminiAPIError: If the call fails or the response has no text
+        """
+        body: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if generation_config:
+            body["generationConfig"] = generation_config
+
+        estimated_tokens = token_service.estimate_tokens(prompt)
+        data = await self._request("POST", f"/{model_path(model_name)}:generateContent", model_name, json=body)
+        usage = {"estimated_prompt_tokens": estimated_tokens, **usage_metadata(data)}
+        token_service.record_usage(usage)
+
+        text = response_text(data)
+        if text is None:
+            reason = (data.get("promptFeedback") or {}).get("blockReason") or _finish_reason(data) or "no candidates"
+            raise GeminiAPIError(f"Gemini returned no text ({reason})")
+        return GenerationResult(text=text, usage=usage)
+
+    async def stream_generate_content(self, model_name: str, prompt: str,
+                                      generation_config: Optional[Dict[str, Any]] = None) -> AsyncIterator[GenerationResult]:
+        """Generate text from a prompt, yielding it as the model produces it.
+
+        Closing the iterator early closes the connection, which stops the generation.
+
+        Args:
+            model_name: The name of the Gemini model to use
+            prompt: The prompt text
+            generation_config: Optional generation settings (temperature, maxOutputTokens, ...)
+
+        Yields:
+            Pieces of the generated text; the usage, with the local estimate of the
+            prompt tokens, is set on the pieces that report it, the last one
+            carrying the totals
+
+        Raises:
+            GeminiAPIError: If the call fails
+        """
+        body: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if generation_config:
+            body["generationConfig"] = generation_config
+
+        estimated_tokens = token_service.estimate_tokens(prompt)
+        usage: Dict[str, int] = {}
+        # Only opening the stream is retried: text already yielded cannot be taken back
+        response = await self._send(
+            model_name, "POST", f"/{model_path(model_name)}:streamGenerateContent", stream=True,
+            params={"alt": "sse"}, json=body
+        )
+        try:
+            async for line in response.aiter_lines():
+                # Every event is a single "data:" line holding a partial response
+                if not line.startswith("data:"):
+                    continue
+                try:
+                    data = json.loads(line[len("data:"):])
+                except ValueError as e:
+                    raise GeminiAPIError("Invalid response from the Gemini API", response.status_code) from e
+                chunk_usage = {}
+                if data.get("usageMetadata"):
+                    chunk_usage = usage = {"estimated_prompt_tokens": estimated_tokens, **usage_metadata(data)}
+                yield GenerationResult(text=response_text(data) or "", usage=chunk_usage)
+        except httpx.HTTPError as e:
+            raise GeminiAPIError(f"Could not reach the Gemini API: {e}") from e
+        finally:
+            try:
+                await response.aclose()
+            finally:
+                self._release_slot()
+        # Counts are cumulative, so the last ones reported cover the whole response
+        token_service.record_usage(usage)
+
+def get_client(api_key: str) -> GeminiClient:
+    """Get the client for an API key, creating it on first use.
+
+    Args:
+        api_key: The Gemini API key provided by the user
+
+    Returns:
+        The cached client for the key
+    """
+    digest = key_hash(api_key)
+    with _lock:
+        client = _clients.get(digest)
+        if client is None:
+            client = _clients[digest] = GeminiClient(api_key)
+            _evict_idle_clients()
+        else:
+            _clients.move_to_end(digest)
+        return client
+
+def _evict_idle_clients():
+    """Drop the least recently used clients beyond GEMINI_CLIENT_CACHE_SIZE. Caller holds _lock.
+
+    Clients with calls in flight or waiting are kept, even above the limit:
+    evicting one would give its key a second concurrency limit and rate limiter.
+    """
+    excess = len(_clients) - settings.GEMINI_CLIENT_CACHE_SIZE
+    if excess <= 0:
+        return
+    idle = []
+    for digest, client in _clients.items():
+        if len(idle) == excess:
+            break
+        if not client.busy():
+            idle.append(digest)
+    for digest in idle:
+        del _clients[digest]
+
+async def close_clients():
+    """Close the shared connection pool. Called on application shutdown."""
+    global _http
+    with _lock:
+        _clients.clear()
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+def stats() -> Dict[str, int]:
+    """Get the calls waiting for a rate or concurrency limit and the retry counters."""
+    with _lock:
+        clients = list(_clients.values())
+    return {"queued": sum(client.queued() for client in clients), **_stats}
+
+def response_text(data: Dict[str, Any]) -> Optional[str]:
+    """Get the text of the first candidate of a generateContent response."""
+    for candidate in data.get("candidates") or []:
+        parts = (candidate.get("content") or {}).get("parts") or []
+        texts = [part["text"] for part in parts if "text" in part]
+        if texts:
+            return "".join(texts)
+    return None
+
+def usage_metadata(data: Dict[str, Any]) -> Dict[str, int]:
+    """Get the token counts reported in a generateContent response."""
+    usage = data.get("usageMetadata") or {}
+    return {
+        "prompt_tokens": usage.get("promptTokenCount", 0),
+        "output_tokens": usage.get("candidatesTokenCount", 0),
+        "total_tokens": usage.get("totalTokenCount", 0),
+    }
+
+def _finish_reason(data: Dict[str, Any]) -> Optional[str]:
+    """Get the finish reason of the first candidate, if any."""
+    candidates = data.get("candidates") or []
+    return candidates[0].get("finishReason") if candidates else None
+
+def _backoff(attempt: int, retry_after: Optional[float]) -> float:
+    """Get the delay before retrying a call.
+
+    Args:
+        attempt: Number of retries already made
+        retry_after: Delay asked for by the API, if any
+
+    Returns:
+        The delay in seconds: the one asked for, or an exponential delay with
+        random jitter so that calls failing together do not retry together
+    """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, settings.GEMINI_BACKOFF_BASE_SECONDS / 2)
+    delay = min(settings.GEMINI_BACKOFF_MAX_SECONDS, settings.GEMINI_BACKOFF_BASE_SECONDS * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+def _error_from_response(response: httpx.Response) -> GeminiAPIError:
+    """Build an error from a Gemini error response."""
+    retry_after = None
+    try:
+        error = response.json().get("error", {})
+        message = error.get("message") or response.text
+        for detail in error.get("details") or []:
+            match = _RETRY_DELAY_PATTERN.match(str(detail.get("retryDelay", "")))
+            if match:
+                retry_after = float(match.group(1))
+    except (ValueError, AttributeError):
+        message = response.text
+
+    if "retry-after" in response.headers:
+        try:
+            retry_after = float(response.headers["retry-after"])
+        except ValueError:
+            pass
+    return GeminiAPIError(f"Gemini API error {response.status_code}: {message}", response.status_code, retry_after)
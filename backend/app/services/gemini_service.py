@@ -1,11 +1,107 @@
-import google.generativeai as genai
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
+import re
 import logging
+from fastapi import HTTPException
+from app.services import gemini_client, latency_service, model_cache_service
 
 logger = logging.getLogger(__name__)
 
-def list_gemini_models(api_key: str) -> Optional[List[Dict[str, Any]]]:
-    """Lists available Gemini models for the given API key.
+# Marker placed before each segment sent for translation, and the pattern finding it
+SEGMENT_MARKER = "[[{}]]"
+_SEGMENT_MARKER_PATTERN = re.compile(r"\[\[(\d+)\]\]")
+
+# Instructions for the summary length options
+SUMMARY_LENGTH_INSTRUCTIONS = {
+    "short": "Create a brief summary in 2-3 paragraphs.",
+    "medium": "Create a comprehensive summary covering the main points.",
+    "long": "Create a detailed summary that covers all significant aspects of the document."
+}
+
+def unavailable_error(e: gemini_client.GeminiAPIError) -> HTTPException:
+    """Map a Gemini call that failed after all its retries to the error the client should get.
+
+    Rate limits are reported as 429, with a Retry-After header when the API gave
+    a delay; missed deadlines as 504; other transient failures (5xx,
+    unreachable API) as 502.
+
+    Args:
+        e: A retryable Gemini API error
+
+    Returns:
+        The HTTP error to raise
+    """
+    if e.status_code == 429:
+        headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after is not None else None
+        return HTTPException(status_code=429, detail=f"The Gemini API rate limit was exceeded: {e}", headers=headers)
+    if e.status_code == 504:
+        return HTTPException(status_code=504, detail=str(e))
+    return HTTPException(status_code=502, detail=f"The Gemini API is unavailable: {e}")
+
+def _raise_if_unavailable(e: Exception):
+    """Raise unavailable_error for a transient failure, which the client should see rather than a generic error."""
+    if isinstance(e, gemini_client.GeminiAPIError) and e.retryable:
+        raise unavailable_error(e) from e
+
+async def _generate(api_key: str, model_name: str, prompt: str, feature: str) -> gemini_client.GenerationResult:
+    """Generate text within the deadline of a feature, hedging and falling back as configured."""
+    client = gemini_client.get_client(api_key)
+    return await latency_service.call(feature, model_name, lambda model: client.generate_content(model, prompt))
+
+def _stream(api_key: str, model_name: str, prompt: str, feature: str) -> AsyncIterator[gemini_client.GenerationResult]:
+    """Stream generated text, with the first piece due within the deadline of a feature."""
+    client = gemini_client.get_client(api_key)
+    return latency_service.stream(feature, model_name, lambda model: client.stream_generate_content(model, prompt))
+
+def _chat_prompt(pdf_text: str, question: str) -> str:
+    """Create a prompt that includes the PDF content and the user's question."""
+    return f"""
+        I'm going to provide you with the passages of a PDF document most relevant to a question,
+        each labelled with its page number, followed by the question.
+        Please answer the question based only on the information in these passages.
+
+        PDF CONTENT:
+        {pdf_text}
+
+        QUESTION:
+        {question}
+
+        ANSWER:
+        """
+
+def _summary_prompt(pdf_text: str, length: str) -> str:
+    """Create a prompt for summarization."""
+    length_instruction = SUMMARY_LENGTH_INSTRUCTIONS.get(length.lower(), SUMMARY_LENGTH_INSTRUCTIONS["medium"])
+    return f"""
+        I'm going to provide you with the content of a PDF document.
+        Please summarize this document.
+        {length_instruction}
+
+        PDF CONTENT:
+        {pdf_text}
+
+        SUMMARY:
+        """
+
+def _combine_prompt(summaries: List[str], length: Optional[str]) -> str:
+    """Create a prompt for combining section summaries."""
+    if length is None:
+        length_instruction = "Keep every significant point, fact and figure."
+    else:
+        length_instruction = SUMMARY_LENGTH_INSTRUCTIONS.get(length.lower(), SUMMARY_LENGTH_INSTRUCTIONS["medium"])
+    sections = "\n\n".join(f"SECTION {i + 1}:\n{summary}" for i, summary in enumerate(summaries))
+    return f"""
+        I'm going to provide you with summaries of consecutive sections of a PDF document.
+        Please combine them into a single summary of the document.
+        {length_instruction}
+
+        SECTION SUMMARIES:
+        {sections}
+
+        SUMMARY:
+        """
+
+async def list_gemini_models(api_key: str) -> Optional[List[Dict[str, Any]]]:
+    """Lists available Gemini models for the given API key, cached per key.
 
     Args:
         api_key: The Gemini API key provided by the user
@@ -14,59 +110,80 @@ def list_gemini_models(api_key: str) -> Optional[List[Dict[str, Any]]]:
         A list of available models or None if an error occurs
     """
     try:
-        genai.configure(api_key=api_key)
         models_list = []
-        for model in genai.list_models():
+        for model in await model_cache_service.list_models(api_key):
             # Ensure the model is one that supports generateContent, e.g., 'gemini-pro'
-            if 'generateContent' in model.supported_generation_methods:
+            if 'generateContent' in model.get('supportedGenerationMethods', []):
                 models_list.append({
-                    "name": model.name,
-                    "description": getattr(model, 'description', 'N/A'),
-                    "input_token_limit": getattr(model, 'input_token_limit', 'N/A'),
-                    "output_token_limit": getattr(model, 'output_token_limit', 'N/A')
+                    "name": model["name"],
+                    "description": model.get('description', 'N/A'),
+                    "input_token_limit": model.get('inputTokenLimit', 'N/A'),
+                    "output_token_limit": model.get('outputTokenLimit', 'N/A')
                 })
         return models_list
     except Exception as e:
+        _raise_if_unavailable(e)
         logger.error(f"Error listing Gemini models: {e}")
         return None
 
-def chat_with_pdf(api_key: str, model_name: str, pdf_text: str, question: str) -> Optional[str]:
-    """Chat with a PDF using Gemini API.
+async def get_input_token_limit(api_key: str, model_name: str) -> Optional[int]:
+    """Get the input token limit of a Gemini model, from the cached model list when possible.
 
     Args:
         api_key: The Gemini API key provided by the user
-        model_name: The name of the Gemini model to use
-        pdf_text: The extracted text from the PDF
-        question: The user's question about the PDF
+        model_name: The name of the Gemini model
 
     Returns:
-        The AI-generated answer or None if an error occurs
+        The maximum number of input tokens or None if it cannot be determined
     """
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(model_name)
+        model = await model_cache_service.get_model(api_key, model_name)
+        limit = model.get('inputTokenLimit')
+        return int(limit) if limit else None
+    except Exception as e:
+        logger.error(f"Error getting Gemini model {model_name}: {e}")
+        return None
 
-        # Create a prompt that includes the PDF content and the user's question
-        prompt = f"""
-        I'm going to provide you with the content of a PDF document, followed by a question about it.
-        Please answer the question based only on the information in the document.
+async def get_output_token_limit(api_key: str, model_name: str) -> Optional[int]:
+    """Get the output token limit of a Gemini model, from the cached model list when possible.
 
-        PDF CONTENT:
-        {pdf_text}
+    Args:
+        api_key: The Gemini API key provided by the user
+        model_name: The name of the Gemini model
 
-        QUESTION:
-        {question}
+    Returns:
+        The maximum number of output tokens or None if it cannot be determined
+    """
+    try:
+        model = await model_cache_service.get_model(api_key, model_name)
+        limit = model.get('outputTokenLimit')
+        return int(limit) if limit else None
+    except Exception as e:
+        logger.error(f"Error getting Gemini model {model_name}: {e}")
+        return None
 
-        ANSWER:
-        """
+async def chat_with_pdf(api_key: str, model_name: str, pdf_text: str, question: str) -> Optional[str]:
+    """Chat with a PDF using Gemini API.
 
-        response = model.generate_content(prompt)
+    Args:
+        api_key: The Gemini API key provided by the user
+        model_name: The name of the Gemini model to use
+        pdf_text: The relevant passages of the PDF, labelled with their page numbers
+        question: The user's question about the PDF
+
+    Returns:
+        The AI-generated answer or None if an error occurs
+    """
+    try:
+        prompt = _chat_prompt(pdf_text, question)
+        response = await _generate(api_key, model_name, prompt, "chat")
         return response.text
     except Exception as e:
+        _raise_if_unavailable(e)
         logger.error(f"Error in chat with PDF: {e}")
         return None
 
-def summarize_pdf(api_key: str, model_name: str, pdf_text: str, length: str = "medium") -> Optional[str]:
+async def summarize_pdf(api_key: str, model_name: str, pdf_text: str, length: str = "medium") -> Optional[str]:
     """Summarize a PDF using Gemini API.
 
     Args:
@@ -79,69 +196,146 @@ def summarize_pdf(api_key: str, model_name: str, pdf_text: str, length: str = "m
         The AI-generated summary or None if an error occurs
     """
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(model_name)
+        prompt = _summary_prompt(pdf_text, length)
+        response = await _generate(api_key, model_name, prompt, "summarize")
+        return response.text
+    except Exception as e:
+        _raise_if_unavailable(e)
+        logger.error(f"Error in summarize PDF: {e}")
+        return None
+
+async def summarize_section(api_key: str, model_name: str, section_text: str, part: int, total_parts: int) -> Optional[str]:
+    """Summarize one section of a PDF that is too long to summarize at once.
 
-        # Determine summary length instruction
-        length_instruction = {
-            "short": "Create a brief summary in 2-3 paragraphs.",
-            "medium": "Create a comprehensive summary covering the main points.",
-            "long": "Create a detailed summary that covers all significant aspects of the document."
-        }.get(length.lower(), "Create a comprehensive summary covering the main points.")
+    Args:
+        api_key: The Gemini API key provided by the user
+        model_name: The name of the Gemini model to use
+        section_text: The text of the section
+        part: The position of the section (1-indexed)
+        total_parts: The number of sections in the document
 
-        # Create a prompt for summarization
+    Returns:
+        The AI-generated summary of the section or None if an error occurs
+    """
+    try:
+        # Create a prompt for a partial summary
         prompt = f"""
-        I'm going to provide you with the content of a PDF document.
-        Please summarize this document.
-        {length_instruction}
+        I'm going to provide you with part {part} of {total_parts} of a PDF document.
+        Please summarize this part, keeping every significant point, fact and figure,
+        so that the summaries of all parts can be combined into a summary of the whole document.
 
-        PDF CONTENT:
-        {pdf_text}
+        PDF CONTENT (PART {part} OF {total_parts}):
+        {section_text}
 
-        SUMMARY:
+        SUMMARY OF PART {part}:
         """
 
-        response = model.generate_content(prompt)
+        response = await _generate(api_key, model_name, prompt, "summarize")
         return response.text
     except Exception as e:
-        logger.error(f"Error in summarize PDF: {e}")
+        _raise_if_unavailable(e)
+        logger.error(f"Error in summarize PDF section: {e}")
         return None
 
-def translate_pdf(api_key: str, model_name: str, pdf_text: str, target_language: str) -> Optional[str]:
-    """Translate a PDF using Gemini API.
+async def combine_summaries(api_key: str, model_name: str, summaries: List[str], length: Optional[str] = None) -> Optional[str]:
+    """Combine the summaries of consecutive sections of a PDF into one summary.
 
     Args:
         api_key: The Gemini API key provided by the user
         model_name: The name of the Gemini model to use
-        pdf_text: The extracted text from the PDF
+        summaries: The section summaries, in document order
+        length: The desired summary length (short, medium, long), or None for an
+                intermediate summary that keeps all significant points
+
+    Returns:
+        The AI-generated summary or None if an error occurs
+    """
+    try:
+        prompt = _combine_prompt(summaries, length)
+        response = await _generate(api_key, model_name, prompt, "summarize")
+        return response.text
+    except Exception as e:
+        _raise_if_unavailable(e)
+        logger.error(f"Error in combine summaries: {e}")
+        return None
+
+async def translate_segments(api_key: str, model_name: str, segments: List[str],
+                             target_language: str) -> Optional[gemini_client.GenerationResult]:
+    """Translate numbered segments of a PDF using Gemini API.
+
+    Args:
+        api_key: The Gemini API key provided by the user
+        model_name: The name of the Gemini model to use
+        segments: The passages to translate
         target_language: The target language for translation
 
     Returns:
-        The AI-generated translation or None if an error occurs
+        The AI-generated translations, marked as in the prompt (see parse_segments),
+        and their token usage, or None if an error occurs
     """
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(model_name)
+        numbered = "\n\n".join(f"{SEGMENT_MARKER.format(i + 1)} {segment}" for i, segment in enumerate(segments))
 
-        # Create a prompt for translation
+        # Create a prompt for translating the segments
         prompt = f"""
-        I'm going to provide you with the content of a PDF document.
-        Please translate this document into {target_language}.
+        I'm going to provide you with {len(segments)} numbered passages from a PDF document.
+        Please translate each passage into {target_language}.
+        Start every translated passage with the marker of its passage, such as {SEGMENT_MARKER.format(1)},
+        keep the passages in the same order and reply with the translations only.
         Maintain the original formatting and structure as much as possible.
 
-        PDF CONTENT:
-        {pdf_text}
+        PASSAGES:
+        {numbered}
 
-        TRANSLATION ({target_language}):
+        TRANSLATIONS ({target_language}):
         """
 
-        response = model.generate_content(prompt)
-        return response.text
+        return await _generate(api_key, model_name, prompt, "translate")
     except Exception as e:
-        logger.error(f"Error in translate PDF: {e}")
+        _raise_if_unavailable(e)
+        logger.error(f"Error in translate PDF segments: {e}")
         return None
 
-def generate_questions(api_key: str, model_name: str, pdf_text: str, count: int = 5) -> Optional[List[str]]:
+def parse_segments(text: str, count: int) -> Optional[List[str]]:
+    """Split the response of translate_segments into the translation of each segment.
+
+    Args:
+        text: The AI-generated response
+        count: The number of segments sent
+
+    Returns:
+        The translations in segment order, or None if the markers do not match the segments
+    """
+    if count == 1:
+        # A single translation may come back without its marker, or with it
+        # repeated; markers numbered otherwise are text of the segment itself
+        return [text.replace(SEGMENT_MARKER.format(1), "").strip()]
+
+    parts = _SEGMENT_MARKER_PATTERN.split(text)
+
+    # parts alternates between text and segment numbers: [before, "1", text1, "2", text2, ...]
+    numbers = [int(number) for number in parts[1::2]]
+    if numbers != list(range(1, count + 1)):
+        return None
+    return [translation.strip() for translation in parts[2::2]]
+
+# Streaming variants: these yield the text as the model generates it and raise
+# gemini_client.GeminiAPIError instead of returning None, since a stream can fail
+# after part of the response has been sent.
+
+def stream_chat_with_pdf(api_key: str, model_name: str, pdf_text: str, question: str) -> AsyncIterator[gemini_client.GenerationResult]:
+    """Stream the answer to a question about a PDF; see chat_with_pdf."""
+    return _stream(api_key, model_name, _chat_prompt(pdf_text, question), "chat")
+
+def stream_summarize_pdf(api_key: str, model_name: str, pdf_text: str, length: str = "medium") -> AsyncIterator[gemini_client.GenerationResult]:
+    """Stream the summary of a PDF; see summarize_pdf."""
+    return _stream(api_key, model_name, _summary_prompt(pdf_text, length), "summarize")
+
+def stream_combine_summaries(api_key: str, model_name: str, summaries: List[str], length: Optional[str] = None) -> AsyncIterator[gemini_client.GenerationResult]:
+    """Stream the combination of section summaries; see combine_summaries."""
+    return _stream(api_key, model_name, _combine_prompt(summaries, length), "summarize")
+
+async def generate_questions(api_key: str, model_name: str, pdf_text: str, count: int = 5) -> Optional[List[str]]:
     """Generate questions from a PDF using Gemini API.
 
     Args:
@@ -154,9 +348,6 @@ def generate_questions(api_key: str, model_name: str, pdf_text: str, count: int
         A list of AI-generated questions or None if an error occurs
     """
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(model_name)
-
         # Create a prompt for question generation
         prompt = f"""
         I'm going to provide you with the content of a PDF document.
@@ -170,7 +361,7 @@ def generate_questions(api_key: str, model_name: str, pdf_text: str, count: int
         QUESTIONS:
         """
 
-        response = model.generate_content(prompt)
+        response = await _generate(api_key, model_name, prompt, "questions")
 
         # Parse the response to extract the questions
         questions_text = response.text.strip()
@@ -190,5 +381,6 @@ def generate_questions(api_key: str, model_name: str, pdf_text: str, count: int
 
         return questions[:count]  # Limit to requested count
     except Exception as e:
+        _raise_if_unavailable(e)
         logger.error(f"Error in generate questions: {e}")
         return None
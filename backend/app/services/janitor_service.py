@@ -0,0 +1,242 @@
+import os
+import time
+import heapq
+import shutil
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Expiry scheduler for temporary files. Deadlines live in a min-heap; entries
+# are never removed from the heap directly, a popped entry is only acted on if
+# it still matches the current deadline for its path. A single asyncio task
+# sleeps until the earliest deadline and deletes expired paths in batches.
+
+_lock = threading.Lock()
+_heap: List[Tuple[float, str]] = []
+_deadlines: Dict[str, float] = {}
+_sizes: Dict[str, int] = {}
+_callbacks: Dict[str, Callable[[str], None]] = {}
+
+# Paths managed by other services (databases, the store, caches): never
+# scheduled for deletion, skipped by rebuild() and not served for download
+_reserved_paths = {os.path.abspath(os.path.join(settings.TEMP_FILE_DIR, ".gitkeep"))}
+
+_task: Optional[asyncio.Task] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_wakeup: Optional[asyncio.Event] = None
+
+def reserve(path: str):
+    """Protect a file or directory that a service manages itself from the janitor."""
+    _reserved_paths.add(os.path.abspath(path))
+
+def is_reserved(path: str) -> bool:
+    """Check whether a path has been reserved by a service."""
+    return os.path.abspath(path) in _reserved_paths
+
+def register(path: str, ttl: Optional[float] = None, callback: Optional[Callable[[str], None]] = None) -> float:
+    """Schedule a file or directory for deletion.
+
+    Registering a path that is already scheduled replaces its deadline.
+
+    Args:
+        path: Path to the file or directory
+        ttl: Seconds until the path expires (defaults to settings.OUTPUT_TTL_SECONDS)
+        callback: Function called with the path instead of deleting it
+
+    Returns:
+        The expiry time as a Unix timestamp
+
+    Raises:
+        ValueError: If the path is reserved by a service
+    """
+    ttl = settings.OUTPUT_TTL_SECONDS if ttl is None else ttl
+    return register_deadline(path, time.time() + ttl, callback)
+
+def register_deadline(path: str, deadline: float, callback: Optional[Callable[[str], None]] = None) -> float:
+    """Schedule a file or directory for deletion at a given time.
+
+    Args:
+        path: Path to the file or directory
+        deadline: Expiry time as a Unix timestamp
+        callback: Function called with the path instead of deleting it
+
+    Returns:
+        The expiry time
+
+    Raises:
+        ValueError: If the path is reserved by a service
+    """
+    if is_reserved(path):
+        raise ValueError(f"Refusing to schedule reserved path {path} for deletion")
+    size = _path_size(path)
+
+    with _lock:
+        earliest = _heap[0][0] if _heap else None
+        _deadlines[path] = deadline
+        _sizes[path] = size
+        if callback is not None:
+            _callbacks[path] = callback
+        else:
+            _callbacks.pop(path, None)
+        heapq.heappush(_heap, (deadline, path))
+        _compact_heap()
+
+    # Wake the scheduler if this deadline is now the earliest one
+    if earliest is None or deadline < earliest:
+        _wake()
+    return deadline
+
+def cancel(path: str):
+    """Cancel the scheduled deletion of a path, if any."""
+    with _lock:
+        _deadlines.pop(path, None)
+        _sizes.pop(path, None)
+        _callbacks.pop(path, None)
+
+def deadline_for(path: str) -> Optional[float]:
+    """Get the expiry time of a path, or None if it is not scheduled."""
+    with _lock:
+        return _deadlines.get(path)
+
+def stats() -> Dict[str, float]:
+    """Get the number of files and bytes waiting to expire."""
+    with _lock:
+        next_expiry = min(_deadlines.values()) if _deadlines else None
+        return {
+            "pending_files": len(_deadlines),
+            "pending_bytes": sum(_sizes.values()),
+            "next_expiry": next_expiry,
+        }
+
+def rebuild():
+    """Schedule every unmanaged entry of TEMP_FILE_DIR for deletion based on its mtime.
+
+    This restores the schedule after a restart, so outputs produced by a
+    previous process still expire.
+    """
+    count = 0
+    for name in os.listdir(settings.TEMP_FILE_DIR):
+        path = os.path.join(settings.TEMP_FILE_DIR, name)
+        if is_reserved(path):
+            continue
+        try:
+            deadline = os.path.getmtime(path) + settings.OUTPUT_TTL_SECONDS
+        except FileNotFoundError:
+            continue
+        if deadline_for(path) is None:
+            register_deadline(path, deadline)
+            count += 1
+
+    logger.info(f"Scheduled {count} existing temporary files for cleanup")
+
+def start_janitor():
+    """Start the cleanup task. Called on application startup."""
+    global _task, _loop, _wakeup
+    if _task is not None:
+        return
+
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    rebuild()
+    _task = asyncio.create_task(_run())
+
+async def stop_janitor():
+    """Stop the cleanup task. Called on application shutdown."""
+    global _task, _loop, _wakeup
+    if _task is None:
+        return
+
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+    _loop = None
+    _wakeup = None
+
+async def _run():
+    """Delete expired paths as their deadlines pass."""
+    while True:
+        # Clear before reading the heap so a concurrent register() is not missed
+        _wakeup.clear()
+        with _lock:
+            next_deadline = _heap[0][0] if _heap else None
+
+        timeout = None if next_deadline is None else max(0.0, next_deadline - time.time())
+        if timeout is None or timeout > 0:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        batch = _pop_expired(settings.JANITOR_BATCH_SIZE)
+        if batch:
+            try:
+                await run_in_threadpool(_expire_batch, batch)
+            except Exception as e:
+                logger.error(f"Error cleaning up expired files: {e}")
+
+def _pop_expired(limit: int) -> List[Tuple[str, Optional[Callable[[str], None]]]]:
+    """Remove up to `limit` expired paths from the schedule."""
+    now = time.time()
+    batch = []
+    with _lock:
+        while _heap and _heap[0][0] <= now and len(batch) < limit:
+            deadline, path = heapq.heappop(_heap)
+            # Skip stale heap entries left behind by cancel() or re-registration
+            if _deadlines.get(path) != deadline:
+                continue
+            del _deadlines[path]
+            _sizes.pop(path, None)
+            batch.append((path, _callbacks.pop(path, None)))
+    return batch
+
+def _expire_batch(batch: List[Tuple[str, Optional[Callable[[str], None]]]]):
+    """Delete a batch of expired paths."""
+    for path, callback in batch:
+        try:
+            if callback is not None:
+                callback(path)
+            elif os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            logger.error(f"Error cleaning up temporary file {path}: {e}")
+
+    logger.info(f"Cleaned up {len(batch)} expired temporary files")
+
+def _compact_heap():
+    """Drop stale heap entries once they outnumber the live ones. Caller holds _lock."""
+    global _heap
+    if len(_heap) > 2 * len(_deadlines) + 64:
+        _heap = [(deadline, path) for path, deadline in _deadlines.items()]
+        heapq.heapify(_heap)
+
+def _path_size(path: str) -> int:
+    """Get the size of a file, or the total size of a directory's files."""
+    try:
+        if os.path.isdir(path):
+            total = 0
+            for root, _, files in os.walk(path):
+                for name in files:
+                    try:
+                        total += os.path.getsize(os.path.join(root, name))
+                    except OSError:
+                        pass
+            return total
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def _wake():
+    """Wake the cleanup task, from any thread."""
+    if _loop is not None and _wakeup is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
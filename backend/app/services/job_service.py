@@ -0,0 +1,405 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from starlette.concurrency import run_in_threadpool
+from app.models.pdf_models import PDFOperationType
+from app.models.job_models import JobStatus
+from app.services import operation_service, janitor_service
+from app.services.upload_service import cleanup_temp_files
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Persistent job queue for long-running PDF operations. Jobs are rows in a
+# local SQLite database shared by every server process; a fixed number of
+# asyncio workers per process claim queued jobs and run them through the PDF
+# worker pool. The inputs of a job are linked into a directory of its own, so
+# any process can run it and nothing depends on the in-memory store references
+# of the process it was submitted to. A job records the process running it;
+# jobs whose process died are queued again by the next claim or startup.
+# Passwords are never written to the database: they are kept in memory by the
+# submitting process, which alone may claim the job, so such a job fails
+# explicitly once that process is gone.
+janitor_service.reserve(settings.JOBS_DB_PATH)
+for suffix in ("-wal", "-shm", "-journal"):
+    janitor_service.reserve(settings.JOBS_DB_PATH + suffix)
+
+JOB_FILES_DIR = os.path.join(settings.DATA_DIR, "jobs")
+os.makedirs(JOB_FILES_DIR, exist_ok=True)
+
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+
+# Parameters kept out of the database, the operations taking them, and the
+# secrets of the jobs queued by this process, by job ID
+_SECRET_PARAMS = ("user_password", "owner_password", "password")
+_SECRET_OPERATIONS = {PDFOperationType.PROTECT.value, PDFOperationType.UNLOCK.value}
+_secrets: Dict[str, Dict[str, Any]] = {}
+_SECRETS_LOST = "The job's passwords were only kept by the process it was submitted to, which stopped; submit it again"
+
+# Identity of this process in the owner column: "<pid>:<random token>"
+_owner: Optional[str] = None
+
+# Job directories younger than this are kept by recovery even without a job row
+_SUBMIT_GRACE_SECONDS = 300
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """Open an autocommit connection to the job database."""
+    connection = sqlite3.connect(settings.JOBS_DB_PATH, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+def init_db():
+    """Create the job table if needed."""
+    with _connect() as connection:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                operation TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT,
+                params TEXT NOT NULL,
+                inputs TEXT NOT NULL,
+                owner TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            connection.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+def _process_owner() -> str:
+    """Get the owner value identifying this process, made again after a fork."""
+    global _owner
+    if _owner is None or not _owner.startswith(f"{os.getpid()}:"):
+        _owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+    return _owner
+
+def _owner_alive(owner: str) -> bool:
+    """Check whether the process recorded as a job's owner is still running."""
+    if owner == _process_owner():
+        return True
+    pid = int(owner.split(":", 1)[0])
+    if pid == os.getpid():
+        # An earlier process that had the same PID
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _job_dir(job_id: str) -> str:
+    """Get the directory holding the inputs of a job."""
+    return os.path.join(JOB_FILES_DIR, job_id)
+
+def _link_inputs(job_id: str, paths: List[str]) -> List[str]:
+    """Link (or copy) input files into the job's directory.
+
+    Returns:
+        The paths of the job's copies, in the same order
+    """
+    job_dir = _job_dir(job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    linked = []
+    for index, path in enumerate(paths):
+        # Prefixed with the index, as the same file may be given twice
+        target = os.path.join(job_dir, f"{index}-{os.path.basename(path)}")
+        try:
+            os.link(path, target)
+        except OSError:
+            shutil.copyfile(path, target)
+        linked.append(target)
+    return linked
+
+def _remove_job_files(job_id: str):
+    """Delete the inputs of a job."""
+    shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    """Convert a database row to a job dictionary."""
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["inputs"] = json.loads(job["inputs"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+async def submit_job(operation: PDFOperationType, params: Dict[str, Any], input_paths: List[str],
+                     watermark_image_path: Optional[str] = None) -> Dict[str, Any]:
+    """Queue a PDF operation.
+
+    The input files are linked into the job's directory and the store
+    references held on them released, so the job does not depend on this
+    process. Jobs with passwords stay bound to this process.
+
+    Args:
+        operation: The operation to run
+        params: Operation parameters (same names as the endpoint form fields)
+        input_paths: Paths to the uploaded input files
+        watermark_image_path: Path to the watermark image, for add_watermark
+
+    Returns:
+        The queued job
+    """
+    # Reject invalid jobs now rather than when a worker picks them up
+    operation_service.validate_operation(operation, params, len(input_paths), watermark_image_path is not None)
+
+    now = time.time()
+    job_id = str(uuid.uuid4())
+    secrets = {name: params[name] for name in _SECRET_PARAMS if name in params}
+    params = {name: value for name, value in params.items() if name not in secrets}
+    owner = _process_owner() if operation.value in _SECRET_OPERATIONS else None
+    if secrets:
+        _secrets[job_id] = secrets
+
+    def insert():
+        originals = input_paths + ([watermark_image_path] if watermark_image_path else [])
+        linked = _link_inputs(job_id, originals)
+        inputs = {"files": linked[:len(input_paths)], "watermark_image": linked[-1] if watermark_image_path else None}
+        with _connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, operation, status, progress, message, params, inputs, owner, "
+                "created_at, updated_at) VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?, ?)",
+                (job_id, operation.value, JobStatus.QUEUED.value, "Waiting for a worker",
+                 json.dumps(params), json.dumps(inputs), owner, now, now)
+            )
+        cleanup_temp_files(originals)
+
+    try:
+        await run_in_threadpool(insert)
+    except BaseException:
+        _secrets.pop(job_id, None)
+        _remove_job_files(job_id)
+        raise
+
+    if _wakeup is not None:
+        _wakeup.set()
+    return await get_job(job_id)
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Get a job by ID.
+
+    Args:
+        job_id: The job ID
+
+    Returns:
+        The job, or None if it does not exist
+    """
+    def select():
+        with _connect() as connection:
+            return connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    row = await run_in_threadpool(select)
+    return _row_to_job(row) if row else None
+
+def _release_orphaned_jobs(connection: sqlite3.Connection) -> List[str]:
+    """Requeue the jobs of processes that stopped, or fail them if they had passwords.
+
+    The caller holds a write transaction.
+
+    Returns:
+        The IDs of the jobs failed
+    """
+    rows = connection.execute(
+        "SELECT id, operation, status, owner FROM jobs WHERE status IN (?, ?) AND owner IS NOT NULL",
+        (JobStatus.QUEUED.value, JobStatus.RUNNING.value)
+    ).fetchall()
+
+    now = time.time()
+    failed = []
+    for row in rows:
+        if _owner_alive(row["owner"]):
+            continue
+        if row["operation"] in _SECRET_OPERATIONS:
+            connection.execute(
+                "UPDATE jobs SET status = ?, progress = 1.0, message = ?, params = '{}', error = ?, owner = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (JobStatus.FAILED.value, "Job failed", _SECRETS_LOST, now, row["id"])
+            )
+            failed.append(row["id"])
+        else:
+            connection.execute(
+                "UPDATE jobs SET status = ?, progress = 0, message = ?, owner = NULL, updated_at = ? WHERE id = ?",
+                (JobStatus.QUEUED.value, "Requeued after its worker stopped", now, row["id"])
+            )
+    return failed
+
+def _claim_next_job() -> Optional[Dict[str, Any]]:
+    """Atomically mark the oldest job this process may run as running and return it."""
+    owner = _process_owner()
+    with _connect() as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            failed = _release_orphaned_jobs(connection)
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE status = ? AND (owner IS NULL OR owner = ?) ORDER BY created_at LIMIT 1",
+                (JobStatus.QUEUED.value, owner)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, progress = 0.1, message = ?, owner = ?, updated_at = ? WHERE id = ?",
+                    (JobStatus.RUNNING.value, "Checking the input files", owner, time.time(), row["id"])
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    for job_id in failed:
+        logger.warning(f"Job {job_id} failed: the process holding its passwords stopped")
+        _remove_job_files(job_id)
+    return _row_to_job(row) if row is not None else None
+
+def _update_progress(job_id: str, progress: float, message: str):
+    """Record the stage a running job has reached."""
+    with _connect() as connection:
+        connection.execute(
+            "UPDATE jobs SET progress = ?, message = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (progress, message, time.time(), job_id, JobStatus.RUNNING.value)
+        )
+
+def _finish_job(job_id: str, status: JobStatus, message: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None):
+    """Record the outcome of a job and delete its inputs. Parameters are dropped: they are no longer needed."""
+    with _connect() as connection:
+        connection.execute(
+            "UPDATE jobs SET status = ?, progress = 1.0, message = ?, params = '{}', result = ?, error = ?, "
+            "owner = NULL, updated_at = ? WHERE id = ?",
+            (status.value, message, json.dumps(result) if result else None, error, time.time(), job_id)
+        )
+    _remove_job_files(job_id)
+
+async def _run_job(job: Dict[str, Any]):
+    """Run a claimed job, recording its progress and outcome."""
+    operation = PDFOperationType(job["operation"])
+    input_paths = job["inputs"]["files"]
+    watermark_image_path = job["inputs"]["watermark_image"]
+    secrets = _secrets.pop(job["id"], None)
+
+    try:
+        if secrets is None and job["operation"] in _SECRET_OPERATIONS:
+            raise ValueError(_SECRETS_LOST)
+        paths = input_paths + ([watermark_image_path] if watermark_image_path else [])
+        if not all(os.path.isfile(path) for path in paths):
+            raise ValueError("Input files are no longer available")
+
+        await run_in_threadpool(_update_progress, job["id"], 0.2, f"Running {operation.value}")
+        params = {**job["params"], **(secrets or {})}
+        response = await operation_service.run_operation(
+            operation, input_paths, params, watermark_image_path
+        )
+
+        await run_in_threadpool(_update_progress, job["id"], 0.9, "Saving the output")
+        # Outputs nobody downloads still expire
+        if response.file_path:
+            janitor_service.register(response.file_path)
+
+        await run_in_threadpool(
+            _finish_job, job["id"], JobStatus.SUCCEEDED, response.message, result=response.dict()
+        )
+    except (ValueError, TypeError) as e:
+        await run_in_threadpool(_finish_job, job["id"], JobStatus.FAILED, "Job failed", error=str(e))
+    except Exception as e:
+        logger.error(f"Error running job {job['id']} ({operation.value}): {e}")
+        await run_in_threadpool(_finish_job, job["id"], JobStatus.FAILED, "Job failed", error=str(e))
+
+async def _worker(index: int):
+    """Claim and run queued jobs until cancelled."""
+    while True:
+        try:
+            job = await run_in_threadpool(_claim_next_job)
+        except Exception as e:
+            logger.error(f"Job worker {index} could not claim a job: {e}")
+            job = None
+
+        if job is None:
+            # Wait for a submission, polling in case another process queued work
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await _run_job(job)
+
+def _recover_jobs():
+    """Release the jobs of stopped processes, purge old finished jobs and delete leftover inputs."""
+    now = time.time()
+    with _connect() as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            failed = _release_orphaned_jobs(connection)
+            connection.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value, now - settings.JOB_RETENTION_SECONDS)
+            )
+            pending = {row["id"] for row in connection.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?)", (JobStatus.QUEUED.value, JobStatus.RUNNING.value)
+            )}
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    # Inputs of jobs that finished while their files could not be deleted; recent
+    # directories are skipped, their job may still be being submitted
+    for job_id in os.listdir(JOB_FILES_DIR):
+        path = _job_dir(job_id)
+        if job_id not in pending and os.path.getmtime(path) < now - _SUBMIT_GRACE_SECONDS:
+            _remove_job_files(job_id)
+
+    if failed:
+        logger.info(f"Failed {len(failed)} jobs whose passwords were lost")
+    if pending:
+        logger.info(f"Found {len(pending)} pending jobs")
+
+async def start_job_workers():
+    """Start the job workers. Called on application startup."""
+    global _wakeup
+    if _workers:
+        return
+
+    await run_in_threadpool(init_db)
+    await run_in_threadpool(_recover_jobs)
+
+    _wakeup = asyncio.Event()
+    for index in range(settings.JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker(index)))
+    logger.info(f"Started {settings.JOB_WORKERS} job workers")
+
+async def stop_job_workers():
+    """Stop the job workers. Called on application shutdown.
+
+    Jobs that are interrupted stay marked as running until this process has
+    exited; the next claim or startup then requeues them.
+    """
+    global _wakeup
+    for task in _workers:
+        task.cancel()
+    for task in _workers:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _workers.clear()
+    _wakeup = None
@@ -0,0 +1,201 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+from app.core.config import settings
+from app.services import token_service
+from app.services.gemini_client import GeminiAPIError, model_path
+
+logger = logging.getLogger(__name__)
+
+# Tail latency control for Gemini generation calls. Every call has a deadline
+# set by its feature (chat, questions, summarize, translate). With hedging on,
+# a call still unanswered after the usual (GEMINI_HEDGE_PERCENTILE) latency of
+# its feature and model is sent a second time and the first response wins, so
+# a few stuck calls no longer set the tail latency. A call that misses its
+# deadline is made again on GEMINI_FALLBACK_MODEL, if set, with a new deadline;
+# otherwise it fails as a 504. Only the call whose response is used counts
+# toward the token usage of the request, not the hedge it beat. Streamed calls
+# are not hedged, but their first chunk has the same deadline and fallback.
+
+T = TypeVar("T")
+
+# Setting holding the deadline of each feature
+_DEADLINE_SETTINGS = {
+    "chat": "GEMINI_CHAT_DEADLINE_SECONDS",
+    "questions": "GEMINI_QUESTIONS_DEADLINE_SECONDS",
+    "summarize": "GEMINI_SUMMARY_DEADLINE_SECONDS",
+    "translate": "GEMINI_TRANSLATION_DEADLINE_SECONDS",
+}
+
+# Latencies of the last successful calls per feature and model
+_latencies: Dict[Tuple[str, str], Deque[float]] = {}
+# Hedged calls, hedges answering first, missed deadlines and calls made on the fallback model
+_stats = {"hedged": 0, "hedge_wins": 0, "deadline_exceeded": 0, "fallbacks": 0}
+
+def deadline(feature: str) -> float:
+    """Get the deadline in seconds of a feature's Gemini calls."""
+    return getattr(settings, _DEADLINE_SETTINGS[feature])
+
+def record(feature: str, model_name: str, seconds: float):
+    """Record the latency of a successful call."""
+    key = (feature, model_path(model_name))
+    window = _latencies.get(key)
+    if window is None:
+        window = _latencies[key] = deque(maxlen=max(1, settings.GEMINI_LATENCY_WINDOW))
+    window.append(seconds)
+
+def percentile(feature: str, model_name: str, percent: float) -> Optional[float]:
+    """Get a percentile of the recent latencies of a feature and model, or None without enough samples."""
+    window = _latencies.get((feature, model_path(model_name)))
+    if not window or len(window) < settings.GEMINI_HEDGE_MIN_SAMPLES:
+        return None
+    latencies = sorted(window)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+async def _timed(feature: str, model_name: str, generate: Callable[[str], Awaitable[T]]) -> Tuple[T, Dict[str, int]]:
+    """Make a call and record its latency if it succeeds.
+
+    Returns:
+        The result and the token usage of the call, which the caller records
+        if it uses the result. The usage of a failed call is recorded here.
+    """
+    start = time.monotonic()
+    try:
+        with token_service.track_usage() as usage:
+            result = await generate(model_name)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        token_service.add_usage(usage)
+        raise
+    record(feature, model_name, time.monotonic() - start)
+    return result, usage
+
+async def _hedged(feature: str, model_name: str, generate: Callable[[str], Awaitable[T]]) -> Tuple[T, Dict[str, int]]:
+    """Make a call, sending it again if it takes longer than usual, and return the first success with its usage."""
+    delay = percentile(feature, model_name, settings.GEMINI_HEDGE_PERCENTILE) if settings.GEMINI_HEDGING else None
+    if delay is None:
+        return await _timed(feature, model_name, generate)
+
+    tasks: List["asyncio.Task[T]"] = [asyncio.create_task(_timed(feature, model_name, generate))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            logger.info(f"No {feature} response from {model_name} after {delay:.1f}s, sending a hedged call")
+            _stats["hedged"] += 1
+            tasks.append(asyncio.create_task(_timed(feature, model_name, generate)))
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not tasks[0]:
+                        _stats["hedge_wins"] += 1
+                    return task.result()
+        # Every call failed: report the error of the original one
+        return tasks[0].result()
+    finally:
+        # Cancel the slower call, which closes its connection
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def call(feature: str, model_name: str, generate: Callable[[str], Awaitable[T]]) -> T:
+    """Make a Gemini call within the deadline of its feature, hedging and falling back as configured.
+
+    Args:
+        feature: The feature making the call (chat, questions, summarize, translate)
+        model_name: The name of the Gemini model to use
+        generate: Makes the call with the model name it is given
+
+    Returns:
+        The result of the first call to succeed
+
+    Raises:
+        GeminiAPIError: With status 504 if the deadline is exceeded (on the
+            fallback model too, if any), or the error of the call
+    """
+    seconds = deadline(feature)
+    try:
+        result, usage = await asyncio.wait_for(_hedged(feature, model_name, generate), seconds)
+    except asyncio.TimeoutError:
+        fallback = _fallback_model(feature, model_name, seconds)
+        try:
+            result, usage = await asyncio.wait_for(_timed(feature, fallback, generate), seconds)
+        except asyncio.TimeoutError:
+            _stats["deadline_exceeded"] += 1
+            raise GeminiAPIError(f"Gemini did not respond within {seconds:g}s, on {fallback} either", 504, retryable=True) from None
+    token_service.add_usage(usage)
+    return result
+
+def _fallback_model(feature: str, model_name: str, seconds: float) -> str:
+    """Count a missed deadline and get the model to try again on.
+
+    Raises:
+        GeminiAPIError: With status 504 if there is no fallback model
+    """
+    _stats["deadline_exceeded"] += 1
+    fallback = settings.GEMINI_FALLBACK_MODEL
+    if not fallback or model_path(fallback) == model_path(model_name):
+        raise GeminiAPIError(f"Gemini did not respond within {seconds:g}s", 504, retryable=True)
+    logger.warning(f"A {feature} call to {model_name} missed its {seconds:g}s deadline, falling back to {fallback}")
+    _stats["fallbacks"] += 1
+    return fallback
+
+async def stream(feature: str, model_name: str, open_stream: Callable[[str], AsyncIterator[T]]) -> AsyncIterator[T]:
+    """Stream a Gemini call whose first chunk must arrive within the deadline of its feature.
+
+    A stream whose first chunk is late is closed and opened again on the
+    fallback model, if any. The rest of the stream has no deadline.
+
+    Args:
+        feature: The feature making the call (chat, summarize)
+        model_name: The name of the Gemini model to use
+        open_stream: Opens the stream with the model name it is given
+
+    Yields:
+        The chunks of the stream
+
+    Raises:
+        GeminiAPIError: With status 504 if the first chunk is late (on the
+            fallback model too, if any), or the error of the call
+    """
+    seconds = deadline(feature)
+    chunks = open_stream(model_name)
+    try:
+        first = await asyncio.wait_for(chunks.__anext__(), seconds)
+    except StopAsyncIteration:
+        return
+    except asyncio.TimeoutError:
+        await chunks.aclose()
+        fallback = _fallback_model(feature, model_name, seconds)
+        chunks = open_stream(fallback)
+        try:
+            first = await asyncio.wait_for(chunks.__anext__(), seconds)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            await chunks.aclose()
+            _stats["deadline_exceeded"] += 1
+            raise GeminiAPIError(f"Gemini did not respond within {seconds:g}s, on {fallback} either", 504, retryable=True) from None
+
+    try:
+        yield first
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+def stats() -> Dict[str, Any]:
+    """Get the hedging and deadline counters and the hedging latency of each feature and model."""
+    return {
+        **_stats,
+        "hedge_after_seconds": {
+            f"{feature}/{model}": round(latency, 3)
+            for (feature, model) in list(_latencies)
+            if (latency := percentile(feature, model, settings.GEMINI_HEDGE_PERCENTILE)) is not None
+        },
+    }
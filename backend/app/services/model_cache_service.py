@@ -0,0 +1,105 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.services import coalescing_service, gemini_client
+
+logger = logging.getLogger(__name__)
+
+# In-memory cache of the models available to each API key, keyed by the hash
+# of the key; the key itself is never stored. The model list is fetched once
+# per MODEL_CACHE_TTL_SECONDS, and an entry used after MODEL_CACHE_REFRESH_SECONDS
+# is refreshed in the background, so callers rarely wait for the API. The
+# model descriptions give the token limits the AI features budget prompts
+# with; a model missing from the list is looked up on its own once and kept
+# with the entry.
+
+class _Entry:
+    """The models of one API key, by name."""
+
+    def __init__(self, models: List[Dict[str, Any]]):
+        self.models = models
+        self.by_name = {model["name"]: model for model in models if "name" in model}
+        self.fetched_at = time.monotonic()
+        self.refresh: Optional["asyncio.Task[None]"] = None
+
+# Key hash -> entry, least recently used first
+_entries: "OrderedDict[str, _Entry]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "refreshes": 0}
+
+async def _fetch(client: gemini_client.GeminiClient) -> _Entry:
+    """List the models of a key and cache them, sharing the call with concurrent fetches."""
+    async def fetch() -> _Entry:
+        entry = _entries[client.key_hash] = _Entry(await client.list_models())
+        _entries.move_to_end(client.key_hash)
+        while len(_entries) > settings.MODEL_CACHE_MAX_KEYS:
+            _entries.popitem(last=False)
+        return entry
+
+    return await coalescing_service.run("list_models", client.key_hash, fetch)
+
+async def _refresh(client: gemini_client.GeminiClient, entry: _Entry):
+    """Replace an entry with a new listing, keeping it if the listing fails."""
+    try:
+        await _fetch(client)
+        _stats["refreshes"] += 1
+    except Exception as e:
+        logger.warning(f"Could not refresh the Gemini models of key {client.key_hash[:8]}: {e}")
+    finally:
+        entry.refresh = None
+
+async def _entry(api_key: str) -> _Entry:
+    """Get the cached models of a key, listing them if they are missing or expired."""
+    client = gemini_client.get_client(api_key)
+    entry = _entries.get(client.key_hash)
+    age = time.monotonic() - entry.fetched_at if entry is not None else None
+    if entry is None or age >= settings.MODEL_CACHE_TTL_SECONDS:
+        _stats["misses"] += 1
+        return await _fetch(client)
+
+    _stats["hits"] += 1
+    _entries.move_to_end(client.key_hash)
+    if age >= settings.MODEL_CACHE_REFRESH_SECONDS and entry.refresh is None:
+        entry.refresh = asyncio.create_task(_refresh(client, entry))
+    return entry
+
+async def list_models(api_key: str) -> List[Dict[str, Any]]:
+    """Get every model available to an API key.
+
+    Args:
+        api_key: The Gemini API key provided by the user
+
+    Returns:
+        The model descriptions, as listed by the API
+
+    Raises:
+        GeminiAPIError: If the models are not cached and cannot be listed
+    """
+    return (await _entry(api_key)).models
+
+async def get_model(api_key: str, model_name: str) -> Dict[str, Any]:
+    """Get the description of one model available to an API key.
+
+    Args:
+        api_key: The Gemini API key provided by the user
+        model_name: The name of the Gemini model
+
+    Returns:
+        The model description, including its token limits
+
+    Raises:
+        GeminiAPIError: If the model is not cached and cannot be looked up
+    """
+    entry = await _entry(api_key)
+    name = gemini_client.model_path(model_name)
+    model = entry.by_name.get(name)
+    if model is None:
+        # Not listed, such as a tuned model: look it up once
+        model = entry.by_name[name] = await gemini_client.get_client(api_key).get_model(model_name)
+    return model
+
+def stats() -> Dict[str, int]:
+    """Get the number of keys cached and the cache counters."""
+    return {"keys": len(_entries), **_stats}
@@ -0,0 +1,352 @@
+import os
+import uuid
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from app.models.pdf_models import PDFOperationType, PDFResponse
+from app.services import executor_service
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Runs any supported PDFOperationType from a plain dict of parameters, for
+# callers that do not go through the per-operation endpoints (jobs, batches).
+# Parameter names and validation rules match the form fields of pdf_router.
+
+SUPPORTED_OPERATIONS = {
+    PDFOperationType.MERGE,
+    PDFOperationType.SPLIT,
+    PDFOperationType.EXTRACT_PAGES,
+    PDFOperationType.ROTATE,
+    PDFOperationType.ADD_PAGE_NUMBERS,
+    PDFOperationType.ADD_WATERMARK,
+    PDFOperationType.CROP,
+    PDFOperationType.PROTECT,
+    PDFOperationType.UNLOCK,
+    PDFOperationType.COMPRESS,
+    PDFOperationType.REPAIR,
+    PDFOperationType.CONVERT_FROM_PDF,
+    PDFOperationType.CONVERT_TO_PDF,
+}
+
+# Operations that can be chained in a pipeline; compress is applied on save, so it must come last
+PIPELINE_OPERATIONS = [
+    PDFOperationType.ROTATE,
+    PDFOperationType.CROP,
+    PDFOperationType.EXTRACT_PAGES,
+    PDFOperationType.ADD_PAGE_NUMBERS,
+    PDFOperationType.ADD_WATERMARK,
+    PDFOperationType.COMPRESS,
+]
+
+PAGE_NUMBER_POSITIONS = ["top-left", "top-center", "top-right", "bottom-left", "bottom-center", "bottom-right"]
+WATERMARK_POSITIONS = ["center", "tiled"]
+COMPRESS_QUALITIES = ["low", "medium", "high"]
+CONVERT_FROM_PDF_FORMATS = ["txt", "jpg", "jpeg", "png", "docx", "doc", "html", "rtf", "odt", "xlsx", "csv"]
+
+def validate_operation(operation: PDFOperationType, params: Dict[str, Any], input_count: int,
+                       has_watermark_image: bool = False) -> Dict[str, Any]:
+    """Validate and normalize the parameters of an operation.
+
+    Args:
+        operation: The operation to run
+        params: Raw parameters (same names as the endpoint form fields)
+        input_count: Number of input files
+        has_watermark_image: Whether a watermark image is provided
+
+    Returns:
+        Normalized parameters
+
+    Raises:
+        ValueError: If the operation is unsupported or the parameters are invalid
+    """
+    if operation not in SUPPORTED_OPERATIONS:
+        raise ValueError(f"Operation {operation.value} is not supported")
+
+    if operation == PDFOperationType.MERGE:
+        if input_count < 2:
+            raise ValueError("Merge requires at least two files")
+    elif input_count != 1:
+        raise ValueError(f"Operation {operation.value} requires exactly one file")
+
+    if operation == PDFOperationType.SPLIT:
+        return {"ranges": _parse_page_ranges(_require(params, "ranges"))}
+
+    if operation == PDFOperationType.EXTRACT_PAGES:
+        return {"pages": _parse_pages(_require(params, "pages"))}
+
+    if operation == PDFOperationType.ROTATE:
+        rotation = int(_require(params, "rotation"))
+        if rotation not in [90, 180, 270]:
+            raise ValueError("Rotation must be 90, 180, or 270 degrees")
+        return {"rotation": rotation, "pages": _parse_pages(params.get("pages"))}
+
+    if operation == PDFOperationType.ADD_PAGE_NUMBERS:
+        position = params.get("position", "bottom-center")
+        if position not in PAGE_NUMBER_POSITIONS:
+            raise ValueError(f"Position must be one of: {', '.join(PAGE_NUMBER_POSITIONS)}")
+        return {
+            "position": position,
+            "start_number": int(params.get("start_number", 1)),
+            "format_str": str(params.get("format_str", "Page {page_num}")),
+        }
+
+    if operation == PDFOperationType.ADD_WATERMARK:
+        watermark_text = params.get("watermark_text")
+        if watermark_text is None and not has_watermark_image:
+            raise ValueError("Either watermark_text or watermark_image must be provided")
+        position = params.get("position", "center")
+        if position not in WATERMARK_POSITIONS:
+            raise ValueError(f"Position must be one of: {', '.join(WATERMARK_POSITIONS)}")
+        return {
+            "watermark_text": watermark_text,
+            "opacity": float(params.get("opacity", 0.3)),
+            "position": position,
+            "rotation": int(params.get("rotation", 0)),
+        }
+
+    if operation == PDFOperationType.CROP:
+        return {
+            "left": float(params.get("left", 0)),
+            "bottom": float(params.get("bottom", 0)),
+            "right": float(params.get("right", 0)),
+            "top": float(params.get("top", 0)),
+            "pages": _parse_pages(params.get("pages")),
+        }
+
+    if operation == PDFOperationType.PROTECT:
+        user_password = params.get("user_password")
+        owner_password = params.get("owner_password")
+        if user_password is None and owner_password is None:
+            raise ValueError("At least one of user_password or owner_password must be provided")
+        return {
+            "user_password": user_password,
+            "owner_password": owner_password,
+            "permissions": {
+                "print": _parse_bool(params, "allow_print", True),
+                "copy": _parse_bool(params, "allow_copy", True),
+                "modify": _parse_bool(params, "allow_modify", True),
+            },
+        }
+
+    if operation == PDFOperationType.UNLOCK:
+        return {"password": str(_require(params, "password"))}
+
+    if operation == PDFOperationType.COMPRESS:
+        quality = params.get("quality", "medium")
+        if quality not in COMPRESS_QUALITIES:
+            raise ValueError(f"Quality must be one of: {', '.join(COMPRESS_QUALITIES)}")
+        return {"quality": quality}
+
+    if operation == PDFOperationType.CONVERT_FROM_PDF:
+        format = str(_require(params, "format")).lower()
+        if format not in CONVERT_FROM_PDF_FORMATS:
+            raise ValueError(
+                f"Unsupported format: {format}. Supported formats: {', '.join(CONVERT_FROM_PDF_FORMATS)}"
+            )
+        return {"format": format}
+
+    return {}
+
+def validate_pipeline(steps: Any, has_watermark_image: bool = False) -> List[Dict[str, Any]]:
+    """Validate and normalize the steps of a pipeline.
+
+    Args:
+        steps: List of {"operation": name, "params": {...}} objects
+        has_watermark_image: Whether a watermark image is provided
+
+    Returns:
+        Steps with normalized parameters, ready for pdf_service.run_pipeline
+
+    Raises:
+        ValueError: If a step is unsupported or its parameters are invalid
+    """
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("steps must be a non-empty list")
+
+    normalized = []
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict) or "operation" not in step:
+            raise ValueError(f"Step {index + 1} must be an object with an operation")
+        try:
+            operation = PDFOperationType(step["operation"])
+        except ValueError:
+            raise ValueError(f"Step {index + 1}: unknown operation {step['operation']}")
+        if operation not in PIPELINE_OPERATIONS:
+            supported = ", ".join(op.value for op in PIPELINE_OPERATIONS)
+            raise ValueError(f"Step {index + 1}: {operation.value} cannot be used in a pipeline. Supported: {supported}")
+        if operation == PDFOperationType.COMPRESS and index != len(steps) - 1:
+            raise ValueError("compress must be the last step of a pipeline")
+
+        params = step.get("params") or {}
+        if not isinstance(params, dict):
+            raise ValueError(f"Step {index + 1}: params must be an object")
+        params = validate_operation(operation, params, 1, has_watermark_image)
+
+        # Pages are shared objects in memory, so a page cannot be extracted twice
+        if operation == PDFOperationType.EXTRACT_PAGES and len(set(params["pages"])) != len(params["pages"]):
+            raise ValueError(f"Step {index + 1}: duplicate pages are not supported in a pipeline")
+
+        normalized.append({"operation": operation.value, "params": params})
+    return normalized
+
+async def run_operation(operation: PDFOperationType, input_paths: List[str], params: Dict[str, Any],
+                        watermark_image_path: Optional[str] = None) -> PDFResponse:
+    """Run a PDF operation in the worker pool.
+
+    Args:
+        operation: The operation to run
+        input_paths: Paths to the input files
+        params: Raw parameters (same names as the endpoint form fields)
+        watermark_image_path: Path to the watermark image, for add_watermark
+
+    Returns:
+        A PDFResponse describing the output, like the matching endpoint returns
+
+    Raises:
+        ValueError: If the operation is unsupported or the parameters are invalid
+    """
+    params = validate_operation(operation, params, len(input_paths), watermark_image_path is not None)
+
+    output_file_id = str(uuid.uuid4())
+    output_path = os.path.join(settings.TEMP_FILE_DIR, f"{output_file_id}.pdf")
+    input_path = input_paths[0]
+
+    if operation == PDFOperationType.MERGE:
+        await executor_service.run_pdf_operation("merge_pdfs", input_paths, output_path)
+        return _file_response("PDFs merged successfully", output_path)
+
+    if operation == PDFOperationType.SPLIT:
+        output_dir = os.path.join(settings.TEMP_FILE_DIR, output_file_id)
+        os.makedirs(output_dir, exist_ok=True)
+        output_paths = await executor_service.run_pdf_operation("split_pdf", input_path, output_dir, params["ranges"])
+        return PDFResponse(
+            success=True,
+            message=f"PDF split into {len(output_paths)} files",
+            file_path=output_dir,
+            download_url=f"/api/v1/pdf/download-zip/{output_file_id}"
+        )
+
+    if operation == PDFOperationType.EXTRACT_PAGES:
+        await executor_service.run_pdf_operation("extract_pages", input_path, output_path, params["pages"])
+        return _file_response("Pages extracted successfully", output_path)
+
+    if operation == PDFOperationType.ROTATE:
+        await executor_service.run_pdf_operation(
+            "rotate_pdf", input_path, output_path, params["rotation"], params["pages"]
+        )
+        return _file_response("PDF rotated successfully", output_path)
+
+    if operation == PDFOperationType.ADD_PAGE_NUMBERS:
+        await executor_service.run_pdf_operation(
+            "add_page_numbers", input_path, output_path,
+            params["position"], params["start_number"], params["format_str"]
+        )
+        return _file_response("Page numbers added successfully", output_path)
+
+    if operation == PDFOperationType.ADD_WATERMARK:
+        await executor_service.run_pdf_operation(
+            "add_watermark", input_path, output_path, params["watermark_text"], watermark_image_path,
+            params["opacity"], params["position"], params["rotation"]
+        )
+        return _file_response("Watermark added successfully", output_path)
+
+    if operation == PDFOperationType.CROP:
+        await executor_service.run_pdf_operation(
+            "crop_pdf", input_path, output_path,
+            params["left"], params["bottom"], params["right"], params["top"], params["pages"]
+        )
+        return _file_response("PDF cropped successfully", output_path)
+
+    if operation == PDFOperationType.PROTECT:
+        await executor_service.run_pdf_operation(
+            "protect_pdf", input_path, output_path,
+            params["user_password"], params["owner_password"], params["permissions"]
+        )
+        return _file_response("PDF protected successfully", output_path)
+
+    if operation == PDFOperationType.UNLOCK:
+        await executor_service.run_pdf_operation("unlock_pdf", input_path, output_path, params["password"])
+        return _file_response("PDF unlocked successfully", output_path)
+
+    if operation == PDFOperationType.COMPRESS:
+        await executor_service.run_pdf_operation("compress_pdf", input_path, output_path, params["quality"])
+        return _file_response("PDF compressed successfully", output_path)
+
+    if operation == PDFOperationType.REPAIR:
+        await executor_service.run_pdf_operation("repair_pdf", input_path, output_path)
+        return _file_response("PDF repaired successfully", output_path)
+
+    if operation == PDFOperationType.CONVERT_FROM_PDF:
+        output_base_path = os.path.join(settings.TEMP_FILE_DIR, output_file_id)
+        converted_path = await executor_service.run_pdf_operation(
+            "convert_from_pdf", input_path, output_base_path, params["format"]
+        )
+        return _file_response(f"PDF converted to {params['format']} successfully", converted_path)
+
+    # PDFOperationType.CONVERT_TO_PDF
+    await executor_service.run_pdf_operation("convert_to_pdf", input_path, output_path)
+    return _file_response("File converted to PDF successfully", output_path)
+
+def _file_response(message: str, output_path: str) -> PDFResponse:
+    """Build the response for an operation that produced a single file."""
+    return PDFResponse(
+        success=True,
+        message=message,
+        file_path=output_path,
+        download_url=f"/api/v1/pdf/download/{os.path.basename(output_path)}"
+    )
+
+def _require(params: Dict[str, Any], name: str) -> Any:
+    """Get a required parameter."""
+    if params.get(name) is None:
+        raise ValueError(f"Missing required parameter: {name}")
+    return params[name]
+
+def _parse_bool(params: Dict[str, Any], name: str, default: bool) -> bool:
+    """Parse a boolean parameter given as a JSON boolean or as a form value such as "false"."""
+    value = params.get(name)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        if value.strip().lower() in ("true", "1", "yes", "on"):
+            return True
+        if value.strip().lower() in ("false", "0", "no", "off"):
+            return False
+    raise ValueError(f"Invalid value for {name}: {value!r} (expected true or false)")
+
+def _parse_pages(value: Any) -> Optional[List[int]]:
+    """Parse a list of 1-indexed page numbers from a list or a comma-separated string."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [part for part in value.split(",") if part.strip()]
+    try:
+        return [int(page) for page in value]
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid page list: {value}")
+
+def _parse_page_ranges(value: Any) -> List[Tuple[int, int]]:
+    """Parse page ranges from "1-5,6-10" strings or [start, end] pairs."""
+    if isinstance(value, str):
+        value = value.split(",")
+
+    page_ranges = []
+    for item in value:
+        if isinstance(item, str):
+            parts = item.split("-")
+            if len(parts) != 2:
+                raise ValueError(f"Invalid page range format: {item}")
+        else:
+            parts = list(item)
+        try:
+            start, end = int(parts[0]), int(parts[1])
+        except (TypeError, ValueError, IndexError):
+            raise ValueError(f"Invalid page range format: {item}")
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range: {item}")
+        page_ranges.append((start, end))
+    return page_ranges
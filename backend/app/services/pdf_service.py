@@ -1,10 +1,12 @@
+import io
 import os
+import time
 import uuid
 import logging
 import tempfile
 import subprocess
 from pathlib import Path
-from typing import List, Optional, Tuple, Dict, Any
+from typing import Iterator, List, Optional, Tuple, Dict, Any
 import PyPDF2
 from PyPDF2 import PdfReader, PdfWriter
 import pikepdf
@@ -18,6 +20,50 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Bump when text extraction changes, so cached page texts are extracted again
+TEXT_EXTRACTOR_VERSION = f"pypdf2-{PyPDF2.__version__}-1"
+
+# Compression quality settings
+COMPRESSION_SETTINGS = {
+    "low": {
+        "image_quality": 30,  # Low image quality (0-100)
+        "compress_images": True,
+        "remove_metadata": True
+    },
+    "medium": {
+        "image_quality": 60,  # Medium image quality
+        "compress_images": True,
+        "remove_metadata": False
+    },
+    "high": {
+        "image_quality": 90,  # High image quality
+        "compress_images": True,
+        "remove_metadata": False
+    }
+}
+
+def iter_text_pages(file_path: str, first_page: int = 1, last_page: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """Lazily extract the text of a PDF one page at a time.
+
+    Pages are only parsed when the caller asks for them, so stopping early
+    skips the rest of the document.
+
+    Args:
+        file_path: Path to the PDF file
+        first_page: First page to extract (1-indexed)
+        last_page: Last page to extract (1-indexed, inclusive), or None for the last page
+
+    Yields:
+        (page_number, text) for each page, in page order
+    """
+    with open(file_path, 'rb') as file:
+        reader = PdfReader(file)
+        total_pages = len(reader.pages)
+        last_page = total_pages if last_page is None else min(last_page, total_pages)
+
+        for page_number in range(max(1, first_page), last_page + 1):
+            yield page_number, reader.pages[page_number - 1].extract_text()
+
 def extract_text_from_pdf(file_path: str) -> str:
     """Extract text from a PDF file.
 
@@ -28,16 +74,40 @@ def extract_text_from_pdf(file_path: str) -> str:
         Extracted text from the PDF
     """
     try:
-        text = ""
-        with open(file_path, 'rb') as file:
-            reader = PdfReader(file)
-            for page in reader.pages:
-                text += page.extract_text() + "\n\n"
-        return text
+        return "".join(page_text + "\n\n" for _, page_text in iter_text_pages(file_path))
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {e}")
         raise
 
+def extract_text_pages(file_path: str, start: int = 0, end: Optional[int] = None) -> List[str]:
+    """Extract the text of each page of a PDF file.
+
+    Args:
+        file_path: Path to the PDF file
+        start: Index of the first page to extract (0-indexed)
+        end: Index after the last page to extract, or None for the last page
+
+    Returns:
+        The text of each page, in page order
+    """
+    try:
+        return [text for _, text in iter_text_pages(file_path, start + 1, end)]
+    except Exception as e:
+        logger.error(f"Error extracting text from PDF: {e}")
+        raise
+
+def count_pages(file_path: str) -> int:
+    """Count the pages of a PDF file without parsing their content.
+
+    Args:
+        file_path: Path to the PDF file
+
+    Returns:
+        Number of pages
+    """
+    with open(file_path, 'rb') as file:
+        return len(PdfReader(file).pages)
+
 def get_pdf_info(file_path: str) -> Dict[str, Any]:
     """Get information about a PDF file.
 
@@ -60,6 +130,26 @@ def get_pdf_info(file_path: str) -> Dict[str, Any]:
         logger.error(f"Error getting PDF info: {e}")
         raise
 
+def get_page_geometry(file_path: str) -> List[Dict[str, float]]:
+    """Get the size and rotation of every page of a PDF file.
+
+    Args:
+        file_path: Path to the PDF file
+
+    Returns:
+        For each page, its media box width and height in points and its rotation in degrees
+    """
+    with open(file_path, 'rb') as file:
+        reader = PdfReader(file)
+        return [
+            {
+                "width": float(page.mediabox.width),
+                "height": float(page.mediabox.height),
+                "rotation": int(page.rotation or 0) % 360
+            }
+            for page in reader.pages
+        ]
+
 def merge_pdfs(file_paths: List[str], output_path: str) -> str:
     """Merge multiple PDFs into a single PDF.
 
@@ -173,11 +263,7 @@ def rotate_pdf(file_path: str, output_path: str, rotation: int, pages: Optional[
             reader = PdfReader(file)
             writer = PdfWriter()
 
-            for i, page in enumerate(reader.pages):
-                # If pages is None, rotate all pages
-                # Otherwise, only rotate specified pages
-                if pages is None or (i + 1) in pages:
-                    page.rotate(rotation)
+            for page in _rotate_pages(list(reader.pages), rotation, pages):
                 writer.add_page(page)
 
             with open(output_path, 'wb') as output:
@@ -204,53 +290,19 @@ def add_page_numbers(file_path: str, output_path: str, position: str = "bottom-c
         Path to the PDF with page numbers
     """
     try:
-        # First, get the total number of pages
         with open(file_path, 'rb') as file:
             reader = PdfReader(file)
-            total_pages = len(reader.pages)
-
-        # Create a temporary PDF with just the page numbers
-        temp_path = os.path.join(os.path.dirname(output_path), f"temp_{uuid.uuid4()}.pdf")
-
-        # Position mapping
-        positions = {
-            "top-left": (50, 800),
-            "top-center": (300, 800),
-            "top-right": (550, 800),
-            "bottom-left": (50, 50),
-            "bottom-center": (300, 50),
-            "bottom-right": (550, 50)
-        }
-
-        x, y = positions.get(position, positions["bottom-center"])
-
-        # Create a PDF with page numbers
-        c = canvas.Canvas(temp_path, pagesize=letter)
-
-        for i in range(total_pages):
-            c.drawString(x, y, format_str.format(page_num=start_number + i, total_pages=total_pages))
-            c.showPage()
-
-        c.save()
-
-        # Merge the original PDF with the page numbers
-        with open(file_path, 'rb') as original_file, open(temp_path, 'rb') as overlay_file:
-            original_pdf = PdfReader(original_file)
-            overlay_pdf = PdfReader(overlay_file)
+            pages = list(reader.pages)
 
+            # Stamp the page numbers onto each page
+            overlay = _page_number_overlay(len(pages), position, start_number, format_str)
             writer = PdfWriter()
-
-            for i, page in enumerate(original_pdf.pages):
-                page.merge_page(overlay_pdf.pages[i])
+            for page in _merge_overlay(pages, overlay):
                 writer.add_page(page)
 
             with open(output_path, 'wb') as output:
                 writer.write(output)
 
-        # Clean up temporary file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-
         return output_path
     except Exception as e:
         logger.error(f"Error adding page numbers to PDF: {e}")
@@ -277,85 +329,19 @@ def add_watermark(file_path: str, output_path: str, watermark_text: Optional[str
         if watermark_text is None and watermark_image is None:
             raise ValueError("Either watermark_text or watermark_image must be provided")
 
-        # Create a temporary PDF with just the watermark
-        temp_path = os.path.join(os.path.dirname(output_path), f"temp_{uuid.uuid4()}.pdf")
-
-        # Get the dimensions of the original PDF
         with open(file_path, 'rb') as file:
             reader = PdfReader(file)
-            total_pages = len(reader.pages)
-            # Assuming all pages have the same size as the first page
-            if total_pages > 0:
-                page = reader.pages[0]
-                width = float(page.mediabox.width)
-                height = float(page.mediabox.height)
-            else:
-                # Default to letter size if no pages
-                width, height = letter
-
-        # Create a PDF with the watermark
-        c = canvas.Canvas(temp_path, pagesize=(width, height))
-
-        # Set opacity
-        c.setFillAlpha(opacity)
-
-        # Position mapping
-        if position == "center":
-            positions = [(width / 2, height / 2)]
-        elif position == "tiled":
-            # Create a grid of positions
-            x_step, y_step = 200, 200
-            positions = [(x, y) for x in range(0, int(width), x_step)
-                        for y in range(0, int(height), y_step)]
-        else:
-            # Default to center
-            positions = [(width / 2, height / 2)]
-
-        # Apply watermark to each page
-        for _ in range(total_pages):
-            c.saveState()
-
-            # Apply rotation
-            if rotation != 0:
-                c.translate(width / 2, height / 2)
-                c.rotate(rotation)
-                c.translate(-width / 2, -height / 2)
-
-            # Draw watermark at each position
-            for x, y in positions:
-                if watermark_text:
-                    # Text watermark
-                    c.setFont("Helvetica", 60)
-                    c.setFillColorRGB(0.5, 0.5, 0.5)  # Gray color
-                    c.drawCentredString(x, y, watermark_text)
-                elif watermark_image:
-                    # Image watermark
-                    # Adjust position to center the image
-                    c.drawImage(watermark_image, x - 100, y - 100, 200, 200, mask='auto')
-
-            c.restoreState()
-            c.showPage()
-
-        c.save()
-
-        # Merge the original PDF with the watermark
-        with open(file_path, 'rb') as original_file, open(temp_path, 'rb') as watermark_file:
-            original_pdf = PdfReader(original_file)
-            watermark_pdf = PdfReader(watermark_file)
+            pages = list(reader.pages)
 
+            # Stamp the watermark onto each page
+            overlay = _watermark_overlay(pages, watermark_text, watermark_image, opacity, position, rotation)
             writer = PdfWriter()
-
-            for i, page in enumerate(original_pdf.pages):
-                page.merge_page(watermark_pdf.pages[i])
+            for page in _merge_overlay(pages, overlay):
                 writer.add_page(page)
 
             with open(output_path, 'wb') as output:
                 writer.write(output)
 
-        # Clean up temporary file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-
         return output_path
     except Exception as e:
         logger.error(f"Error adding watermark to PDF: {e}")
@@ -382,36 +368,8 @@ def crop_pdf(file_path: str, output_path: str, left: float, bottom: float, right
             reader = PdfReader(file)
             writer = PdfWriter()
 
-            for i, page in enumerate(reader.pages):
-                # If pages is None, crop all pages
-                # Otherwise, only crop specified pages
-                if pages is None or (i + 1) in pages:
-                    # Get the original page dimensions
-                    original_left = float(page.mediabox.left)
-                    original_bottom = float(page.mediabox.bottom)
-                    original_right = float(page.mediabox.right)
-                    original_top = float(page.mediabox.top)
-
-                    # Calculate new dimensions
-                    new_left = original_left + left
-                    new_bottom = original_bottom + bottom
-                    new_right = original_right - right
-                    new_top = original_top - top
-
-                    # Ensure valid dimensions
-                    if new_left >= new_right or new_bottom >= new_top:
-                        # Invalid crop, keep original dimensions
-                        writer.add_page(page)
-                    else:
-                        # Set new crop box
-                        page.mediabox.left = new_left
-                        page.mediabox.bottom = new_bottom
-                        page.mediabox.right = new_right
-                        page.mediabox.top = new_top
-                        writer.add_page(page)
-                else:
-                    # Add page without cropping
-                    writer.add_page(page)
+            for page in _crop_pages(list(reader.pages), left, bottom, right, top, pages):
+                writer.add_page(page)
 
             with open(output_path, 'wb') as output:
                 writer.write(output)
@@ -613,39 +571,9 @@ def compress_pdf(file_path: str, output_path: str, quality: str = "medium") -> s
         Path to the compressed PDF
     """
     try:
-        # Quality settings
-        quality_settings = {
-            "low": {
-                "image_quality": 30,  # Low image quality (0-100)
-                "compress_images": True,
-                "remove_metadata": True
-            },
-            "medium": {
-                "image_quality": 60,  # Medium image quality
-                "compress_images": True,
-                "remove_metadata": False
-            },
-            "high": {
-                "image_quality": 90,  # High image quality
-                "compress_images": True,
-                "remove_metadata": False
-            }
-        }
-
-        settings = quality_settings.get(quality.lower(), quality_settings["medium"])
-
         # Use pikepdf for compression
         with pikepdf.open(file_path) as pdf:
-            # Remove metadata if specified
-            if settings["remove_metadata"]:
-                with pdf.open_metadata() as meta:
-                    meta.clear()
-
-            # Save with compression settings
-            pdf.save(output_path,
-                    compress_streams=True,
-                    preserve_pdfa=False,
-                    object_stream_mode=pikepdf.ObjectStreamMode.generate)
+            _save_compressed(pdf, output_path, quality)
 
         return output_path
     except Exception as e:
@@ -672,6 +600,111 @@ def repair_pdf(file_path: str, output_path: str) -> str:
         logger.error(f"Error repairing PDF: {e}")
         raise
 
+def _load_pages(reader: PdfReader) -> List[PyPDF2.PageObject]:
+    """Read the pages of a PDF and every object they reference.
+
+    PdfReader parses objects lazily, when they are first accessed; resolving
+    them all here keeps that work out of the steps that would touch them first.
+    """
+    pages = list(reader.pages)
+    seen = set()
+    pending: List[Any] = list(pages)
+    while pending:
+        obj = pending.pop()
+        if isinstance(obj, PyPDF2.generic.IndirectObject):
+            if (obj.idnum, obj.generation) in seen:
+                continue
+            seen.add((obj.idnum, obj.generation))
+            obj = obj.get_object()
+        if isinstance(obj, dict):
+            pending.extend(obj.values())
+        elif isinstance(obj, list):
+            pending.extend(obj)
+    return pages
+
+def run_pipeline(file_path: str, output_path: str, steps: List[Dict[str, Any]],
+                 watermark_image: Optional[str] = None) -> Dict[str, Any]:
+    """Apply several operations to a PDF, parsing and writing it only once.
+
+    Supported steps are rotate, crop, extract_pages, add_page_numbers and
+    add_watermark, which work on the parsed pages in memory, and compress,
+    which can only be the last step since it applies when the result is saved.
+
+    Args:
+        file_path: Path to the PDF file
+        output_path: Path to save the resulting PDF
+        steps: Ordered list of {"operation": name, "params": {...}} with the same
+               parameters as the individual functions
+        watermark_image: Path to the image used by add_watermark steps
+
+    Returns:
+        Dictionary with the output path, page count and the time spent in
+        parsing, each step and serialization
+    """
+    try:
+        timings = []
+        started = time.perf_counter()
+
+        with open(file_path, 'rb') as file:
+            reader = PdfReader(file)
+            if reader.is_encrypted:
+                raise ValueError("The PDF is encrypted. Please unlock it first.")
+            pages = _load_pages(reader)
+            timings.append({"step": "parse", "seconds": time.perf_counter() - started})
+
+            compress_quality = None
+            for step in steps:
+                started = time.perf_counter()
+                operation = step["operation"]
+                params = step["params"]
+
+                if operation == "rotate":
+                    pages = _rotate_pages(pages, params["rotation"], params.get("pages"))
+                elif operation == "crop":
+                    pages = _crop_pages(pages, params["left"], params["bottom"], params["right"],
+                                        params["top"], params.get("pages"))
+                elif operation == "extract_pages":
+                    pages = [pages[page_num - 1] for page_num in params["pages"] if 0 < page_num <= len(pages)]
+                elif operation == "add_page_numbers":
+                    overlay = _page_number_overlay(len(pages), params["position"], params["start_number"],
+                                                   params["format_str"])
+                    pages = _merge_overlay(pages, overlay)
+                elif operation == "add_watermark":
+                    overlay = _watermark_overlay(pages, params.get("watermark_text"), watermark_image,
+                                                 params["opacity"], params["position"], params["rotation"])
+                    pages = _merge_overlay(pages, overlay)
+                elif operation == "compress":
+                    # Applied when saving
+                    compress_quality = params["quality"]
+                    continue
+                else:
+                    raise ValueError(f"Operation {operation} is not supported in a pipeline")
+
+                timings.append({"step": operation, "seconds": time.perf_counter() - started})
+
+            started = time.perf_counter()
+            writer = PdfWriter()
+            for page in pages:
+                writer.add_page(page)
+
+            if compress_quality is None:
+                with open(output_path, 'wb') as output:
+                    writer.write(output)
+                timings.append({"step": "serialize", "seconds": time.perf_counter() - started})
+            else:
+                # Compression is done by pikepdf, which reads the result from memory
+                buffer = io.BytesIO()
+                writer.write(buffer)
+                buffer.seek(0)
+                with pikepdf.open(buffer) as pdf:
+                    _save_compressed(pdf, output_path, compress_quality)
+                timings.append({"step": "compress", "seconds": time.perf_counter() - started})
+
+        return {"output_path": output_path, "page_count": len(pages), "timings": timings}
+    except Exception as e:
+        logger.error(f"Error running PDF pipeline: {e}")
+        raise
+
 def convert_from_pdf(file_path: str, output_path: str, format: str) -> str:
     """Convert a PDF to another format.
 
@@ -695,12 +728,10 @@ def convert_from_pdf(file_path: str, output_path: str, format: str) -> str:
         format = format.lower()
 
         if format == 'txt':
-            # Extract text from PDF
-            text = extract_text_from_pdf(file_path)
-
-            # Write text to output file
+            # Write the text page by page, so memory use does not grow with the document
             with open(final_output_path, 'w', encoding='utf-8') as f:
-                f.write(text)
+                for _, page_text in iter_text_pages(file_path):
+                    f.write(page_text + "\n\n")
 
             return final_output_path
 
@@ -977,3 +1008,134 @@ def _convert_office_to_pdf(file_path: str, output_path: str) -> str:
     except Exception as e:
         logger.error(f"Error converting Office document to PDF: {e}")
         raise
+
+def _rotate_pages(pages: List[Any], rotation: int, selected: Optional[List[int]] = None) -> List[Any]:
+    """Rotate the selected pages (1-indexed, None for all) in place."""
+    for i, page in enumerate(pages):
+        if selected is None or (i + 1) in selected:
+            page.rotate(rotation)
+    return pages
+
+def _crop_pages(pages: List[Any], left: float, bottom: float, right: float, top: float,
+                selected: Optional[List[int]] = None) -> List[Any]:
+    """Shrink the media box of the selected pages (1-indexed, None for all) in place."""
+    for i, page in enumerate(pages):
+        if selected is not None and (i + 1) not in selected:
+            continue
+
+        # Calculate new dimensions from the original page dimensions
+        new_left = float(page.mediabox.left) + left
+        new_bottom = float(page.mediabox.bottom) + bottom
+        new_right = float(page.mediabox.right) - right
+        new_top = float(page.mediabox.top) - top
+
+        # Invalid crops keep the original dimensions
+        if new_left < new_right and new_bottom < new_top:
+            page.mediabox.left = new_left
+            page.mediabox.bottom = new_bottom
+            page.mediabox.right = new_right
+            page.mediabox.top = new_top
+    return pages
+
+def _page_number_overlay(total_pages: int, position: str, start_number: int, format_str: str) -> PdfReader:
+    """Render page numbers on blank pages, one per document page, in memory."""
+    # Position mapping
+    positions = {
+        "top-left": (50, 800),
+        "top-center": (300, 800),
+        "top-right": (550, 800),
+        "bottom-left": (50, 50),
+        "bottom-center": (300, 50),
+        "bottom-right": (550, 50)
+    }
+
+    x, y = positions.get(position, positions["bottom-center"])
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+
+    for i in range(total_pages):
+        c.drawString(x, y, format_str.format(page_num=start_number + i, total_pages=total_pages))
+        c.showPage()
+
+    c.save()
+    buffer.seek(0)
+    return PdfReader(buffer)
+
+def _watermark_overlay(pages: List[Any], watermark_text: Optional[str], watermark_image: Optional[str],
+                       opacity: float, position: str, rotation: int) -> PdfReader:
+    """Render the watermark on blank pages, one per document page, in memory."""
+    if watermark_text is None and watermark_image is None:
+        raise ValueError("Either watermark_text or watermark_image must be provided")
+
+    # Assuming all pages have the same size as the first page
+    if pages:
+        width = float(pages[0].mediabox.width)
+        height = float(pages[0].mediabox.height)
+    else:
+        # Default to letter size if no pages
+        width, height = letter
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(width, height))
+
+    # Set opacity
+    c.setFillAlpha(opacity)
+
+    # Position mapping
+    if position == "tiled":
+        # Create a grid of positions
+        x_step, y_step = 200, 200
+        positions = [(x, y) for x in range(0, int(width), x_step)
+                    for y in range(0, int(height), y_step)]
+    else:
+        # Default to center
+        positions = [(width / 2, height / 2)]
+
+    for _ in range(len(pages)):
+        c.saveState()
+
+        # Apply rotation
+        if rotation != 0:
+            c.translate(width / 2, height / 2)
+            c.rotate(rotation)
+            c.translate(-width / 2, -height / 2)
+
+        # Draw watermark at each position
+        for x, y in positions:
+            if watermark_text:
+                # Text watermark
+                c.setFont("Helvetica", 60)
+                c.setFillColorRGB(0.5, 0.5, 0.5)  # Gray color
+                c.drawCentredString(x, y, watermark_text)
+            elif watermark_image:
+                # Image watermark, centered on the position
+                c.drawImage(watermark_image, x - 100, y - 100, 200, 200, mask='auto')
+
+        c.restoreState()
+        c.showPage()
+
+    c.save()
+    buffer.seek(0)
+    return PdfReader(buffer)
+
+def _merge_overlay(pages: List[Any], overlay: PdfReader) -> List[Any]:
+    """Merge each overlay page onto the matching document page in place."""
+    for i, page in enumerate(pages):
+        page.merge_page(overlay.pages[i])
+    return pages
+
+def _save_compressed(pdf: pikepdf.Pdf, output_path: str, quality: str = "medium"):
+    """Save an open pikepdf document with the compression settings for a quality level."""
+    settings = COMPRESSION_SETTINGS.get(quality.lower(), COMPRESSION_SETTINGS["medium"])
+
+    # Remove metadata if specified
+    if settings["remove_metadata"]:
+        with pdf.open_metadata() as meta:
+            meta.clear()
+
+    # Save with compression settings
+    pdf.save(output_path,
+            compress_streams=True,
+            preserve_pdfa=False,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate)
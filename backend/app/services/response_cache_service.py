@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services import coalescing_service, gemini_client, janitor_service, storage_service
+
+logger = logging.getLogger(__name__)
+
+# Cache of Gemini responses keyed by model, feature, parameters and document
+# content, so repeated summaries, translations and question lists for the same
+# document cost no API quota. Entries live in a small in-memory LRU backed by
+# one JSON file per entry on disk; both tiers honour RESPONSE_CACHE_TTL_SECONDS
+# and the janitor removes expired files.
+CACHE_DIR = os.path.join(settings.DATA_DIR, "response_cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+janitor_service.reserve(CACHE_DIR)
+
+_lock = threading.Lock()
+# Cache key -> (expiry timestamp, value), least recently used first
+_memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0}
+
+def make_key(model_name: str, feature: str, params: Dict[str, Any], document_digest: str) -> str:
+    """Build the cache key of a response.
+
+    Args:
+        model_name: The name of the Gemini model
+        feature: The AI feature (chat, summarize, ...)
+        params: Every parameter that changes the response
+        document_digest: SHA-256 hex digest of the document
+
+    Returns:
+        A hex digest identifying the response
+    """
+    material = json.dumps([model_name, feature, params, document_digest], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def _entry_path(key: str) -> str:
+    """Get the disk path of a cache entry."""
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+def _remember(key: str, expires_at: float, value: Any):
+    """Store an entry in the memory tier. Must hold _lock."""
+    _memory[key] = (expires_at, value)
+    _memory.move_to_end(key)
+    while len(_memory) > settings.RESPONSE_CACHE_MEMORY_ENTRIES:
+        _memory.popitem(last=False)
+
+def load(key: str) -> Optional[Any]:
+    """Get a cached response from memory, then from disk.
+
+    Args:
+        key: The cache key
+
+    Returns:
+        The cached value, or None if missing or expired
+    """
+    now = time.time()
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _memory.move_to_end(key)
+                _stats["memory_hits"] += 1
+                return entry[1]
+            del _memory[key]
+
+    try:
+        with open(_entry_path(key), "r", encoding="utf-8") as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        data = None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable response cache entry {key}: {e}")
+        data = None
+
+    with _lock:
+        if data is None or data.get("expires_at", 0) <= now:
+            _stats["misses"] += 1
+            return None
+        _remember(key, data["expires_at"], data["value"])
+        _stats["disk_hits"] += 1
+    return data["value"]
+
+def save(key: str, value: Any):
+    """Store a response in both tiers.
+
+    Args:
+        key: The cache key
+        value: A JSON-serializable response
+    """
+    expires_at = time.time() + settings.RESPONSE_CACHE_TTL_SECONDS
+    with _lock:
+        _remember(key, expires_at, value)
+
+    # Write atomically so readers never see a partial entry
+    path = _entry_path(key)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"expires_at": expires_at, "value": value}, file)
+        os.replace(temp_path, path)
+        janitor_service.register_deadline(path, expires_at)
+    except OSError as e:
+        logger.warning(f"Could not write response cache entry {key}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+async def lookup(feature: str, model_name: str, params: Dict[str, Any], pdf_path: str,
+                 bypass: bool = False) -> Tuple[str, Optional[Any]]:
+    """Get the cache key of a response for a document and its cached value.
+
+    Args:
+        feature: The AI feature (chat, summarize, ...)
+        model_name: The name of the Gemini model
+        params: Every parameter that changes the response
+        pdf_path: Path to the document
+        bypass: Skip the lookup, so the response is generated again
+
+    Returns:
+        The cache key, to save the response under, and the cached value or None
+    """
+    digest = await run_in_threadpool(storage_service.file_digest, pdf_path)
+    key = make_key(model_name, feature, params, digest)
+
+    if bypass:
+        with _lock:
+            _stats["bypassed"] += 1
+        return key, None
+    return key, await run_in_threadpool(load, key)
+
+async def get_or_compute(api_key: str, feature: str, model_name: str, params: Dict[str, Any], pdf_path: str,
+                         compute: Callable[[], Awaitable[Optional[Any]]], bypass: bool = False) -> Optional[Any]:
+    """Get a response for a document from the cache, generating it on a miss.
+
+    Args:
+        api_key: The Gemini API key compute uses
+        feature: The AI feature (chat, summarize, ...)
+        model_name: The name of the Gemini model
+        params: Every parameter that changes the response
+        pdf_path: Path to the document
+        compute: Coroutine function generating the response; None results are not cached.
+                 Concurrent calls for the same response with the same API key run it only once
+        bypass: Skip the lookup and generate a fresh response, which replaces the cached one
+
+    Returns:
+        The response
+    """
+    key, value = await lookup(feature, model_name, params, pdf_path, bypass)
+    if value is not None:
+        return value
+
+    async def compute_and_save() -> Optional[Any]:
+        value = await compute()
+        if value is not None:
+            await run_in_threadpool(save, key, value)
+        return value
+
+    # Identical requests arriving while the response is generated share the same call,
+    # but only with the same API key: the call spends that key's quota and may fail
+    # for it alone. Cached responses are shared across keys.
+    return await coalescing_service.run(feature, f"{key}:{gemini_client.key_hash(api_key)}", compute_and_save)
+
+def rebuild():
+    """Schedule the entries on disk for expiry. Called on startup."""
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            if name.endswith(".tmp"):
+                # Leftover from an interrupted write
+                os.remove(path)
+                continue
+            deadline = os.path.getmtime(path) + settings.RESPONSE_CACHE_TTL_SECONDS
+        except FileNotFoundError:
+            continue
+        janitor_service.register_deadline(path, deadline)
+
+def stats() -> Dict[str, Any]:
+    """Get cache size and hit counters."""
+    with _lock:
+        return {"memory_entries": len(_memory), **_stats}
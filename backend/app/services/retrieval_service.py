@@ -0,0 +1,183 @@
+import re
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services import storage_service, text_cache_service
+
+logger = logging.getLogger(__name__)
+
+# Lexical retrieval over the pages of a PDF, so chat prompts only carry the
+# passages relevant to the question. Pages are split into chunks of at most
+# RETRIEVAL_CHUNK_CHARS characters on paragraph boundaries and scored with
+# Okapi BM25. Indexes are built once per document content and kept in a small
+# in-memory LRU.
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+@dataclass
+class Chunk:
+    """A passage of a document."""
+    page_number: int  # 1-indexed
+    text: str
+    score: float = 0.0  # BM25 score against the query, once retrieved
+
+class BM25Index:
+    """BM25 index over a list of chunks, stored as term-major sparse arrays."""
+
+    def __init__(self, chunks: List[Chunk]):
+        self.chunks = chunks
+
+        vocabulary: Dict[str, int] = {}
+        postings: List[Dict[int, int]] = []
+        lengths = np.zeros(len(chunks), dtype=np.float64)
+
+        for chunk_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk.text)
+            lengths[chunk_id] = len(tokens)
+            for token in tokens:
+                term_id = vocabulary.setdefault(token, len(vocabulary))
+                if term_id == len(postings):
+                    postings.append({})
+                postings[term_id][chunk_id] = postings[term_id].get(chunk_id, 0) + 1
+
+        # CSR layout: the postings of term t are chunk_ids/tfs[indptr[t]:indptr[t + 1]]
+        self.vocabulary = vocabulary
+        self.indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum([len(p) for p in postings])
+        self.chunk_ids = np.fromiter((c for p in postings for c in p), dtype=np.int64, count=int(self.indptr[-1]))
+        self.tfs = np.fromiter((tf for p in postings for tf in p.values()), dtype=np.float64, count=int(self.indptr[-1]))
+
+        document_frequency = np.diff(self.indptr).astype(np.float64)
+        self.idf = np.log1p((len(chunks) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        # Per-chunk length normalization, precomputed once
+        average_length = lengths.mean() if len(chunks) else 0.0
+        self.norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / (average_length or 1.0))
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """Score every chunk against a query.
+
+        Args:
+            query: The query text
+            top_k: Maximum number of chunks to return
+
+        Returns:
+            (chunk_id, score) for the best matching chunks, best first; chunks
+            sharing no term with the query are left out
+        """
+        scores = np.zeros(len(self.chunks), dtype=np.float64)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            ids = self.chunk_ids[start:end]
+            tfs = self.tfs[start:end]
+            scores[ids] += self.idf[term_id] * tfs * (BM25_K1 + 1) / (tfs + self.norms[ids])
+
+        matching = np.flatnonzero(scores > 0)
+        if len(matching) > top_k:
+            matching = matching[np.argpartition(-scores[matching], top_k - 1)[:top_k]]
+        best = matching[np.argsort(-scores[matching], kind="stable")]
+        return [(int(chunk_id), float(scores[chunk_id])) for chunk_id in best]
+
+_lock = threading.Lock()
+_indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+def chunk_pages(pages: List[str], max_chars: Optional[int] = None) -> List[Chunk]:
+    """Split page texts into chunks on paragraph boundaries.
+
+    Args:
+        pages: The text of each page
+        max_chars: Maximum characters per chunk (RETRIEVAL_CHUNK_CHARS by default)
+
+    Returns:
+        Chunks in document order; a chunk never spans two pages
+    """
+    max_chars = max_chars or settings.RETRIEVAL_CHUNK_CHARS
+    chunks = []
+    for page_number, page_text in enumerate(pages, start=1):
+        current = ""
+        for paragraph in re.split(r"\n\s*\n", page_text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if current and len(current) + len(paragraph) + 2 > max_chars:
+                chunks.append(Chunk(page_number, current))
+                current = ""
+            # Paragraphs longer than a chunk are cut into pieces
+            while len(paragraph) > max_chars:
+                chunks.append(Chunk(page_number, paragraph[:max_chars]))
+                paragraph = paragraph[max_chars:]
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+        if current:
+            chunks.append(Chunk(page_number, current))
+    return chunks
+
+async def get_index(pdf_path: str) -> BM25Index:
+    """Get the retrieval index of a PDF, building it on first use.
+
+    Args:
+        pdf_path: Path to the PDF file
+
+    Returns:
+        The index of the document's chunks
+    """
+    digest = await run_in_threadpool(storage_service.file_digest, pdf_path)
+    with _lock:
+        index = _indexes.get(digest)
+        if index is not None:
+            _indexes.move_to_end(digest)
+            return index
+
+    pages = await text_cache_service.get_pages(pdf_path)
+    index = await run_in_threadpool(lambda: BM25Index(chunk_pages(pages)))
+
+    with _lock:
+        _indexes[digest] = index
+        while len(_indexes) > settings.RETRIEVAL_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+async def retrieve(pdf_path: str, query: str, top_k: Optional[int] = None) -> List[Chunk]:
+    """Find the chunks of a PDF most relevant to a query.
+
+    When no chunk shares a term with the query, the first chunks of the
+    document are used instead.
+
+    Args:
+        pdf_path: Path to the PDF file
+        query: The question
+        top_k: Number of chunks to return (RETRIEVAL_TOP_K by default)
+
+    Returns:
+        The selected chunks with their scores, in document order
+    """
+    top_k = top_k or settings.RETRIEVAL_TOP_K
+    index = await get_index(pdf_path)
+
+    scores = dict(index.search(query, top_k))
+    if not scores:
+        scores = {chunk_id: 0.0 for chunk_id in range(min(top_k, len(index.chunks)))}
+    return [replace(index.chunks[chunk_id], score=scores[chunk_id]) for chunk_id in sorted(scores)]
+
+def format_chunks(chunks: List[Chunk]) -> str:
+    """Format chunks as prompt context, labelled with their page numbers."""
+    return "\n\n".join(f"[Page {chunk.page_number}]\n{chunk.text}" for chunk in chunks)
+
+def source_pages(chunks: List[Chunk]) -> List[int]:
+    """Get the sorted page numbers the chunks come from."""
+    return sorted({chunk.page_number for chunk in chunks})
@@ -0,0 +1,279 @@
+import os
+import re
+import json
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from app.core.config import settings
+from app.services import janitor_service
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed store for uploads. Blobs are named "<sha256><ext>" so that
+# identical bytes are only stored once, and derived artifacts (extracted text,
+# page geometry, ...) are stored next to them as "<sha256>.<name>.json".
+#
+# Reference counts are kept in memory, so a blob is only protected while this
+# process is using it. Unreferenced blobs are handed to the janitor, which
+# removes them STORE_RETENTION_SECONDS after their last use so that follow-up
+# operations on the same file can reuse them and their artifacts.
+STORE_DIR = os.path.join(settings.DATA_DIR, "store")
+os.makedirs(STORE_DIR, exist_ok=True)
+janitor_service.reserve(STORE_DIR)
+
+_lock = threading.Lock()
+_refs: Dict[str, int] = {}
+
+# Digests of files outside the store, keyed by (path, size, mtime)
+_digest_cache: Dict[Tuple[str, int, int], str] = {}
+_DIGEST_CACHE_SIZE = 1024
+
+# A full SHA-256 hex digest, as blobs are named
+_DIGEST_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+def blob_path(digest: str, extension: str = ".pdf") -> str:
+    """Get the path of the blob for a digest and extension."""
+    return os.path.join(STORE_DIR, f"{digest}{extension.lower()}")
+
+def is_stored(path: str) -> bool:
+    """Check whether a path points into the store."""
+    return os.path.dirname(os.path.abspath(path)) == os.path.abspath(STORE_DIR)
+
+def digest_for_path(path: str) -> Optional[str]:
+    """Get the content digest of a stored blob from its path.
+
+    Args:
+        path: Path to a file
+
+    Returns:
+        The SHA-256 hex digest, or None if the path is not in the store
+    """
+    if not is_stored(path):
+        return None
+    return os.path.basename(path).split(".", 1)[0]
+
+def file_digest(path: str) -> str:
+    """Get the SHA-256 digest of a file's content.
+
+    Stored blobs are named after their digest; other files are hashed once per
+    (size, mtime) and remembered. This reads the whole file on a cache miss,
+    so call it from the threadpool.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        The SHA-256 hex digest
+    """
+    digest = digest_for_path(path)
+    if digest is not None:
+        return digest
+
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        digest = _digest_cache.get(key)
+    if digest is not None:
+        return digest
+
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(block)
+    digest = sha256.hexdigest()
+
+    with _lock:
+        if len(_digest_cache) >= _DIGEST_CACHE_SIZE:
+            _digest_cache.pop(next(iter(_digest_cache)))
+        _digest_cache[key] = digest
+    return digest
+
+def find_blob(digest: str, extensions: Iterable[str] = (".pdf",)) -> Optional[str]:
+    """Find a stored blob by digest.
+
+    Args:
+        digest: SHA-256 hex digest of the content, in full
+        extensions: Extensions the blob may have, tried in order
+
+    Returns:
+        Path to the blob, or None if it is not stored
+    """
+    if not _DIGEST_PATTERN.fullmatch(digest):
+        return None
+
+    for extension in extensions:
+        path = blob_path(digest, extension)
+        if os.path.isfile(path):
+            return path
+    return None
+
+def add_file(file_path: str, digest: str, extension: str) -> str:
+    """Move a file into the store and take a reference to it.
+
+    If a blob with the same content already exists, the file is discarded and
+    the existing blob is reused.
+
+    Args:
+        file_path: Path to the file to add (it is moved or removed)
+        digest: SHA-256 hex digest of the file content
+        extension: File extension to keep on the blob (e.g. ".pdf")
+
+    Returns:
+        Path to the stored blob
+    """
+    path = blob_path(digest, extension)
+
+    with _lock:
+        if os.path.exists(path):
+            os.remove(file_path)
+            logger.info(f"Reusing stored file {os.path.basename(path)}")
+        else:
+            os.replace(file_path, path)
+
+        _refs[path] = _refs.get(path, 0) + 1
+        # Refresh the mtime, which rebuild() uses as the last-use time
+        os.utime(path)
+        janitor_service.cancel(path)
+
+    return path
+
+def acquire(path: str) -> str:
+    """Take an additional reference to a stored blob.
+
+    Args:
+        path: Path to the blob
+
+    Returns:
+        The same path
+    """
+    with _lock:
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+
+        _refs[path] = _refs.get(path, 0) + 1
+        os.utime(path)
+        janitor_service.cancel(path)
+
+    return path
+
+def release(path: str):
+    """Drop a reference to a stored blob.
+
+    Args:
+        path: Path to the blob
+    """
+    with _lock:
+        count = _refs.get(path, 0) - 1
+        if count > 0:
+            _refs[path] = count
+            return
+        _refs.pop(path, None)
+        janitor_service.register(path, settings.STORE_RETENTION_SECONDS, callback=_expire_blob)
+
+def ref_count(path: str) -> int:
+    """Get the number of live references to a stored blob."""
+    with _lock:
+        return _refs.get(path, 0)
+
+def load_artifact(digest: str, name: str) -> Optional[Any]:
+    """Load a derived artifact attached to a content digest.
+
+    Args:
+        digest: SHA-256 hex digest of the source content
+        name: Artifact name (e.g. "text", "info")
+
+    Returns:
+        The artifact value, or None if it has not been computed
+    """
+    path = os.path.join(STORE_DIR, f"{digest}.{name}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.error(f"Error loading artifact {name} for {digest}: {e}")
+        return None
+
+def save_artifact(digest: str, name: str, value: Any):
+    """Attach a derived artifact to a content digest.
+
+    Args:
+        digest: SHA-256 hex digest of the source content
+        name: Artifact name (e.g. "text", "info")
+        value: JSON-serializable value
+    """
+    path = os.path.join(STORE_DIR, f"{digest}.{name}.json")
+    temp_path = f"{path}.{uuid.uuid4()}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(value, file)
+        os.replace(temp_path, path)
+    except Exception as e:
+        logger.error(f"Error saving artifact {name} for {digest}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+async def get_artifact(path: str, name: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """Get a derived artifact for a file, computing and attaching it if needed.
+
+    Files outside the store have no digest, so the artifact is computed every time.
+
+    Args:
+        path: Path to the source file
+        name: Artifact name (e.g. "text", "info")
+        compute: Coroutine function that computes the artifact
+
+    Returns:
+        The artifact value
+    """
+    digest = digest_for_path(path)
+    if digest is not None:
+        value = load_artifact(digest, name)
+        if value is not None:
+            return value
+
+    value = await compute()
+
+    if digest is not None:
+        save_artifact(digest, name, value)
+    return value
+
+def rebuild():
+    """Schedule every unreferenced blob for expiry based on its last use.
+
+    Called on startup, so blobs left by a previous process still expire.
+    """
+    for name in os.listdir(STORE_DIR):
+        path = os.path.join(STORE_DIR, name)
+        try:
+            deadline = os.path.getmtime(path) + settings.STORE_RETENTION_SECONDS
+        except FileNotFoundError:
+            continue
+
+        if name.endswith(".tmp"):
+            # Leftover from an interrupted artifact write
+            janitor_service.register_deadline(path, deadline)
+        elif not name.endswith(".json") and ref_count(path) == 0:
+            janitor_service.register_deadline(path, deadline, callback=_expire_blob)
+
+def _expire_blob(path: str):
+    """Remove an expired blob unless it was referenced again, with its orphaned artifacts."""
+    with _lock:
+        if _refs.get(path, 0) > 0 or not os.path.exists(path):
+            return
+        os.remove(path)
+
+        # Artifacts belong to the content, which may still be stored under another extension
+        digest = digest_for_path(path)
+        names = os.listdir(STORE_DIR)
+        if any(name.startswith(digest) and not name.endswith(".json") for name in names):
+            return
+        for name in names:
+            if name.startswith(f"{digest}.") and name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(STORE_DIR, name))
+                except FileNotFoundError:
+                    pass
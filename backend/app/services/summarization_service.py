@@ -0,0 +1,207 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from app.core.config import settings
+from app.services import budget_service, gemini_client, gemini_service, token_service
+from app.services.budget_service import PROMPT_OVERHEAD_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Map-reduce summarization for documents that do not fit in one prompt. The
+# pages are packed into sections sized to the model's input token limit, the
+# sections are summarized concurrently (at most SUMMARY_CONCURRENCY calls at a
+# time), and the partial summaries are combined, in several rounds if they do
+# not fit in one prompt either; summaries too long to combine with any other
+# are summarized again, briefly. A failed call cancels the others. The length
+# option only applies to the final combination, which is the only call
+# streamed by stream_summarize_sections.
+
+def group_texts(texts: List[str], max_chars: int, separator: str = "\n\n") -> List[List[str]]:
+    """Group consecutive texts so each group, once joined, has at most max_chars characters.
+
+    Texts longer than max_chars are split into pieces of their own.
+
+    Args:
+        texts: Texts in document order
+        max_chars: Maximum characters per joined group
+        separator: Separator placed between the texts of a group
+
+    Returns:
+        The groups, in document order
+    """
+    groups = []
+    current: List[str] = []
+    current_chars = 0
+    for text in texts:
+        while len(text) > max_chars:
+            if current:
+                groups.append(current)
+                current, current_chars = [], 0
+            groups.append([text[:max_chars]])
+            text = text[max_chars:]
+        added = len(text) + (len(separator) if current else 0)
+        if current and current_chars + added > max_chars:
+            groups.append(current)
+            current, current_chars, added = [], 0, len(text)
+        current.append(text)
+        current_chars += added
+    if current:
+        groups.append(current)
+    return groups
+
+def pack_texts(texts: List[str], max_chars: int, separator: str = "\n\n") -> List[str]:
+    """Join consecutive texts into sections of at most max_chars characters."""
+    return [separator.join(group) for group in group_texts(texts, max_chars, separator)]
+
+async def plan_sections(api_key: str, model_name: str, pages: List[str]) -> Tuple[List[str], int, budget_service.Budget]:
+    """Pack the pages of a document into sections that each fit in one summarization prompt.
+
+    Section sizes are converted from tokens to characters with the document's own
+    estimated characters per token, so scripts that take more tokens per
+    character get smaller sections.
+
+    Args:
+        api_key: The Gemini API key provided by the user
+        model_name: The name of the Gemini model to use
+        pages: The text of each page
+
+    Returns:
+        The sections, the maximum characters per prompt, and FIT if there is
+        only one section or CHUNK otherwise
+    """
+    limit = await budget_service.input_token_limit(api_key, model_name)
+    tokens = max(1, min(limit, settings.SUMMARY_MAX_SECTION_TOKENS) - PROMPT_OVERHEAD_TOKENS)
+
+    text_chars = sum(len(page) for page in pages)
+    text_tokens = sum(token_service.estimate_tokens(page) for page in pages)
+    max_chars = max(1, tokens * text_chars // text_tokens) if text_tokens else 1
+
+    sections = pack_texts(pages, max_chars)
+    strategy = budget_service.CHUNK if len(sections) > 1 else budget_service.FIT
+    return sections, max_chars, budget_service.Budget(strategy, limit, text_tokens)
+
+async def _run_all(calls: List[Awaitable[Optional[str]]]) -> Optional[List[str]]:
+    """Run Gemini calls concurrently, cancelling the others as soon as one fails.
+
+    Returns:
+        The results in call order, or None if a call returned None
+
+    Raises:
+        Exception: The error of the first call to raise one
+    """
+    tasks = [asyncio.ensure_future(call) for call in calls]
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.result() is None:
+                    return None
+        return [task.result() for task in tasks]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def _reduce_sections(api_key: str, model_name: str, sections: List[str], max_chars: int,
+                           semaphore: asyncio.Semaphore) -> Optional[List[str]]:
+    """Summarize sections and combine the summaries until they fit in one prompt.
+
+    Returns:
+        The summaries to combine into the final summary, or None if a Gemini call failed
+    """
+    async def call(function: Callable[..., Awaitable[Optional[Any]]], *args) -> Optional[Any]:
+        async with semaphore:
+            return await function(api_key, model_name, *args)
+
+    # Map: summarize every section
+    logger.info(f"Summarizing {len(sections)} sections with {settings.SUMMARY_CONCURRENCY} concurrent calls")
+    summaries = await _run_all([
+        call(gemini_service.summarize_section, section, part, len(sections))
+        for part, section in enumerate(sections, start=1)
+    ])
+    if summaries is None:
+        return None
+
+    # Reduce: combine groups of summaries until they fit in one prompt
+    shortened = False
+    while summaries is not None and len(summaries) > 1 and len("\n\n".join(summaries)) > max_chars:
+        groups = group_texts(summaries, max_chars)
+        if len(groups) < len(summaries):
+            summaries = await _run_all([call(gemini_service.combine_summaries, group, None) for group in groups])
+            continue
+
+        # Each summary fills a prompt on its own
+        share = max_chars // len(summaries)
+        if shortened:
+            logger.warning(f"Cutting {len(summaries)} section summaries to {share} characters each to fit in one prompt")
+            return [summary[:share] for summary in summaries]
+        long_indexes = [index for index, summary in enumerate(summaries) if len(summary) > share]
+        logger.info(f"Summarizing {len(long_indexes)} of {len(summaries)} section summaries again, more briefly")
+        shorter = await _run_all([
+            call(gemini_service.combine_summaries, [summaries[index]], "short") for index in long_indexes
+        ])
+        if shorter is None:
+            return None
+        for index, summary in zip(long_indexes, shorter):
+            summaries[index] = summary
+        shortened = True
+    return summaries
+
+async def summarize_sections(api_key: str, model_name: str, sections: List[str], max_chars: int,
+                             length: str = "medium") -> Optional[str]:
+    """Summarize a document packed into sections by plan_sections.
+
+    Args:
+        api_key: The Gemini API key provided by the user
+        model_name: The name of the Gemini model to use
+        sections: The sections of the document
+        max_chars: Maximum characters per prompt, from plan_sections
+        length: The desired summary length (short, medium, long)
+
+    Returns:
+        The summary or None if a Gemini call failed
+    """
+    # Documents that fit in one prompt are summarized directly
+    if len(sections) <= 1:
+        text = sections[0] if sections else ""
+        return await gemini_service.summarize_pdf(api_key, model_name, text, length)
+
+    semaphore = asyncio.Semaphore(max(1, settings.SUMMARY_CONCURRENCY))
+    summaries = await _reduce_sections(api_key, model_name, sections, max_chars, semaphore)
+    if summaries is None:
+        return None
+
+    # The length option applies to the final summary
+    async with semaphore:
+        return await gemini_service.combine_summaries(api_key, model_name, summaries, length)
+
+async def stream_summarize_sections(api_key: str, model_name: str, sections: List[str], max_chars: int,
+                                    length: str = "medium") -> AsyncIterator[gemini_client.GenerationResult]:
+    """Summarize a document packed into sections by plan_sections, streaming the final summary.
+
+    Args:
+        api_key: The Gemini API key provided by the user
+        model_name: The name of the Gemini model to use
+        sections: The sections of the document
+        max_chars: Maximum characters per prompt, from plan_sections
+        length: The desired summary length (short, medium, long)
+
+    Yields:
+        Pieces of the summary; the usage reported is that of the final call
+
+    Raises:
+        GeminiAPIError: If a Gemini call failed
+    """
+    if len(sections) <= 1:
+        text = sections[0] if sections else ""
+        chunks = gemini_service.stream_summarize_pdf(api_key, model_name, text, length)
+    else:
+        semaphore = asyncio.Semaphore(max(1, settings.SUMMARY_CONCURRENCY))
+        summaries = await _reduce_sections(api_key, model_name, sections, max_chars, semaphore)
+        if summaries is None:
+            raise gemini_client.GeminiAPIError("Failed to summarize the sections of the document")
+        chunks = gemini_service.stream_combine_summaries(api_key, model_name, summaries, length)
+
+    async for chunk in chunks:
+        yield chunk
@@ -0,0 +1,171 @@
+import os
+import json
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services import coalescing_service, extraction_service, janitor_service, storage_service
+from app.services.pdf_service import TEXT_EXTRACTOR_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Disk cache of the text extracted from each page of a PDF, keyed by content
+# digest and extractor version, so a document is parsed once no matter how many
+# requests ask about it, and entries survive restarts and upload expiry. The
+# cache is bounded by TEXT_CACHE_MAX_BYTES; the least recently used entries are
+# evicted first. Recency is kept in the file mtimes so it survives restarts.
+CACHE_DIR = os.path.join(settings.DATA_DIR, "text_cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+janitor_service.reserve(CACHE_DIR)
+
+_lock = threading.Lock()
+# Entry file name -> size in bytes, least recently used first
+_entries: "OrderedDict[str, int]" = OrderedDict()
+_total_bytes = 0
+_loaded = False
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+def _entry_name(digest: str, version: str = TEXT_EXTRACTOR_VERSION) -> str:
+    """Get the cache file name for a digest and extractor version."""
+    return f"{digest}-{version}.json"
+
+def rebuild():
+    """Index the entries on disk, oldest use first. Called on startup."""
+    global _total_bytes, _loaded
+    with _lock:
+        found = []
+        for name in os.listdir(CACHE_DIR):
+            path = os.path.join(CACHE_DIR, name)
+            if name.endswith(".tmp"):
+                # Leftover from an interrupted write
+                os.remove(path)
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, name, stat.st_size))
+
+        _entries.clear()
+        for _, name, size in sorted(found):
+            _entries[name] = size
+        _total_bytes = sum(_entries.values())
+        _loaded = True
+
+        _evict()
+
+def load_pages(digest: str) -> Optional[List[str]]:
+    """Load the cached page texts for a content digest.
+
+    Args:
+        digest: SHA-256 hex digest of the PDF
+
+    Returns:
+        The text of each page, or None if not cached
+    """
+    if not _loaded:
+        rebuild()
+
+    name = _entry_name(digest)
+    path = os.path.join(CACHE_DIR, name)
+    with _lock:
+        if name not in _entries:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(name)
+        _stats["hits"] += 1
+
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            pages = json.load(file)["pages"]
+        os.utime(path)
+        return pages
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Discarding unreadable text cache entry {name}: {e}")
+        _discard(name)
+        return None
+
+def save_pages(digest: str, pages: List[str]):
+    """Store the page texts for a content digest, evicting old entries if needed.
+
+    Args:
+        digest: SHA-256 hex digest of the PDF
+        pages: The text of each page
+    """
+    global _total_bytes
+    if not _loaded:
+        rebuild()
+
+    name = _entry_name(digest)
+    path = os.path.join(CACHE_DIR, name)
+    data = json.dumps({"version": TEXT_EXTRACTOR_VERSION, "pages": pages}).encode("utf-8")
+    if len(data) > settings.TEXT_CACHE_MAX_BYTES:
+        # Would evict everything else and still not fit
+        return
+
+    # Write atomically so readers never see a partial entry
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+    with _lock:
+        _total_bytes += len(data) - _entries.pop(name, 0)
+        _entries[name] = len(data)
+        _evict()
+
+async def get_pages(pdf_path: str) -> List[str]:
+    """Get the text of each page of a PDF, extracting it only on a cache miss.
+
+    Args:
+        pdf_path: Path to the PDF file
+
+    Returns:
+        The text of each page
+    """
+    digest = await run_in_threadpool(storage_service.file_digest, pdf_path)
+    pages = await run_in_threadpool(load_pages, digest)
+    if pages is not None:
+        return pages
+
+    async def extract() -> List[str]:
+        pages = await extraction_service.extract_pages(pdf_path)
+        await run_in_threadpool(save_pages, digest, pages)
+        return pages
+
+    # Concurrent requests for the same document share one extraction
+    return await coalescing_service.run("extract_text", digest, extract)
+
+async def get_text(pdf_path: str) -> str:
+    """Get the full text of a PDF, in the format of pdf_service.extract_text_from_pdf."""
+    return extraction_service.join_pages(await get_pages(pdf_path))
+
+def stats() -> Dict[str, Any]:
+    """Get cache size and hit counters."""
+    with _lock:
+        return {"entries": len(_entries), "bytes": _total_bytes, **_stats}
+
+def _evict():
+    """Remove least recently used entries until the cache fits. Must hold _lock."""
+    global _total_bytes
+    while _total_bytes > settings.TEXT_CACHE_MAX_BYTES and _entries:
+        name, size = _entries.popitem(last=False)
+        _total_bytes -= size
+        _stats["evictions"] += 1
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            pass
+
+def _discard(name: str):
+    """Drop a single entry."""
+    global _total_bytes
+    with _lock:
+        _total_bytes -= _entries.pop(name, 0)
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            pass
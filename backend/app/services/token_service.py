@@ -0,0 +1,84 @@
+import re
+import math
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+# Local token estimation and per-request token accounting. Estimates are made
+# without calling the API: CHARS_PER_TOKEN characters per token, except for
+# scripts written without spaces (Chinese, Japanese, Korean), which take about
+# a token per character. Every Gemini call made inside track_usage() adds its
+# estimated and reported token counts to the totals of the current request.
+
+# Rough number of characters per token
+CHARS_PER_TOKEN = 4
+
+# Characters that take about one token each
+_WIDE_CHARACTERS = re.compile(r"[\u1100-\u11ff\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar("gemini_usage", default=None)
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text.
+
+    Args:
+        text: The text
+
+    Returns:
+        The estimated token count
+    """
+    wide = len(_WIDE_CHARACTERS.findall(text))
+    return wide + math.ceil((len(text) - wide) / CHARS_PER_TOKEN)
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text to at most about max_tokens estimated tokens.
+
+    Args:
+        text: The text
+        max_tokens: Maximum estimated tokens
+
+    Returns:
+        The start of the text that fits
+    """
+    if max_tokens <= 0:
+        return ""
+    estimate = estimate_tokens(text)
+    while estimate > max_tokens:
+        # Shrink in proportion to the overshoot until the estimate fits
+        text = text[:len(text) * max_tokens // estimate]
+        estimate = estimate_tokens(text)
+    return text
+
+@contextmanager
+def track_usage() -> Iterator[Dict[str, int]]:
+    """Collect the token usage of the Gemini calls made inside the block.
+
+    Calls made by tasks started inside the block are counted too.
+
+    Yields:
+        The running totals: calls, estimated_prompt_tokens, prompt_tokens,
+        output_tokens and total_tokens
+    """
+    totals = {"calls": 0, "estimated_prompt_tokens": 0, "prompt_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    token = _usage.set(totals)
+    try:
+        yield totals
+    finally:
+        _usage.reset(token)
+
+def record_usage(usage: Dict[str, int]):
+    """Add the token usage of one Gemini call to the totals being tracked, if any."""
+    totals = _usage.get()
+    if totals is None:
+        return
+    totals["calls"] += 1
+    for name, count in usage.items():
+        totals[name] = totals.get(name, 0) + count
+
+def add_usage(totals: Dict[str, int]):
+    """Add totals collected by a nested track_usage() to the totals being tracked, if any."""
+    current = _usage.get()
+    if current is None:
+        return
+    for name, count in totals.items():
+        current[name] = current.get(name, 0) + count
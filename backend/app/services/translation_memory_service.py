@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+from app.core.config import settings
+from app.services import janitor_service
+
+logger = logging.getLogger(__name__)
+
+# Segment-level translation memory. A segment is a paragraph of a page, or a
+# sentence of a paragraph too long for one chunk (see translation_service); its
+# translation is stored in a local SQLite database under the hash of the model,
+# the target language and the segment text with whitespace normalized, so
+# headers, footers and disclaimers repeated across documents are translated
+# once. Entries unused for TRANSLATION_MEMORY_TTL_SECONDS are purged on startup.
+janitor_service.reserve(settings.TRANSLATION_MEMORY_DB_PATH)
+for suffix in ("-wal", "-shm", "-journal"):
+    janitor_service.reserve(settings.TRANSLATION_MEMORY_DB_PATH + suffix)
+
+# Maximum parameters per query, below SQLite's default limit
+_QUERY_BATCH_SIZE = 500
+
+_lock = threading.Lock()
+# Segments repeated within a document, found in the database, and translated
+_stats = {"document_hits": 0, "memory_hits": 0, "misses": 0}
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """Open an autocommit connection to the translation memory database."""
+    connection = sqlite3.connect(settings.TRANSLATION_MEMORY_DB_PATH, timeout=30, isolation_level=None)
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+def init_db():
+    """Create the segment table if needed and purge unused entries. Called on startup."""
+    with _connect() as connection:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS segments (
+                key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        connection.execute("CREATE INDEX IF NOT EXISTS segments_used ON segments (used_at)")
+        purged = connection.execute(
+            "DELETE FROM segments WHERE used_at < ?", (time.time() - settings.TRANSLATION_MEMORY_TTL_SECONDS,)
+        ).rowcount
+    if purged:
+        logger.info(f"Purged {purged} unused translation memory segments")
+
+def normalize(text: str) -> str:
+    """Collapse the whitespace of a segment, so layout differences do not prevent matches."""
+    return " ".join(text.split())
+
+def segment_key(model_name: str, target_language: str, text: str) -> str:
+    """Build the key of a segment translation.
+
+    Args:
+        model_name: The name of the Gemini model
+        target_language: The target language for translation
+        text: The source text of the segment
+
+    Returns:
+        A hex digest identifying the translation
+    """
+    material = json.dumps([model_name, target_language.strip().lower(), normalize(text)], separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def lookup(keys: List[str]) -> Dict[str, str]:
+    """Get the stored translations of segments.
+
+    Args:
+        keys: Segment keys
+
+    Returns:
+        The translation of every key found
+    """
+    found: Dict[str, str] = {}
+    now = time.time()
+    with _connect() as connection:
+        for start in range(0, len(keys), _QUERY_BATCH_SIZE):
+            batch = keys[start:start + _QUERY_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = connection.execute(
+                f"SELECT key, translation FROM segments WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            found.update(rows)
+            if rows:
+                connection.executemany(
+                    "UPDATE segments SET hits = hits + 1, used_at = ? WHERE key = ?", [(now, key) for key, _ in rows]
+                )
+    return found
+
+def store(translations: Dict[str, str]):
+    """Store segment translations.
+
+    Args:
+        translations: Translation of each segment key
+    """
+    now = time.time()
+    try:
+        with _connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO segments (key, translation, hits, created_at, used_at) VALUES (?, ?, 0, ?, ?)",
+                [(key, translation, now, now) for key, translation in translations.items()]
+            )
+    except sqlite3.Error as e:
+        # The memory only saves work, so a failed write must not fail the translation
+        logger.warning(f"Could not store translation memory segments: {e}")
+
+def record(document_hits: int, memory_hits: int, misses: int):
+    """Count the segments of a translated document by how they were resolved."""
+    with _lock:
+        _stats["document_hits"] += document_hits
+        _stats["memory_hits"] += memory_hits
+        _stats["misses"] += misses
+
+def stats() -> Dict[str, Any]:
+    """Get the memory size and hit rate."""
+    with _connect() as connection:
+        entries = connection.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+    with _lock:
+        counters = dict(_stats)
+    total = sum(counters.values())
+    hits = counters["document_hits"] + counters["memory_hits"]
+    return {"entries": entries, **counters, "hit_rate": round(hits / total, 4) if total else 0.0}
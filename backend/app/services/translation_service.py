@@ -0,0 +1,272 @@
+import re
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services import budget_service, gemini_client, gemini_service, token_service, translation_memory_service
+
+logger = logging.getLogger(__name__)
+
+# Chunked translation, so long documents are not cut off at the model's output
+# token limit. Every page is split into segments: its paragraphs, with wrapped
+# lines joined, and the sentences of paragraphs too long for one chunk. Segments
+# repeated within the document are translated once, and those already in the
+# translation memory not at all; the rest are packed into numbered chunks whose
+# translation fits in one response. The chunks are translated concurrently (at
+# most TRANSLATION_CONCURRENCY calls at a time) and the pages reassembled in
+# order. A failed chunk is retried on its own, with exponential backoff.
+
+# Delay before the first retry of a failed chunk, doubled on every retry
+RETRY_BASE_DELAY_SECONDS = 1.0
+
+@dataclass
+class TranslatedPage:
+    """The translation of one page and the token usage it took."""
+    page_number: int  # 1-indexed
+    text: str
+    usage: Dict[str, int] = field(default_factory=dict)
+
+# Blank lines separate paragraphs; sentences end with punctuation and a space
+_PARAGRAPH_BREAK_PATTERN = re.compile(r"\n\s*\n")
+_SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?。！？])\s+")
+
+def _join_lines(paragraph: str) -> str:
+    """Join the wrapped lines of a paragraph, rejoining words hyphenated at a line end."""
+    text = ""
+    for line in paragraph.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if text.endswith("-") and line[0].islower():
+            text = text[:-1] + line
+        else:
+            text = f"{text} {line}" if text else line
+    return text
+
+def _cut(text: str, max_tokens: int) -> List[str]:
+    """Cut text into pieces of at most max_tokens estimated tokens, at whitespace where possible."""
+    pieces = []
+    while token_service.estimate_tokens(text) > max_tokens:
+        fitting = len(token_service.trim_to_tokens(text, max_tokens))
+        cut = text.rfind(" ", 0, fitting + 1)
+        if cut <= 0:
+            cut = max(1, fitting)
+        pieces.append(text[:cut].strip())
+        text = text[cut:].strip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+def split_page(text: str, max_tokens: int) -> List[List[str]]:
+    """Split the text of a page into paragraphs, and those into segments of at most max_tokens estimated tokens.
+
+    A paragraph that fits is one segment; a longer one is split into its
+    sentences, and sentences still too long are cut at whitespace.
+
+    Returns:
+        The segments of each non-empty paragraph
+    """
+    paragraphs = []
+    for paragraph in _PARAGRAPH_BREAK_PATTERN.split(text):
+        paragraph = _join_lines(paragraph)
+        if not paragraph:
+            continue
+        if token_service.estimate_tokens(paragraph) <= max_tokens:
+            paragraphs.append([paragraph])
+            continue
+        segments = []
+        for sentence in _SENTENCE_END_PATTERN.split(paragraph):
+            segments.extend(_cut(sentence, max_tokens))
+        paragraphs.append(segments)
+    return paragraphs
+
+def join_page(paragraphs: List[List[str]]) -> str:
+    """Rebuild the text of a page from the (translated) segments of its paragraphs."""
+    return "\n\n".join(" ".join(segments) for segments in paragraphs)
+
+def add_usage(total: Dict[str, int], usage: Dict[str, int]):
+    """Add the token counts of a call to a running total."""
+    for name, count in usage.items():
+        total[name] = total.get(name, 0) + count
+
+async def chunk_tokens(api_key: str, model_name: str) -> int:
+    """Get the estimated source tokens per chunk whose translation fits in one response."""
+    limit = await gemini_service.get_output_token_limit(api_key, model_name)
+    tokens = min(limit or settings.TRANSLATION_MAX_CHUNK_TOKENS, settings.TRANSLATION_MAX_CHUNK_TOKENS)
+    # Translations can take more tokens than the original, so leave half the limit spare
+    return max(1, tokens // 2)
+
+async def plan_pages(api_key: str, model_name: str, pages: List[str]) -> budget_service.Budget:
+    """Describe how a document fits in translation prompts: always in chunks, sized by chunk_tokens."""
+    limit = await budget_service.input_token_limit(api_key, model_name)
+    text_tokens = sum(token_service.estimate_tokens(page) for page in pages)
+    return budget_service.Budget(budget_service.CHUNK, limit, text_tokens)
+
+async def _translate_chunk(api_key: str, model_name: str, segments: List[str], target_language: str,
+                           semaphore: asyncio.Semaphore) -> Tuple[List[str], Dict[str, int]]:
+    """Translate the segments of one chunk, retrying the chunk on failure.
+
+    If the response to a chunk of several segments cannot be split back into
+    segments, each segment is translated on its own instead.
+
+    Returns:
+        The translation of each segment and the token usage
+
+    Raises:
+        GeminiAPIError: If the chunk still fails after TRANSLATION_RETRIES retries
+    """
+    for attempt in range(settings.TRANSLATION_RETRIES + 1):
+        if attempt:
+            delay = RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1)
+            logger.warning(f"Retrying translation of a chunk of {len(segments)} segments in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        async with semaphore:
+            result = await gemini_service.translate_segments(api_key, model_name, segments, target_language)
+        if result is None:
+            continue
+
+        translations = gemini_service.parse_segments(result.text, len(segments))
+        if translations is not None:
+            return translations, result.usage
+        if len(segments) == 1:
+            # Nothing left to split: count it as a failed attempt
+            continue
+
+        logger.warning(f"Could not split the translation of {len(segments)} segments, translating them one by one")
+        usage = dict(result.usage)
+        translations = []
+        for segment_translations, segment_usage in await asyncio.gather(*[
+            _translate_chunk(api_key, model_name, [segment], target_language, semaphore) for segment in segments
+        ]):
+            translations.extend(segment_translations)
+            add_usage(usage, segment_usage)
+        return translations, usage
+    raise gemini_client.GeminiAPIError(f"Failed to translate a chunk of {len(segments)} segments")
+
+def pack_segments(segments: List[str], max_tokens: int) -> List[List[int]]:
+    """Group consecutive segments into chunks of at most max_tokens estimated tokens.
+
+    Args:
+        segments: Segments of at most max_tokens estimated tokens each
+        max_tokens: Maximum estimated tokens per chunk
+
+    Returns:
+        The indexes of the segments of each chunk
+    """
+    chunks: List[List[int]] = []
+    size = 0
+    for index, segment in enumerate(segments):
+        tokens = token_service.estimate_tokens(segment)
+        if not chunks or size + tokens > max_tokens:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(index)
+        size += tokens
+    return chunks
+
+async def iter_translated_pages(api_key: str, model_name: str, pages: List[str],
+                                target_language: str) -> AsyncIterator[TranslatedPage]:
+    """Translate a document page by page.
+
+    Every chunk is scheduled at once and translated as the concurrency limit allows;
+    pages are yielded in order as soon as all their segments are translated. Closing
+    the iterator early cancels the remaining chunks.
+
+    Args:
+        api_key: The Gemini API key provided by the user
+        model_name: The name of the Gemini model to use
+        pages: The text of each page
+        target_language: The target language for translation
+
+    Yields:
+        The translated pages, in page order; the usage of a chunk is counted on the
+        first page that needs it
+
+    Raises:
+        GeminiAPIError: If a chunk failed after all its retries
+    """
+    max_tokens = await chunk_tokens(api_key, model_name)
+    semaphore = asyncio.Semaphore(max(1, settings.TRANSLATION_CONCURRENCY))
+
+    # Segment keys of each paragraph of each page, and the source text of each
+    # distinct key in order of appearance
+    page_keys: List[List[List[str]]] = []
+    sources: Dict[str, str] = {}
+    for text in pages:
+        paragraphs = []
+        for segments in split_page(text, max_tokens):
+            keys = []
+            for segment in segments:
+                key = translation_memory_service.segment_key(model_name, target_language, segment)
+                sources.setdefault(key, segment)
+                keys.append(key)
+            paragraphs.append(keys)
+        page_keys.append(paragraphs)
+
+    translations: Dict[str, str] = {}
+    if settings.TRANSLATION_MEMORY_SHARED and sources:
+        translations = await run_in_threadpool(translation_memory_service.lookup, list(sources))
+    missing = [key for key in sources if key not in translations]
+    translation_memory_service.record(
+        document_hits=sum(len(keys) for paragraphs in page_keys for keys in paragraphs) - len(sources),
+        memory_hits=len(translations),
+        misses=len(missing)
+    )
+
+    async def translate_chunk(keys: List[str]) -> Dict[str, int]:
+        chunk_translations, usage = await _translate_chunk(
+            api_key, model_name, [sources[key] for key in keys], target_language, semaphore
+        )
+        translated = dict(zip(keys, chunk_translations))
+        translations.update(translated)
+        if settings.TRANSLATION_MEMORY_SHARED:
+            await run_in_threadpool(translation_memory_service.store, translated)
+        return usage
+
+    tasks: List["asyncio.Task[Dict[str, int]]"] = []
+    task_of_key: Dict[str, "asyncio.Task[Dict[str, int]]"] = {}
+    for indexes in pack_segments([sources[key] for key in missing], max_tokens):
+        keys = [missing[index] for index in indexes]
+        task = asyncio.create_task(translate_chunk(keys))
+        tasks.append(task)
+        task_of_key.update((key, task) for key in keys)
+    logger.info(f"Translating {len(missing)} of {len(sources)} distinct segments of {len(pages)} pages "
+                f"in {len(tasks)} chunks with {settings.TRANSLATION_CONCURRENCY} concurrent calls")
+
+    try:
+        counted = set()
+        for page_number, paragraphs in enumerate(page_keys, start=1):
+            keys = [key for paragraph in paragraphs for key in paragraph]
+            page_tasks = list(dict.fromkeys(task_of_key[key] for key in keys if key in task_of_key))
+            usage: Dict[str, int] = {}
+            for task, task_usage in zip(page_tasks, await asyncio.gather(*page_tasks)):
+                if task not in counted:
+                    counted.add(task)
+                    add_usage(usage, task_usage)
+            text = join_page([[translations[key] for key in paragraph] for paragraph in paragraphs])
+            yield TranslatedPage(page_number, text, usage)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Wait for the cancellations and collect the errors of failed chunks
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def translate_pages(api_key: str, model_name: str, pages: List[str], target_language: str) -> Optional[List[str]]:
+    """Translate a document of any length.
+
+    Args:
+        api_key: The Gemini API key provided by the user
+        model_name: The name of the Gemini model to use
+        pages: The text of each page
+        target_language: The target language for translation
+
+    Returns:
+        The translation of each page, or None if a chunk could not be translated
+    """
+    try:
+        return [page.text async for page in iter_translated_pages(api_key, model_name, pages, target_language)]
+    except gemini_client.GeminiAPIError as e:
+        logger.error(f"Error translating PDF: {e}")
+        return None
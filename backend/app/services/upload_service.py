@@ -0,0 +1,205 @@
+import os
+import uuid
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services import storage_service
+
+logger = logging.getLogger(__name__)
+
+# Leading byte signatures used to sniff the type of an upload
+FILE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"PK\x03\x04", "zip"),  # docx, xlsx, pptx
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "ole"),  # doc, xls, ppt
+    (b"{\\rtf", "rtf"),
+]
+
+PDF_FILE_TYPES = {"pdf"}
+IMAGE_FILE_TYPES = {"png", "jpeg", "gif", "bmp", "tiff"}
+
+# File types accepted for each extension handled by convert-to-pdf
+EXTENSION_FILE_TYPES = {
+    ".pdf": PDF_FILE_TYPES,
+    ".jpg": {"jpeg"},
+    ".jpeg": {"jpeg"},
+    ".png": {"png"},
+    ".gif": {"gif"},
+    ".bmp": {"bmp"},
+    ".tiff": {"tiff"},
+    ".tif": {"tiff"},
+    ".doc": {"ole"},
+    ".docx": {"zip"},
+    ".xls": {"ole"},
+    ".xlsx": {"zip"},
+    ".ppt": {"ole"},
+    ".pptx": {"zip"},
+    ".txt": {"text"},
+    ".html": {"text"},
+    ".md": {"text"},
+    ".rtf": {"rtf", "text"},
+}
+
+@dataclass
+class UploadedFile:
+    """An upload that has been written to the content-addressed store."""
+    path: str
+    size: int
+    sha256: str
+    file_type: str
+
+def sniff_file_type(head: bytes) -> str:
+    """Detect the type of a file from its first bytes.
+
+    Args:
+        head: The first bytes of the file
+
+    Returns:
+        A short type name (pdf, png, jpeg, ..., text) or "unknown"
+    """
+    # PDF readers accept the header anywhere in the first 1024 bytes
+    if b"%PDF-" in head[:1024]:
+        return "pdf"
+
+    for signature, file_type in FILE_SIGNATURES:
+        if head.startswith(signature):
+            return file_type
+
+    # Plain text (txt, html, md) has no signature; treat anything without NUL bytes as text
+    if b"\x00" not in head:
+        return "text"
+
+    return "unknown"
+
+def expected_file_types(filename: str) -> Optional[set]:
+    """Get the file types that are acceptable for a filename's extension.
+
+    Args:
+        filename: The client-supplied filename
+
+    Returns:
+        The set of acceptable file types, or None if the extension is unknown
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    return EXTENSION_FILE_TYPES.get(extension)
+
+async def stream_upload_file(upload_file: UploadFile, allowed_types: Optional[Iterable[str]] = None,
+                             max_size: Optional[int] = None) -> UploadedFile:
+    """Stream an uploaded file into the content-addressed store in chunks.
+
+    The file is written without blocking the event loop, hashed while it is
+    written, and rejected as soon as it exceeds the size limit or its first
+    bytes do not match one of the allowed types. If the same bytes are already
+    stored, the existing copy is reused. The caller owns a store reference and
+    must hand the path to cleanup_temp_files when done with it.
+
+    Args:
+        upload_file: The uploaded file
+        allowed_types: File types to accept (see sniff_file_type), or None to accept any
+        max_size: Maximum size in bytes (defaults to settings.MAX_FILE_SIZE)
+
+    Returns:
+        The saved file with its size, SHA-256 hash and detected type
+    """
+    max_size = max_size or settings.MAX_FILE_SIZE
+
+    # Reject early when the client announced the size up front
+    if getattr(upload_file, "size", None) and upload_file.size > max_size:
+        raise HTTPException(status_code=413, detail=f"File exceeds the maximum size of {max_size} bytes")
+
+    # Create a unique filename for the partial upload
+    file_id = str(uuid.uuid4())
+    file_extension = os.path.splitext(upload_file.filename or "")[1]
+    partial_path = os.path.join(settings.TEMP_FILE_DIR, f"{file_id}{file_extension}.part")
+
+    sha256 = hashlib.sha256()
+    size = 0
+    file_type = None
+
+    buffer = await run_in_threadpool(open, partial_path, "wb")
+    try:
+        while True:
+            chunk = await upload_file.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+
+            # Sniff the type from the first chunk before anything hits the disk
+            if file_type is None:
+                file_type = sniff_file_type(chunk)
+                if allowed_types is not None and file_type not in allowed_types:
+                    raise HTTPException(
+                        status_code=415,
+                        detail=f"Unsupported file content in {upload_file.filename}: detected {file_type}"
+                    )
+
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(status_code=413, detail=f"File exceeds the maximum size of {max_size} bytes")
+
+            sha256.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        _remove_quietly(partial_path)
+        raise
+
+    await run_in_threadpool(buffer.close)
+
+    if file_type is None:
+        _remove_quietly(partial_path)
+        raise HTTPException(status_code=400, detail=f"Uploaded file {upload_file.filename} is empty")
+
+    digest = sha256.hexdigest()
+    # Moving the file into the store touches the disk, so keep it off the event loop
+    stored_path = await run_in_threadpool(storage_service.add_file, partial_path, digest, file_extension)
+
+    return UploadedFile(path=stored_path, size=size, sha256=digest, file_type=file_type)
+
+async def save_upload_file(upload_file: UploadFile, allowed_types: Optional[Iterable[str]] = None) -> str:
+    """Save an uploaded file to a temporary location.
+
+    Args:
+        upload_file: The uploaded file
+        allowed_types: File types to accept (see sniff_file_type), or None to accept any
+
+    Returns:
+        Path to the saved file
+    """
+    uploaded = await stream_upload_file(upload_file, allowed_types)
+    return uploaded.path
+
+def cleanup_temp_files(file_paths: List[str]):
+    """Clean up temporary files.
+
+    Uploads in the content-addressed store are released rather than deleted,
+    so they stay available to other requests using the same content.
+
+    Args:
+        file_paths: List of file paths to clean up
+    """
+    for path in file_paths:
+        try:
+            if storage_service.is_stored(path):
+                storage_service.release(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            logger.error(f"Error cleaning up temporary file {path}: {e}")
+
+def _remove_quietly(path: str):
+    """Remove a file, logging instead of raising on failure."""
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except Exception as e:
+        logger.error(f"Error removing partial upload {path}: {e}")
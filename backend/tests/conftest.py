@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Keep the databases, store and caches of the tests out of app/data; this must
+# happen before app.core.config is first imported
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="pdf-tools-tests-"))
@@ -0,0 +1,46 @@
+import io
+import os
+import zipfile
+from app.services import archive_service
+
+def write(path, content: bytes):
+    with open(path, "wb") as file:
+        file.write(content)
+    return str(path)
+
+def test_streamed_archive_holds_every_file(tmp_path):
+    files = [
+        ("a.pdf", write(tmp_path / "a.pdf", b"%PDF-1.4 " * 1000)),
+        ("notes.txt", write(tmp_path / "notes.txt", b"text " * 1000)),
+        ("empty.txt", write(tmp_path / "empty.txt", b"")),
+    ]
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(archive_service.iter_zip(files))))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["a.pdf", "notes.txt", "empty.txt"]
+    assert archive.read("a.pdf") == b"%PDF-1.4 " * 1000
+    assert archive.read("empty.txt") == b""
+    # Already compressed formats are stored, others deflated
+    assert archive.getinfo("a.pdf").compress_type == zipfile.ZIP_STORED
+    assert archive.getinfo("notes.txt").compress_type == zipfile.ZIP_DEFLATED
+
+def test_archive_is_streamed_in_chunks(tmp_path):
+    path = write(tmp_path / "big.pdf", os.urandom(64 * 1024))
+    chunks = archive_service.iter_zip([("big.pdf", path)], chunk_size=4096)
+
+    # The local header and the first block come before the rest of the file is read
+    first = next(chunks)
+    assert first.startswith(b"PK\x03\x04")
+    assert len(first) < 8192
+    rest = list(chunks)
+    assert len(rest) >= 16
+    assert zipfile.ZipFile(io.BytesIO(first + b"".join(rest))).read("big.pdf") == open(path, "rb").read()
+
+def test_directory_archive_has_its_files_in_name_order(tmp_path):
+    write(tmp_path / "b.pdf", b"b")
+    write(tmp_path / "a.pdf", b"a")
+    (tmp_path / "nested").mkdir()
+    write(tmp_path / "nested" / "c.pdf", b"c")
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(archive_service.iter_zip_directory(str(tmp_path)))))
+    assert archive.namelist() == ["a.pdf", "b.pdf"]
@@ -0,0 +1,91 @@
+import os
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.models.pdf_models import PDFOperationType, PDFResponse
+from app.routers import batch_router
+from app.services import batch_service, janitor_service, operation_service
+
+PDF = b"%PDF-1.4\n1 0 obj << >> endobj\ntrailer << >>\n%%EOF\n"
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A client for the batch endpoint, with operations that copy their input or fail."""
+    monkeypatch.setattr(settings, "TEMP_FILE_DIR", str(tmp_path))
+
+    async def run_operation(operation, input_paths, params, watermark_image_path=None):
+        with open(input_paths[0], "rb") as file:
+            content = file.read()
+        if b"broken" in content:
+            raise ValueError("Could not read the PDF")
+        output_path = tmp_path / f"{len(os.listdir(tmp_path))}-out.pdf"
+        output_path.write_bytes(content)
+        return PDFResponse(success=True, message="PDF compressed successfully", file_path=str(output_path),
+                           download_url=f"/api/v1/pdf/download/{output_path.name}")
+
+    monkeypatch.setattr(operation_service, "run_operation", run_operation)
+    app = FastAPI()
+    app.include_router(batch_router.router, prefix="/api/v1/batch")
+    yield TestClient(app)
+    for name in os.listdir(tmp_path):
+        janitor_service.cancel(str(tmp_path / name))
+
+def post_batch(client, files, operation="compress"):
+    response = client.post("/api/v1/batch", data={"operation": operation, "params": "{}"},
+                           files=[("files", file) for file in files])
+    return response, [json.loads(line) for line in response.text.splitlines()]
+
+def test_results_are_streamed_one_line_per_file_then_a_summary(client):
+    response, lines = post_batch(client, [
+        ("a.pdf", PDF, "application/pdf"),
+        ("b.pdf", PDF + b"% broken", "application/pdf"),
+        ("notes.txt", b"text", "text/plain"),
+    ])
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = {line["filename"]: line for line in lines if line["type"] == "result"}
+    assert results["a.pdf"]["success"] and results["a.pdf"]["download_url"]
+    assert results["b.pdf"]["error"] == "Could not read the PDF"
+    assert results["notes.txt"]["error"] == "Unsupported file type: notes.txt"
+
+    summary = lines[-1]
+    assert summary["type"] == "summary" and summary["batch_id"] == response.headers["x-batch-id"]
+    assert (summary["total"], summary["succeeded"], summary["failed"]) == (3, 1, 2)
+    archive_dir = os.path.join(settings.TEMP_FILE_DIR, summary["batch_id"])
+    assert summary["archive_url"] == f"/api/v1/pdf/download-zip/{summary['batch_id']}"
+    assert os.listdir(archive_dir) == ["a.pdf"]
+
+def test_no_archive_when_every_file_fails(client):
+    _, lines = post_batch(client, [("a.pdf", PDF + b"% broken", "application/pdf")])
+    assert lines[-1]["succeeded"] == 0 and lines[-1]["archive_url"] is None
+
+def test_merge_cannot_be_batched(client):
+    response, _ = post_batch(client, [("a.pdf", PDF, "application/pdf")], operation="merge")
+    assert response.status_code == 400
+
+def test_archive_names_are_made_unique(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TEMP_FILE_DIR", str(tmp_path))
+    outputs = tmp_path / "outputs"
+    outputs.mkdir()
+    (outputs / "1.pdf").write_bytes(PDF)
+    (outputs / "2.pdf").write_bytes(PDF)
+    parts = outputs / "split"
+    parts.mkdir()
+    (parts / "part_1.pdf").write_bytes(PDF)
+    results = [
+        {"index": 2, "filename": "report.pdf", "success": True, "file_path": str(parts)},
+        {"index": 0, "filename": "report.pdf", "success": True, "file_path": str(outputs / "1.pdf")},
+        {"index": 1, "filename": "report.pdf", "success": True, "file_path": str(outputs / "2.pdf")},
+        {"index": 3, "filename": "failed.pdf", "success": False, "file_path": None},
+    ]
+
+    archive_dir = batch_service.build_archive("batch", results)
+    janitor_service.cancel(archive_dir)
+    assert sorted(os.listdir(archive_dir)) == ["report.pdf", "report_2.pdf", "report_part_1.pdf"]
+
+def test_validate_batch_checks_the_shared_parameters():
+    with pytest.raises(ValueError):
+        batch_service.validate_batch(PDFOperationType.ROTATE, {"rotation": 45})
@@ -0,0 +1,29 @@
+import asyncio
+from app.services import budget_service
+from app.services.budget_service import PROMPT_OVERHEAD_TOKENS
+from app.services.retrieval_service import Chunk
+
+def fit(monkeypatch, chunks, limit):
+    async def input_token_limit(api_key, model_name):
+        return limit
+
+    monkeypatch.setattr(budget_service, "input_token_limit", input_token_limit)
+    return asyncio.run(budget_service.fit_passages("key", "model", chunks, "question?"))
+
+def test_passages_that_fit_are_all_kept(monkeypatch):
+    chunks = [Chunk(1, "a" * 40, 1.0), Chunk(2, "b" * 40, 2.0)]
+    kept, budget = fit(monkeypatch, chunks, 10000)
+    assert kept == chunks
+    assert budget.strategy == budget_service.RETRIEVE
+
+def test_least_relevant_passages_are_dropped_first(monkeypatch):
+    chunks = [Chunk(1, "a" * 400, 5.0), Chunk(2, "b" * 400, 1.0), Chunk(3, "c" * 400, 9.0), Chunk(4, "d" * 400, 2.0)]
+    # Room for about two passages
+    kept, budget = fit(monkeypatch, chunks, PROMPT_OVERHEAD_TOKENS + 250)
+    assert [chunk.page_number for chunk in kept] == [1, 3]
+    assert budget.estimated_document_tokens <= 250 - 2
+
+def test_later_passages_are_dropped_first_between_equal_scores(monkeypatch):
+    chunks = [Chunk(page, "x" * 400, 0.0) for page in range(1, 5)]
+    kept, _ = fit(monkeypatch, chunks, PROMPT_OVERHEAD_TOKENS + 250)
+    assert [chunk.page_number for chunk in kept] == [1, 2]
@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from app.services import coalescing_service
+
+def test_concurrent_callers_share_one_run():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def scenario():
+        return await asyncio.gather(*[coalescing_service.run("test", "key", compute) for _ in range(3)])
+
+    assert asyncio.run(scenario()) == ["result"] * 3
+    assert len(calls) == 1
+    assert not coalescing_service._flights
+
+def test_different_keys_run_separately():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def scenario():
+        return await asyncio.gather(coalescing_service.run("test", "a", compute),
+                                    coalescing_service.run("test", "b", compute))
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+def test_every_caller_gets_the_exception():
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def scenario():
+        return await asyncio.gather(*[coalescing_service.run("test", "key", compute) for _ in range(2)],
+                                    return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(scenario())] == [ValueError, ValueError]
+
+def test_one_caller_leaving_does_not_cancel_the_others():
+    async def scenario():
+        started = asyncio.Event()
+
+        async def compute():
+            started.set()
+            await asyncio.sleep(0.05)
+            return "result"
+
+        leaving = asyncio.create_task(coalescing_service.run("test", "key", compute))
+        await started.wait()
+        staying = asyncio.create_task(coalescing_service.run("test", "key", compute))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        return await staying
+
+    assert asyncio.run(scenario()) == "result"
+
+def test_work_is_cancelled_when_every_caller_left():
+    async def scenario():
+        cancelled = asyncio.Event()
+
+        async def compute():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(coalescing_service.run("test", "key", compute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        return dict(coalescing_service._flights)
+
+    assert asyncio.run(scenario()) == {}
@@ -0,0 +1,107 @@
+import time
+import asyncio
+import hashlib
+import pytest
+from app.core.config import settings
+from app.models.document_models import DocumentStatus
+from app.services import (document_service, executor_service, janitor_service, retrieval_service, storage_service,
+                          text_cache_service)
+from app.services.upload_service import UploadedFile
+
+PDF = b"%PDF-1.4 document"
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """Use an empty registry and store, with preparations that succeed at once."""
+    monkeypatch.setattr(settings, "DOCUMENTS_DB_PATH", str(tmp_path / "documents.sqlite3"))
+    monkeypatch.setattr(storage_service, "STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(storage_service, "_refs", {})
+    (tmp_path / "store").mkdir()
+
+    async def run_pdf_operation(operation, path):
+        return [{"width": 612, "height": 792}] * 2
+
+    async def warm(path):
+        return None
+
+    monkeypatch.setattr(executor_service, "run_pdf_operation", run_pdf_operation)
+    monkeypatch.setattr(text_cache_service, "get_pages", warm)
+    monkeypatch.setattr(retrieval_service, "get_index", warm)
+    document_service.init_db()
+    yield tmp_path
+    janitor_service.cancel(storage_service.blob_path(hashlib.sha256(PDF).hexdigest()))
+
+def uploaded(tmp_path) -> UploadedFile:
+    """Store PDF as an upload would, holding one reference to it."""
+    part = tmp_path / "upload.part"
+    part.write_bytes(PDF)
+    digest = hashlib.sha256(PDF).hexdigest()
+    path = storage_service.add_file(str(part), digest, ".pdf")
+    return UploadedFile(path=path, size=len(PDF), sha256=digest, file_type="pdf")
+
+async def register(tmp_path):
+    """Register a document and wait for its preparation."""
+    document = await document_service.register_document(uploaded(tmp_path), "report.pdf")
+    await asyncio.gather(*document_service._tasks.values())
+    return document
+
+def expiry(document_id):
+    return janitor_service.deadline_for(document_service._expiry_key(document_id))
+
+def test_registered_documents_are_prepared_and_scheduled_to_expire(registry):
+    async def scenario():
+        document = await register(registry)
+        return document, await document_service.get_document(document["id"])
+
+    registered, prepared = asyncio.run(scenario())
+    assert registered["status"] == DocumentStatus.PROCESSING.value
+    assert (prepared["status"], prepared["page_count"]) == (DocumentStatus.READY.value, 2)
+    assert expiry(prepared["id"]) == pytest.approx(prepared["created_at"] + settings.DOCUMENT_TTL_SECONDS)
+    asyncio.run(document_service.delete_document(prepared["id"]))
+
+def test_use_takes_a_reference_and_postpones_expiry(registry):
+    document = asyncio.run(register(registry))
+    scheduled = expiry(document["id"])
+    time.sleep(0.01)
+
+    path = asyncio.run(document_service.open_document(document["id"]))
+    assert storage_service.ref_count(path) == 2
+    assert expiry(document["id"]) > scheduled
+    storage_service.release(path)
+    asyncio.run(document_service.delete_document(document["id"]))
+
+def test_unused_documents_expire_and_release_their_file(registry):
+    document = asyncio.run(register(registry))
+    path = storage_service.blob_path(document["digest"])
+
+    # A document used since its expiry was scheduled is kept
+    document_service._expire_document(document_service._expiry_key(document["id"]))
+    assert asyncio.run(document_service.get_document(document["id"])) is not None
+
+    with document_service._connect() as connection:
+        connection.execute("UPDATE documents SET used_at = 0")
+    document_service._expire_document(document_service._expiry_key(document["id"]))
+    assert asyncio.run(document_service.get_document(document["id"])) is None
+    assert storage_service.ref_count(path) == 0
+    assert janitor_service.deadline_for(path) is not None
+
+def test_deleting_a_document_cancels_its_expiry(registry):
+    document = asyncio.run(register(registry))
+    assert asyncio.run(document_service.delete_document(document["id"]))
+    assert expiry(document["id"]) is None
+    assert storage_service.ref_count(storage_service.blob_path(document["digest"])) == 0
+    assert not asyncio.run(document_service.delete_document(document["id"]))
+
+def test_recovery_schedules_the_documents_kept(registry):
+    kept = asyncio.run(register(registry))
+    expired = asyncio.run(register(registry))
+    with document_service._connect() as connection:
+        connection.execute("UPDATE documents SET used_at = 0 WHERE id = ?", (expired["id"],))
+    for document in (kept, expired):
+        janitor_service.cancel(document_service._expiry_key(document["id"]))
+
+    assert document_service._recover_documents() == []
+    assert expiry(kept["id"]) == pytest.approx(kept["used_at"] + settings.DOCUMENT_TTL_SECONDS)
+    assert expiry(expired["id"]) is None
+    assert asyncio.run(document_service.get_document(expired["id"])) is None
+    janitor_service.cancel(document_service._expiry_key(kept["id"]))
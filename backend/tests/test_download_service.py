@@ -0,0 +1,86 @@
+import hashlib
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.services import download_service
+from app.services.download_service import _parse_range_header
+
+CONTENT = bytes(range(256)) * 4
+
+@pytest.fixture
+def client(tmp_path):
+    """A client for an app serving one file through build_file_response."""
+    path = tmp_path / "out.pdf"
+    path.write_bytes(CONTENT)
+    app = FastAPI()
+
+    @app.get("/file")
+    async def serve(request: Request):
+        return await download_service.build_file_response(request, str(path), "out.pdf")
+
+    return TestClient(app)
+
+def test_parse_single_and_open_ranges():
+    assert _parse_range_header("bytes=0-99", 1000) == [(0, 99)]
+    assert _parse_range_header("bytes=900-", 1000) == [(900, 999)]
+    assert _parse_range_header("bytes=-100", 1000) == [(900, 999)]
+    # Ends past the file are clamped, suffixes longer than the file take all of it
+    assert _parse_range_header("bytes=990-5000", 1000) == [(990, 999)]
+    assert _parse_range_header("bytes=-5000", 1000) == [(0, 999)]
+
+def test_parse_merges_overlapping_and_adjacent_ranges():
+    assert _parse_range_header("bytes=50-99,0-49,200-299,250-260", 1000) == [(0, 99), (200, 299)]
+
+def test_parse_unsatisfiable_ranges():
+    assert _parse_range_header("bytes=1000-", 1000) == []
+    assert _parse_range_header("bytes=-0", 1000) == []
+
+def test_parse_ignores_invalid_headers():
+    assert _parse_range_header("items=0-1", 1000) is None
+    assert _parse_range_header("bytes=", 1000) is None
+    assert _parse_range_header("bytes=5", 1000) is None
+    assert _parse_range_header("bytes=a-b", 1000) is None
+    assert _parse_range_header("bytes=9-1", 1000) is None
+    too_many = ",".join(f"{start}-{start}" for start in range(0, 2 * (download_service.MAX_RANGES + 1), 2))
+    assert _parse_range_header(f"bytes={too_many}", 1000) is None
+
+def test_full_download_has_validators(client):
+    response = client.get("/file")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == f'"{hashlib.sha256(CONTENT).hexdigest()}"'
+    assert response.headers["accept-ranges"] == "bytes"
+
+def test_single_range(client):
+    response = client.get("/file", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+
+def test_multiple_ranges(client):
+    response = client.get("/file", headers={"Range": "bytes=0-1,100-101"})
+    assert response.status_code == 206
+    assert response.headers["content-type"].startswith("multipart/byteranges; boundary=")
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert b"Content-Range: bytes 0-1/" in response.content
+    assert CONTENT[100:102] in response.content
+
+def test_unsatisfiable_range(client):
+    response = client.get("/file", headers={"Range": f"bytes={len(CONTENT)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+def test_if_none_match(client):
+    etag = client.get("/file").headers["etag"]
+    assert client.get("/file", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/file", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get("/file", headers={"If-None-Match": '"other"'}).status_code == 200
+
+def test_if_range_only_resumes_the_same_file(client):
+    etag = client.get("/file").headers["etag"]
+    resumed = client.get("/file", headers={"Range": "bytes=10-19", "If-Range": etag})
+    assert resumed.status_code == 206
+    # The file changed: send it whole
+    changed = client.get("/file", headers={"Range": "bytes=10-19", "If-Range": '"other"'})
+    assert changed.status_code == 200
+    assert changed.content == CONTENT
@@ -0,0 +1,153 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app.core.config import settings
+from app.services import gemini_client
+from app.services.gemini_client import GeminiAPIError, GeminiClient
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "GEMINI_BACKOFF_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "GEMINI_MAX_CONCURRENCY_PER_KEY", 1)
+    monkeypatch.setattr(gemini_client, "_stats", {"retries": 0, "rate_limited": 0})
+
+def run(handler, scenario):
+    """Run a scenario against a client whose requests are answered by handler."""
+    async def main():
+        http = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://gemini.test/v1beta")
+        gemini_client._http = http
+        try:
+            return await scenario(GeminiClient("key"))
+        finally:
+            gemini_client._http = None
+            await http.aclose()
+
+    return asyncio.run(main())
+
+def generate(client, model):
+    return client._request("POST", f"/models/{model}:generateContent", model, json={})
+
+def test_server_errors_are_retried():
+    responses = [httpx.Response(503, json={"error": {"message": "busy"}}), httpx.Response(200, json={"ok": True})]
+
+    assert run(lambda request: responses.pop(0), lambda client: generate(client, "a")) == {"ok": True}
+    assert gemini_client.stats()["retries"] == 1
+
+def test_client_errors_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={"error": {"message": "bad request"}})
+
+    with pytest.raises(GeminiAPIError) as error:
+        run(handler, lambda client: generate(client, "a"))
+    assert error.value.status_code == 400
+    assert len(calls) == 1
+
+def test_retries_run_out():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500, json={"error": {"message": "boom"}})
+
+    with pytest.raises(GeminiAPIError) as error:
+        run(handler, lambda client: generate(client, "a"))
+    assert error.value.status_code == 500
+    assert len(calls) == settings.GEMINI_MAX_RETRIES + 1
+
+def test_rate_limited_calls_wait_for_the_delay_asked_for():
+    responses = [
+        httpx.Response(429, json={"error": {"message": "quota", "details": [{"retryDelay": "0.2s"}]}}),
+        httpx.Response(200, json={"ok": True}),
+    ]
+
+    async def scenario(client):
+        start = time.monotonic()
+        result = await generate(client, "a")
+        return result, time.monotonic() - start, client._bucket("a")
+
+    result, elapsed, bucket = run(lambda request: responses.pop(0), scenario)
+    assert result == {"ok": True}
+    assert elapsed >= 0.2
+    # The pause emptied the bucket the call was queued on
+    assert bucket.tokens < 1
+    assert gemini_client.stats()["rate_limited"] == 1
+
+def test_backoff_does_not_hold_the_concurrency_slot():
+    failed = []
+
+    def handler(request):
+        if "/models/a:" in request.url.path and not failed:
+            failed.append(request)
+            return httpx.Response(503, headers={"retry-after": "0.3"}, json={"error": {"message": "busy"}})
+        return httpx.Response(200, json={"model": request.url.path})
+
+    async def scenario(client):
+        finished = []
+
+        async def call(model):
+            await generate(client, model)
+            finished.append(model)
+
+        first = asyncio.create_task(call("a"))
+        while not failed:
+            await asyncio.sleep(0.01)
+        # Only one call may be in flight, yet "b" goes through while "a" waits to retry
+        await asyncio.wait_for(call("b"), 0.2)
+        await first
+        return finished
+
+    assert run(handler, scenario) == ["b", "a"]
+
+def test_queued_counts_calls_waiting_for_a_slot():
+    async def scenario(client):
+        release = asyncio.Event()
+
+        async def handler(request):
+            await release.wait()
+            return httpx.Response(200, json={})
+
+        gemini_client._http._transport = httpx.MockTransport(handler)
+        calls = [asyncio.create_task(generate(client, "a")) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        queued = client.queued()
+        release.set()
+        await asyncio.gather(*calls)
+        return queued, client.queued()
+
+    assert run(lambda request: httpx.Response(200, json={}), scenario) == (2, 0)
+
+def test_clients_with_calls_in_flight_are_not_evicted(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_CLIENT_CACHE_SIZE", 1)
+    monkeypatch.setattr(gemini_client, "_clients", gemini_client.OrderedDict())
+
+    async def scenario(_):
+        release = asyncio.Event()
+
+        async def handler(request):
+            await release.wait()
+            return httpx.Response(200, json={})
+
+        gemini_client._http._transport = httpx.MockTransport(handler)
+        busy = gemini_client.get_client("busy")
+        call = asyncio.create_task(generate(busy, "a"))
+        await asyncio.sleep(0.05)
+
+        # The busy client stays cached above the limit, so its key keeps one concurrency limit
+        gemini_client.get_client("other")
+        kept = gemini_client.get_client("busy") is busy
+        release.set()
+        await call
+
+        # Once idle, it is evicted like any other
+        gemini_client.get_client("third")
+        gemini_client.get_client("fourth")
+        return kept, list(gemini_client._clients.values())
+
+    kept, cached = run(lambda request: httpx.Response(200, json={}), scenario)
+    assert kept
+    assert [client.key_hash for client in cached] == [gemini_client.key_hash("fourth")]
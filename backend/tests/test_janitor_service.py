@@ -0,0 +1,86 @@
+import os
+import time
+import pytest
+from app.core.config import settings
+from app.services import janitor_service
+
+@pytest.fixture(autouse=True)
+def schedule(monkeypatch):
+    """Start every test with an empty schedule."""
+    monkeypatch.setattr(janitor_service, "_heap", [])
+    monkeypatch.setattr(janitor_service, "_deadlines", {})
+    monkeypatch.setattr(janitor_service, "_sizes", {})
+    monkeypatch.setattr(janitor_service, "_callbacks", {})
+    monkeypatch.setattr(janitor_service, "_reserved_paths", set(janitor_service._reserved_paths))
+
+def touch(path, content=b"data"):
+    with open(path, "wb") as file:
+        file.write(content)
+    return str(path)
+
+def test_expired_paths_are_popped_in_deadline_order():
+    now = time.time()
+    janitor_service.register_deadline("/tmp/c", now - 1)
+    janitor_service.register_deadline("/tmp/a", now - 3)
+    janitor_service.register_deadline("/tmp/b", now - 2)
+    janitor_service.register_deadline("/tmp/later", now + 60)
+
+    assert [path for path, _ in janitor_service._pop_expired(10)] == ["/tmp/a", "/tmp/b", "/tmp/c"]
+    assert janitor_service.deadline_for("/tmp/later") is not None
+    assert janitor_service.stats()["pending_files"] == 1
+
+def test_pop_respects_the_batch_limit():
+    for index in range(5):
+        janitor_service.register_deadline(f"/tmp/{index}", time.time() - 1)
+
+    assert len(janitor_service._pop_expired(2)) == 2
+    assert len(janitor_service._pop_expired(10)) == 3
+
+def test_cancelled_and_rescheduled_paths_leave_stale_entries_behind():
+    now = time.time()
+    janitor_service.register_deadline("/tmp/cancelled", now - 2)
+    janitor_service.register_deadline("/tmp/moved", now - 1)
+    janitor_service.cancel("/tmp/cancelled")
+    janitor_service.register_deadline("/tmp/moved", now + 60)
+
+    assert janitor_service._pop_expired(10) == []
+    assert janitor_service.deadline_for("/tmp/moved") == now + 60
+
+def test_stale_entries_are_compacted():
+    for _ in range(200):
+        janitor_service.register_deadline("/tmp/same", time.time() + 60)
+
+    assert len(janitor_service._heap) <= 2 * len(janitor_service._deadlines) + 64
+
+def test_reserved_paths_are_refused(tmp_path):
+    path = str(tmp_path / "state.db")
+    janitor_service.reserve(path)
+    with pytest.raises(ValueError):
+        janitor_service.register(path)
+
+def test_expire_batch_deletes_files_and_directories_or_calls_back(tmp_path):
+    file_path = touch(tmp_path / "out.pdf")
+    dir_path = tmp_path / "split"
+    dir_path.mkdir()
+    touch(dir_path / "part.pdf")
+    called = []
+    kept = touch(tmp_path / "blob.pdf")
+
+    janitor_service._expire_batch([(file_path, None), (str(dir_path), None), (kept, called.append)])
+    assert not os.path.exists(file_path) and not dir_path.exists()
+    assert called == [kept] and os.path.exists(kept)
+
+def test_rebuild_schedules_leftovers_by_mtime(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TEMP_FILE_DIR", str(tmp_path))
+    old = touch(tmp_path / "old.pdf")
+    os.utime(old, (1000, 1000))
+    scheduled = touch(tmp_path / "scheduled.pdf")
+    janitor_service.register_deadline(scheduled, 42)
+    reserved = touch(tmp_path / "reserved.db")
+    janitor_service.reserve(reserved)
+
+    janitor_service.rebuild()
+    assert janitor_service.deadline_for(old) == 1000 + settings.OUTPUT_TTL_SECONDS
+    # Deadlines already known and reserved paths are left alone
+    assert janitor_service.deadline_for(scheduled) == 42
+    assert janitor_service.deadline_for(reserved) is None
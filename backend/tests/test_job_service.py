@@ -0,0 +1,138 @@
+import os
+import sys
+import asyncio
+import sqlite3
+import subprocess
+import pytest
+from app.core.config import settings
+from app.models.job_models import JobStatus
+from app.models.pdf_models import PDFOperationType, PDFResponse
+from app.services import janitor_service, job_service, operation_service
+
+@pytest.fixture(autouse=True)
+def jobs(tmp_path, monkeypatch):
+    """Give every test an empty job database and job directory."""
+    monkeypatch.setattr(settings, "JOBS_DB_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(job_service, "JOB_FILES_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(job_service, "_secrets", {})
+    os.makedirs(job_service.JOB_FILES_DIR)
+    job_service.init_db()
+
+def upload(tmp_path, name="a.pdf"):
+    path = tmp_path / f"upload-{name}"
+    path.write_bytes(b"%PDF-1.4 upload")
+    return str(path)
+
+def submit(operation, params, paths):
+    return asyncio.run(job_service.submit_job(operation, params, paths))
+
+def as_other_process(monkeypatch):
+    """Make this process look like another one, with every recorded owner still running."""
+    monkeypatch.setattr(job_service, "_process_owner", lambda: "1:other")
+    monkeypatch.setattr(job_service, "_owner_alive", lambda owner: True)
+
+def row(job_id):
+    connection = sqlite3.connect(settings.JOBS_DB_PATH)
+    connection.row_factory = sqlite3.Row
+    return connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+def test_submit_links_the_inputs_into_the_job_directory(tmp_path):
+    uploads = [upload(tmp_path, "a.pdf"), upload(tmp_path, "b.pdf")]
+    job = submit(PDFOperationType.MERGE, {}, uploads)
+
+    files = job["inputs"]["files"]
+    assert [os.path.dirname(path) for path in files] == [os.path.join(job_service.JOB_FILES_DIR, job["id"])] * 2
+    assert all(open(path, "rb").read() == b"%PDF-1.4 upload" for path in files)
+    # The uploads were handed over
+    assert not any(os.path.exists(path) for path in uploads)
+    assert job["status"] == JobStatus.QUEUED.value and job["owner"] is None
+
+def test_passwords_stay_in_memory_and_bind_the_job_to_its_process(tmp_path, monkeypatch):
+    job = submit(PDFOperationType.UNLOCK, {"password": "s3cret"}, [upload(tmp_path)])
+    assert "s3cret" not in row(job["id"])["params"]
+    assert job["owner"] == job_service._process_owner()
+
+    with monkeypatch.context() as patch:
+        as_other_process(patch)
+        assert job_service._claim_next_job() is None
+
+    claimed = job_service._claim_next_job()
+    assert claimed["id"] == job["id"] and claimed["status"] == JobStatus.QUEUED.value
+    assert row(job["id"])["status"] == JobStatus.RUNNING.value
+
+def test_jobs_of_a_stopped_process_are_requeued(tmp_path, monkeypatch):
+    job = submit(PDFOperationType.COMPRESS, {}, [upload(tmp_path)])
+    assert job_service._claim_next_job()["id"] == job["id"]
+
+    as_other_process(monkeypatch)
+    # The process running it is alive: nothing to claim
+    assert job_service._claim_next_job() is None
+
+    monkeypatch.setattr(job_service, "_owner_alive", lambda owner: False)
+    claimed = job_service._claim_next_job()
+    assert claimed["id"] == job["id"]
+    assert row(job["id"])["owner"] == "1:other"
+
+def test_jobs_with_passwords_fail_once_their_process_stopped(tmp_path, monkeypatch):
+    job = submit(PDFOperationType.PROTECT, {"user_password": "s3cret"}, [upload(tmp_path)])
+
+    as_other_process(monkeypatch)
+    monkeypatch.setattr(job_service, "_owner_alive", lambda owner: False)
+    assert job_service._claim_next_job() is None
+
+    failed = row(job["id"])
+    assert failed["status"] == JobStatus.FAILED.value
+    assert failed["error"] == job_service._SECRETS_LOST
+    assert not os.path.exists(job_service._job_dir(job["id"]))
+
+def test_owner_liveness():
+    assert job_service._owner_alive(job_service._process_owner())
+    # A previous process with the same PID
+    assert not job_service._owner_alive(f"{os.getpid()}:previous")
+
+    finished = subprocess.Popen([sys.executable, "-c", "pass"])
+    finished.wait()
+    assert not job_service._owner_alive(f"{finished.pid}:gone")
+    assert job_service._owner_alive(f"{os.getppid()}:parent")
+
+def test_run_job_reports_each_stage(tmp_path, monkeypatch):
+    job = submit(PDFOperationType.COMPRESS, {}, [upload(tmp_path)])
+    stages = []
+
+    async def run_operation(operation, input_paths, params, watermark_image_path=None):
+        stages.append((row(job["id"])["progress"], row(job["id"])["message"]))
+        output_path = tmp_path / "out.pdf"
+        output_path.write_bytes(b"%PDF-1.4 out")
+        return PDFResponse(success=True, message="PDF compressed successfully", file_path=str(output_path))
+
+    monkeypatch.setattr(operation_service, "run_operation", run_operation)
+    claimed = job_service._claim_next_job()
+    stages.append((row(job["id"])["progress"], row(job["id"])["message"]))
+    asyncio.run(job_service._run_job(claimed))
+
+    finished = row(job["id"])
+    assert stages == [(0.1, "Checking the input files"), (0.2, "Running compress")]
+    assert (finished["status"], finished["progress"]) == (JobStatus.SUCCEEDED.value, 1.0)
+    assert not os.path.exists(job_service._job_dir(job["id"]))
+    janitor_service.cancel(str(tmp_path / "out.pdf"))
+
+def test_job_fails_when_its_inputs_are_gone(tmp_path):
+    job = submit(PDFOperationType.COMPRESS, {}, [upload(tmp_path)])
+    job_service._remove_job_files(job["id"])
+
+    asyncio.run(job_service._run_job(job_service._claim_next_job()))
+    assert row(job["id"])["error"] == "Input files are no longer available"
+
+def test_recovery_deletes_leftover_job_directories(tmp_path):
+    job = submit(PDFOperationType.COMPRESS, {}, [upload(tmp_path)])
+    leftover = os.path.join(job_service.JOB_FILES_DIR, "finished-job")
+    recent = os.path.join(job_service.JOB_FILES_DIR, "being-submitted")
+    os.makedirs(leftover)
+    os.makedirs(recent)
+    os.utime(leftover, (0, 0))
+    os.utime(job_service._job_dir(job["id"]), (0, 0))
+
+    job_service._recover_jobs()
+    assert not os.path.exists(leftover)
+    assert os.path.exists(recent)
+    assert os.path.exists(job_service._job_dir(job["id"]))
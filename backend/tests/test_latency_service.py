@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services import latency_service, token_service
+from app.services.gemini_client import GeminiAPIError
+
+@pytest.fixture(autouse=True)
+def latency(monkeypatch):
+    """Start without latency samples, hedge after 2 samples and give chat calls 0.2s."""
+    monkeypatch.setattr(latency_service, "_latencies", {})
+    monkeypatch.setattr(latency_service, "_stats", dict.fromkeys(latency_service._stats, 0))
+    monkeypatch.setattr(settings, "GEMINI_HEDGING", True)
+    monkeypatch.setattr(settings, "GEMINI_HEDGE_PERCENTILE", 50)
+    monkeypatch.setattr(settings, "GEMINI_HEDGE_MIN_SAMPLES", 2)
+    monkeypatch.setattr(settings, "GEMINI_CHAT_DEADLINE_SECONDS", 0.2)
+    monkeypatch.setattr(settings, "GEMINI_FALLBACK_MODEL", "")
+
+def generating(delays, calls):
+    """A call taking the next delay of the list for each attempt, recording 10 tokens of usage."""
+    async def generate(model_name):
+        attempt = len(calls)
+        calls.append(model_name)
+        await asyncio.sleep(delays[attempt])
+        token_service.record_usage({"total_tokens": 10})
+        return f"answer {attempt}"
+    return generate
+
+def tracked(generate):
+    """Make a chat call, returning its result and the usage recorded for it."""
+    async def scenario():
+        with token_service.track_usage() as usage:
+            return await latency_service.call("chat", "gemini-pro", generate), usage
+    return asyncio.run(scenario())
+
+def test_slow_call_is_hedged_and_only_the_winner_counts():
+    for _ in range(2):
+        latency_service.record("chat", "gemini-pro", 0.01)
+    calls = []
+
+    result, usage = tracked(generating([0.1, 0.01], calls))
+    assert result == "answer 1"
+    assert len(calls) == 2
+    assert (usage["calls"], usage["total_tokens"]) == (1, 10)
+    assert latency_service.stats()["hedged"] == latency_service.stats()["hedge_wins"] == 1
+
+def test_no_hedging_without_enough_samples():
+    calls = []
+    result, usage = tracked(generating([0.05], calls))
+    assert (result, calls, usage["calls"]) == ("answer 0", ["gemini-pro"], 1)
+    assert latency_service.percentile("chat", "gemini-pro", 50) is None
+
+def test_failed_calls_still_count():
+    async def generate(model_name):
+        token_service.record_usage({"total_tokens": 10})
+        raise GeminiAPIError("Gemini returned no text")
+
+    async def scenario():
+        with token_service.track_usage() as usage:
+            with pytest.raises(GeminiAPIError):
+                await latency_service.call("chat", "gemini-pro", generate)
+            return usage
+
+    assert asyncio.run(scenario())["calls"] == 1
+
+def test_missed_deadline_fails_as_504():
+    with pytest.raises(GeminiAPIError) as error:
+        tracked(generating([1], []))
+    assert error.value.status_code == 504 and error.value.retryable
+    assert latency_service.stats()["deadline_exceeded"] == 1
+
+def test_missed_deadline_falls_back(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_FALLBACK_MODEL", "gemini-flash")
+    calls = []
+    result, usage = tracked(generating([1, 0.01], calls))
+    assert result == "answer 1"
+    assert calls == ["gemini-pro", "gemini-flash"]
+    assert usage["calls"] == 1
+    assert latency_service.stats()["fallbacks"] == 1
+
+def streaming(first_delays, calls):
+    """A stream whose first chunk takes the next delay of the list for each attempt."""
+    async def open_stream(model_name):
+        attempt = len(calls)
+        calls.append(model_name)
+        await asyncio.sleep(first_delays[attempt])
+        for part in ("a", "b"):
+            yield f"{model_name}:{part}"
+    return open_stream
+
+def collect(open_stream):
+    async def scenario():
+        return [chunk async for chunk in latency_service.stream("chat", "gemini-pro", open_stream)]
+    return asyncio.run(scenario())
+
+def test_stream_is_forwarded():
+    assert collect(streaming([0], [])) == ["gemini-pro:a", "gemini-pro:b"]
+
+def test_late_first_chunk_falls_back(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_FALLBACK_MODEL", "gemini-flash")
+    calls = []
+    assert collect(streaming([1, 0], calls)) == ["gemini-flash:a", "gemini-flash:b"]
+    assert calls == ["gemini-pro", "gemini-flash"]
+
+def test_late_first_chunk_fails_as_504():
+    with pytest.raises(GeminiAPIError) as error:
+        collect(streaming([1], []))
+    assert error.value.status_code == 504
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services import gemini_client, model_cache_service
+from app.services.gemini_client import GeminiAPIError
+
+class FakeClient:
+    """Lists one model per key, counting the API calls."""
+
+    def __init__(self, api_key):
+        self.key_hash = f"hash-{api_key}"
+        self.listings = 0
+        self.lookups = 0
+        self.failing = False
+
+    async def list_models(self):
+        self.listings += 1
+        await asyncio.sleep(0.01)
+        if self.failing:
+            raise GeminiAPIError("Gemini is unavailable", 503, retryable=True)
+        return [{"name": "models/gemini-pro", "inputTokenLimit": 1000, "listing": self.listings}]
+
+    async def get_model(self, model_name):
+        self.lookups += 1
+        return {"name": gemini_client.model_path(model_name), "inputTokenLimit": 500}
+
+@pytest.fixture
+def clients(monkeypatch):
+    """Start with an empty cache and give every key a fake client."""
+    clients = {}
+    monkeypatch.setattr(model_cache_service, "_entries", model_cache_service.OrderedDict())
+    monkeypatch.setattr(model_cache_service, "_stats", dict.fromkeys(model_cache_service._stats, 0))
+    monkeypatch.setattr(gemini_client, "get_client", lambda api_key: clients.setdefault(api_key, FakeClient(api_key)))
+    return clients
+
+def age(api_key, seconds):
+    """Make the cached models of a key look fetched that long ago."""
+    model_cache_service._entries[f"hash-{api_key}"].fetched_at -= seconds
+
+def test_models_are_listed_once_per_key(clients):
+    async def scenario():
+        await asyncio.gather(*[model_cache_service.list_models("key") for _ in range(3)])
+        return await model_cache_service.list_models("key")
+
+    assert asyncio.run(scenario())[0]["name"] == "models/gemini-pro"
+    assert clients["key"].listings == 1
+    assert "key" not in model_cache_service._entries and "hash-key" in model_cache_service._entries
+    assert model_cache_service.stats()["hits"] == 1
+
+def test_expired_models_are_listed_again(clients):
+    asyncio.run(model_cache_service.list_models("key"))
+    age("key", settings.MODEL_CACHE_TTL_SECONDS)
+    assert asyncio.run(model_cache_service.list_models("key"))[0]["listing"] == 2
+
+def test_stale_models_are_served_while_refreshing(clients):
+    async def scenario():
+        await model_cache_service.list_models("key")
+        age("key", settings.MODEL_CACHE_REFRESH_SECONDS)
+        stale = await model_cache_service.list_models("key")
+        await model_cache_service._entries["hash-key"].refresh
+        return stale, await model_cache_service.list_models("key")
+
+    stale, fresh = asyncio.run(scenario())
+    assert (stale[0]["listing"], fresh[0]["listing"]) == (1, 2)
+    assert model_cache_service.stats()["refreshes"] == 1
+
+def test_failed_refresh_keeps_the_models(clients):
+    async def scenario():
+        await model_cache_service.list_models("key")
+        age("key", settings.MODEL_CACHE_REFRESH_SECONDS)
+        clients["key"].failing = True
+        await model_cache_service.list_models("key")
+        entry = model_cache_service._entries["hash-key"]
+        await entry.refresh
+        return entry, await model_cache_service.list_models("key")
+
+    entry, models = asyncio.run(scenario())
+    assert models[0]["listing"] == 1 and entry.refresh is None
+
+def test_unlisted_model_is_looked_up_once(clients):
+    async def scenario():
+        listed = await model_cache_service.get_model("key", "gemini-pro")
+        tuned = [await model_cache_service.get_model("key", "tunedModels/mine") for _ in range(2)]
+        return listed, tuned
+
+    listed, tuned = asyncio.run(scenario())
+    assert listed["inputTokenLimit"] == 1000
+    assert tuned[0] == tuned[1] == {"name": "tunedModels/mine", "inputTokenLimit": 500}
+    assert clients["key"].lookups == 1
+
+def test_least_recently_used_keys_are_dropped(clients, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_CACHE_MAX_KEYS", 2)
+
+    async def scenario():
+        for api_key in ("a", "b", "a", "c"):
+            await model_cache_service.list_models(api_key)
+
+    asyncio.run(scenario())
+    assert list(model_cache_service._entries) == ["hash-a", "hash-c"]
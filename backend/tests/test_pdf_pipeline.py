@@ -0,0 +1,48 @@
+import pytest
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.pdfgen import canvas
+from app.services import pdf_service
+
+def make_pdf(path, pages=3):
+    pdf = canvas.Canvas(str(path))
+    for number in range(1, pages + 1):
+        pdf.drawString(100, 700, f"Page {number}")
+        pdf.showPage()
+    pdf.save()
+    return str(path)
+
+def test_steps_are_applied_in_order(tmp_path):
+    source = make_pdf(tmp_path / "in.pdf", 4)
+    output = str(tmp_path / "out.pdf")
+    steps = [
+        {"operation": "rotate", "params": {"rotation": 90, "pages": None}},
+        {"operation": "extract_pages", "params": {"pages": [2, 4]}},
+        {"operation": "compress", "params": {"quality": "medium"}},
+    ]
+
+    result = pdf_service.run_pipeline(source, output, steps)
+    assert result["page_count"] == 2
+    assert [timing["step"] for timing in result["timings"]] == ["parse", "rotate", "extract_pages", "compress"]
+
+    pages = PdfReader(output).pages
+    assert [page.extract_text().strip() for page in pages] == ["Page 2", "Page 4"]
+    assert all(page.rotation == 90 for page in pages)
+
+def test_parse_reads_every_object_the_pages_use(tmp_path):
+    reader = PdfReader(make_pdf(tmp_path / "in.pdf"))
+    pages = pdf_service._load_pages(reader)
+
+    # Content streams are already parsed, not left for the first step touching them
+    for page in pages:
+        contents = dict.__getitem__(page, "/Contents")
+        assert (contents.generation, contents.idnum) in reader.resolved_objects
+
+def test_encrypted_input_is_refused(tmp_path):
+    writer = PdfWriter()
+    writer.append(make_pdf(tmp_path / "plain.pdf"))
+    writer.encrypt("secret")
+    with open(tmp_path / "locked.pdf", "wb") as file:
+        writer.write(file)
+
+    with pytest.raises(ValueError):
+        pdf_service.run_pipeline(str(tmp_path / "locked.pdf"), str(tmp_path / "out.pdf"), [])
@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from app.services import response_cache_service, storage_service
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    """Use an empty cache, and a fixed digest for every document."""
+    monkeypatch.setattr(response_cache_service, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(response_cache_service, "_memory", response_cache_service.OrderedDict())
+    monkeypatch.setattr(storage_service, "file_digest", lambda path: "0" * 64)
+    monkeypatch.setattr(response_cache_service.janitor_service, "register_deadline", lambda *args, **kwargs: None)
+
+def get(api_key, compute, **kwargs):
+    return response_cache_service.get_or_compute(api_key, "summarize", "model", {"length": "short"}, "a.pdf",
+                                                 compute, **kwargs)
+
+def test_concurrent_requests_coalesce_per_api_key():
+    calls = []
+
+    def computing(api_key):
+        async def compute():
+            calls.append(api_key)
+            await asyncio.sleep(0.05)
+            return f"summary for {api_key}"
+        return compute
+
+    async def scenario():
+        return await asyncio.gather(get("key-a", computing("key-a")), get("key-a", computing("key-a")),
+                                    get("key-b", computing("key-b")))
+
+    results = asyncio.run(scenario())
+    assert sorted(calls) == ["key-a", "key-b"]
+    assert results[0] == results[1] == "summary for key-a"
+
+def test_cached_responses_are_shared_across_api_keys():
+    async def compute():
+        return "summary"
+
+    async def fail():
+        raise AssertionError("the cached response should be used")
+
+    assert asyncio.run(get("key-a", compute)) == "summary"
+    assert asyncio.run(get("key-b", fail)) == "summary"
+
+    # bypass generates the response again
+    async def fresh():
+        return "fresh summary"
+
+    assert asyncio.run(get("key-b", fresh, bypass=True)) == "fresh summary"
@@ -0,0 +1,87 @@
+import math
+import asyncio
+import pytest
+from app.services import retrieval_service, storage_service, text_cache_service
+from app.services.retrieval_service import BM25_B, BM25_K1, BM25Index, Chunk, chunk_pages, tokenize
+
+TEXTS = [
+    "The invoice is due in thirty days.",
+    "Shipping takes five days. Shipping is free over fifty euros.",
+    "Returns are accepted within thirty days of delivery.",
+    "Contact support by email.",
+]
+
+def reference_scores(texts, query):
+    """Score every text with the textbook BM25 formula."""
+    documents = [tokenize(text) for text in texts]
+    average_length = sum(len(tokens) for tokens in documents) / len(documents)
+    scores = []
+    for tokens in documents:
+        score = 0.0
+        for term in set(tokenize(query)):
+            frequency = sum(1 for document in documents if term in document)
+            tf = tokens.count(term)
+            if not tf:
+                continue
+            idf = math.log(1 + (len(documents) - frequency + 0.5) / (frequency + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / average_length))
+        scores.append(score)
+    return scores
+
+def test_search_matches_the_bm25_formula():
+    index = BM25Index([Chunk(1, text) for text in TEXTS])
+    query = "how many days for shipping"
+    expected = reference_scores(TEXTS, query)
+
+    results = index.search(query, 10)
+    assert [chunk_id for chunk_id, _ in results] == sorted(
+        (chunk_id for chunk_id, score in enumerate(expected) if score > 0), key=lambda chunk_id: -expected[chunk_id]
+    )
+    for chunk_id, score in results:
+        assert score == pytest.approx(expected[chunk_id])
+
+def test_search_keeps_the_best_top_k_and_skips_non_matching_chunks():
+    index = BM25Index([Chunk(1, text) for text in TEXTS])
+    assert [chunk_id for chunk_id, _ in index.search("thirty days shipping", 1)] == [1]
+    assert index.search("refund", 5) == []
+    assert BM25Index([]).search("anything", 5) == []
+
+def test_chunks_follow_paragraphs_and_never_span_pages():
+    pages = ["First paragraph.\n\nSecond paragraph.", "x" * 25]
+    chunks = chunk_pages(pages, max_chars=20)
+    assert [(chunk.page_number, chunk.text) for chunk in chunks] == [
+        (1, "First paragraph."), (1, "Second paragraph."), (2, "x" * 20), (2, "x" * 5),
+    ]
+    assert chunk_pages(["a\n\nb"], max_chars=20)[0].text == "a\n\nb"
+
+@pytest.fixture
+def document(monkeypatch):
+    """Serve TEXTS as the pages of every PDF, counting the extractions."""
+    extractions = []
+
+    async def get_pages(pdf_path):
+        extractions.append(pdf_path)
+        return TEXTS
+
+    monkeypatch.setattr(storage_service, "file_digest", lambda path: f"digest-of-{path}")
+    monkeypatch.setattr(text_cache_service, "get_pages", get_pages)
+    monkeypatch.setattr(retrieval_service, "_indexes", retrieval_service.OrderedDict())
+    return extractions
+
+def test_retrieve_returns_chunks_in_document_order(document):
+    chunks = asyncio.run(retrieval_service.retrieve("a.pdf", "thirty days returns", top_k=2))
+    assert [chunk.page_number for chunk in chunks] == [1, 3]
+    assert chunks[1].score > chunks[0].score > 0
+
+def test_retrieve_falls_back_to_the_first_chunks(document):
+    chunks = asyncio.run(retrieval_service.retrieve("a.pdf", "unrelated question", top_k=2))
+    assert [(chunk.page_number, chunk.score) for chunk in chunks] == [(1, 0.0), (2, 0.0)]
+
+def test_index_is_built_once_per_document(document):
+    async def scenario():
+        await retrieval_service.retrieve("a.pdf", "shipping")
+        await retrieval_service.retrieve("a.pdf", "returns")
+        await retrieval_service.retrieve("b.pdf", "returns")
+
+    asyncio.run(scenario())
+    assert document == ["a.pdf", "b.pdf"]
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import pytest
+from app.services import janitor_service, storage_service
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Point the store at an empty directory."""
+    monkeypatch.setattr(storage_service, "STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(storage_service, "_refs", {})
+    yield tmp_path
+    for name in os.listdir(tmp_path):
+        janitor_service.cancel(os.path.join(tmp_path, name))
+
+def upload(directory, content: bytes, name: str) -> tuple:
+    """Write an upload outside the store and return its path and digest."""
+    path = os.path.join(directory, name)
+    with open(path, "wb") as file:
+        file.write(content)
+    return path, hashlib.sha256(content).hexdigest()
+
+def test_identical_uploads_share_one_blob(store, tmp_path_factory):
+    uploads = tmp_path_factory.mktemp("uploads")
+    first, digest = upload(uploads, b"%PDF-1.4 same", "a.pdf.part")
+    second, _ = upload(uploads, b"%PDF-1.4 same", "b.pdf.part")
+
+    path = storage_service.add_file(first, digest, ".pdf")
+    assert storage_service.add_file(second, digest, ".PDF") == path
+    assert path == os.path.join(str(store), f"{digest}.pdf")
+    assert not os.path.exists(first) and not os.path.exists(second)
+    assert storage_service.ref_count(path) == 2
+
+def test_release_schedules_the_blob_once_unreferenced(store, tmp_path_factory):
+    uploads = tmp_path_factory.mktemp("uploads")
+    file_path, digest = upload(uploads, b"%PDF-1.4 released", "a.pdf.part")
+    path = storage_service.add_file(file_path, digest, ".pdf")
+    storage_service.acquire(path)
+
+    storage_service.release(path)
+    assert storage_service.ref_count(path) == 1
+    assert janitor_service.deadline_for(path) is None
+
+    storage_service.release(path)
+    assert storage_service.ref_count(path) == 0
+    assert janitor_service.deadline_for(path) is not None
+
+    # Using the blob again cancels its expiry
+    storage_service.acquire(path)
+    assert janitor_service.deadline_for(path) is None
+
+def test_expired_blob_is_kept_while_referenced(store, tmp_path_factory):
+    uploads = tmp_path_factory.mktemp("uploads")
+    file_path, digest = upload(uploads, b"%PDF-1.4 expiring", "a.pdf.part")
+    path = storage_service.add_file(file_path, digest, ".pdf")
+    storage_service.save_artifact(digest, "text", ["page"])
+
+    storage_service._expire_blob(path)
+    assert os.path.exists(path)
+
+    storage_service.release(path)
+    storage_service._expire_blob(path)
+    assert not os.path.exists(path)
+    assert storage_service.load_artifact(digest, "text") is None
+
+def test_acquire_missing_blob(store):
+    with pytest.raises(FileNotFoundError):
+        storage_service.acquire(storage_service.blob_path("0" * 64))
+
+def test_find_blob_requires_the_full_digest(store, tmp_path_factory):
+    uploads = tmp_path_factory.mktemp("uploads")
+    file_path, digest = upload(uploads, b"%PDF-1.4 found", "a.pdf.part")
+    path = storage_service.add_file(file_path, digest, ".pdf")
+
+    assert storage_service.find_blob(digest) == path
+    assert storage_service.find_blob(digest[:8]) is None
+    assert storage_service.find_blob("") is None
+    assert storage_service.find_blob(digest.upper()) is None
+    assert storage_service.find_blob(f"{digest}\n") is None
+    assert storage_service.find_blob(f"../{digest}") is None
+
+def test_find_blob_checks_the_allowed_extensions(store, tmp_path_factory):
+    uploads = tmp_path_factory.mktemp("uploads")
+    file_path, digest = upload(uploads, b"\x89PNG image", "a.png.part")
+    path = storage_service.add_file(file_path, digest, ".png")
+
+    assert storage_service.find_blob(digest) is None
+    assert storage_service.find_blob(digest, (".pdf", ".png")) == path
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from app.services import gemini_client, gemini_service, token_service, translation_service
+from app.services.gemini_client import GenerationResult
+from app.services.gemini_service import parse_segments
+from app.services.translation_service import join_page, pack_segments, split_page
+
+def test_parse_segments_in_order():
+    assert parse_segments("[[1]] un\n\n[[2]] deux", 2) == ["un", "deux"]
+
+def test_parse_segments_rejects_mismatched_markers():
+    assert parse_segments("[[1]] un\n\n[[1]] deux", 2) is None
+    assert parse_segments("[[2]] deux\n\n[[1]] un", 2) is None
+    assert parse_segments("un deux", 2) is None
+
+def test_parse_segments_single_segment():
+    assert parse_segments("un", 1) == ["un"]
+    assert parse_segments("[[1]] un [[1]]", 1) == ["un"]
+    # Other markers are text of the segment
+    assert parse_segments("[[1]] voir [[2]]", 1) == ["voir [[2]]"]
+
+def test_split_page_joins_wrapped_lines_into_paragraphs():
+    text = "Title\n\nA para-\ngraph wrapped\nover lines.\n\n\nLast one."
+    assert split_page(text, 100) == [["Title"], ["A paragraph wrapped over lines."], ["Last one."]]
+
+def test_split_page_splits_long_paragraphs_at_sentences_and_whitespace():
+    paragraphs = split_page("First sentence here. " + "word " * 10 + "end.", 6)
+    assert paragraphs[0][0] == "First sentence here."
+    assert all(token_service.estimate_tokens(segment) <= 6 for segment in paragraphs[0])
+    # Cut between words, not inside them
+    assert all(set(segment.split()) <= {"word", "end."} for segment in paragraphs[0][1:])
+    assert join_page(paragraphs) == "First sentence here. " + "word " * 10 + "end."
+
+def test_split_page_sizes_segments_in_tokens():
+    # Chinese takes about a token per character, so this paragraph does not fit
+    assert split_page("一二三四五六七八九十" * 2, 10) == [["一二三四五六七八九十", "一二三四五六七八九十"]]
+    assert split_page("x" * 40, 10) == [["x" * 40]]
+
+def test_join_page():
+    assert join_page([["Titre"], ["Une phrase.", "Une autre."]]) == "Titre\n\nUne phrase. Une autre."
+
+def test_pack_segments_by_estimated_tokens():
+    assert pack_segments(["a" * 20, "b" * 20, "c" * 20], 10) == [[0, 1], [2]]
+    assert pack_segments(["一二三四五六七八", "a" * 8], 8) == [[0], [1]]
+
+@pytest.fixture
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(translation_service, "RETRY_BASE_DELAY_SECONDS", 0)
+
+def run_chunk(segments):
+    return asyncio.run(translation_service._translate_chunk("key", "model", segments, "fr", asyncio.Semaphore(4)))
+
+def test_translate_chunk_splits_unparseable_chunks(monkeypatch, no_retry_delay):
+    calls = []
+
+    async def translate_segments(api_key, model_name, segments, target_language):
+        calls.append(list(segments))
+        if len(segments) > 1:
+            return GenerationResult("garbled", {"total_tokens": 10})
+        return GenerationResult(f"[[1]] T({segments[0]})", {"total_tokens": 1})
+
+    monkeypatch.setattr(gemini_service, "translate_segments", translate_segments)
+    translations, usage = run_chunk(["a", "b", "c"])
+
+    assert translations == ["T(a)", "T(b)", "T(c)"]
+    assert usage == {"total_tokens": 13}
+    assert calls[0] == ["a", "b", "c"] and len(calls) == 4
+
+def test_translate_chunk_single_segment_with_markers_in_the_source(monkeypatch, no_retry_delay):
+    calls = []
+
+    async def translate_segments(api_key, model_name, segments, target_language):
+        calls.append(list(segments))
+        return GenerationResult("[[1]] voir [[2]]", {})
+
+    monkeypatch.setattr(gemini_service, "translate_segments", translate_segments)
+    assert run_chunk(["see [[2]]"]) == (["voir [[2]]"], {})
+    assert len(calls) == 1
+
+def test_translate_chunk_gives_up_after_the_retries(monkeypatch, no_retry_delay):
+    calls = []
+
+    async def translate_segments(api_key, model_name, segments, target_language):
+        calls.append(list(segments))
+        return None
+
+    monkeypatch.setattr(gemini_service, "translate_segments", translate_segments)
+    with pytest.raises(gemini_client.GeminiAPIError):
+        run_chunk(["a"])
+    assert len(calls) == translation_service.settings.TRANSLATION_RETRIES + 1